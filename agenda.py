@@ -0,0 +1,106 @@
+"""
+Agenda do dia em blocos de tempo, para verificar conflitos considerando a duração
+
+O dia é dividido em blocos de GRANULARIDADE minutos. Uma reserva ocupa todos os
+blocos de [hora_inicio, hora_fim); a ocupação de cada bloco fica na tabela
+ocupacao_horario (ver app.py). A AgendaDia carrega esses contadores em uma
+árvore de segmentos de máximo, que responde "o intervalo [inicio, fim) cabe na
+capacidade?" em O(log n) e enumera os inícios viáveis para uma duração.
+"""
+
+GRANULARIDADE = 5  # minutos por bloco
+MINUTOS_DIA = 24 * 60
+BLOCOS_DIA = MINUTOS_DIA // GRANULARIDADE
+
+def para_minutos(hora):
+    """'HH:MM' -> minutos desde 00:00"""
+    horas, minutos = hora.split(':')
+    return int(horas) * 60 + int(minutos)
+
+def para_hora(minutos):
+    """minutos desde 00:00 -> 'HH:MM'"""
+    return f'{minutos // 60:02d}:{minutos % 60:02d}'
+
+def limites_em_minutos(hora_inicio, hora_fim):
+    """(inicio, fim) em minutos, limitando ao dia reservas que passam da meia-noite"""
+    inicio = para_minutos(hora_inicio)
+    fim = para_minutos(hora_fim)
+    if fim == inicio:
+        fim = inicio + GRANULARIDADE
+    elif fim < inicio:
+        fim = MINUTOS_DIA
+    return inicio, min(fim, MINUTOS_DIA)
+
+def _faixa_de_blocos(inicio, fim):
+    """Índices [primeiro, ultimo) dos blocos que cobrem [inicio, fim) em minutos"""
+    return inicio // GRANULARIDADE, -(-fim // GRANULARIDADE)
+
+def blocos_do_intervalo(hora_inicio, hora_fim):
+    """Chaves 'HH:MM' dos blocos ocupados por [hora_inicio, hora_fim)"""
+    primeiro, ultimo = _faixa_de_blocos(*limites_em_minutos(hora_inicio, hora_fim))
+    return [para_hora(b * GRANULARIDADE) for b in range(primeiro, ultimo)]
+
+class AgendaDia:
+    """Ocupação de um dia (de uma barbearia) em uma árvore de segmentos de máximo"""
+
+    def __init__(self, ocupacao=None):
+        # Folhas em [BLOCOS_DIA, 2 * BLOCOS_DIA); nó i guarda o máximo dos filhos 2i e 2i+1
+        self._arvore = [0] * (2 * BLOCOS_DIA)
+        for hora, ocupadas in (ocupacao or {}).items():
+            self._arvore[BLOCOS_DIA + para_minutos(hora) // GRANULARIDADE] = ocupadas
+        for i in range(BLOCOS_DIA - 1, 0, -1):
+            self._arvore[i] = max(self._arvore[2 * i], self._arvore[2 * i + 1])
+
+    def adicionar(self, hora_inicio, hora_fim, quantidade=1):
+        """Soma ``quantidade`` à ocupação de todos os blocos do intervalo"""
+        primeiro, ultimo = _faixa_de_blocos(*limites_em_minutos(hora_inicio, hora_fim))
+        for bloco in range(primeiro, ultimo):
+            i = BLOCOS_DIA + bloco
+            self._arvore[i] += quantidade
+            i //= 2
+            while i:
+                self._arvore[i] = max(self._arvore[2 * i], self._arvore[2 * i + 1])
+                i //= 2
+
+    def _maximo(self, inicio, fim):
+        primeiro, ultimo = _faixa_de_blocos(inicio, fim)
+        esquerda, direita = primeiro + BLOCOS_DIA, ultimo + BLOCOS_DIA
+        maximo = 0
+        while esquerda < direita:
+            if esquerda & 1:
+                maximo = max(maximo, self._arvore[esquerda])
+                esquerda += 1
+            if direita & 1:
+                direita -= 1
+                maximo = max(maximo, self._arvore[direita])
+            esquerda //= 2
+            direita //= 2
+        return maximo
+
+    def ocupacao_maxima(self, hora_inicio, hora_fim):
+        """Maior ocupação entre os blocos de [hora_inicio, hora_fim)"""
+        return self._maximo(*limites_em_minutos(hora_inicio, hora_fim))
+
+    def cabe(self, hora_inicio, hora_fim, capacidade):
+        """True se ainda há vaga em todo o intervalo [hora_inicio, hora_fim)"""
+        return self.ocupacao_maxima(hora_inicio, hora_fim) < capacidade
+
+    def inicios_viaveis(self, duracao, capacidade, candidatos=None):
+        """Horários de início ('HH:MM') em que um serviço de ``duracao`` minutos cabe.
+
+        ``candidatos`` limita a busca (ex.: horários configurados do dia); sem ele,
+        todos os blocos do dia são considerados.
+        """
+        if candidatos is None:
+            candidatos = [para_hora(b * GRANULARIDADE) for b in range(BLOCOS_DIA)]
+
+        duracao = max(int(duracao or GRANULARIDADE), 1)
+        viaveis = []
+        for hora in candidatos:
+            inicio = para_minutos(hora)
+            fim = inicio + duracao
+            if fim > MINUTOS_DIA:
+                continue
+            if self._maximo(inicio, fim) < capacidade:
+                viaveis.append(hora)
+        return viaveis
@@ -1,20 +1,17 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, g, abort, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, g, abort, send_from_directory, Response
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf.csrf import CSRFProtect
-from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import os
 import sys
 import json
 import uuid
+import hashlib
+import time
 from pathlib import Path
 from jinja2 import ChoiceLoader, FileSystemLoader
-import smtplib
-from email.message import EmailMessage
 from datetime import datetime
 import requests
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.interval import IntervalTrigger
 from whitenoise import WhiteNoise
 
 # Importar módulo de segurança
@@ -22,6 +19,24 @@ from security import (
     sanitize_input, validate_email, validate_phone, validate_password_strength,
     check_rate_limit, record_login_attempt, require_login, get_client_ip, audit_log
 )
+# Canal de eventos em tempo real (SSE) do dashboard
+from eventos import BrokerLocal, BrokerPostgres, HubEventos, criar_broker
+# Agenda em blocos de tempo (conflitos de horário considerando a duração)
+from agenda import AgendaDia, blocos_do_intervalo
+# Consulta de status na API externa de suporte (sincronização de chamados)
+from chamados_sync import ClienteSuporte, mapear_status_api, executar_ciclo
+# Tarefas periódicas com eleição de líder (uma execução por deploy)
+from jobs import ExecutorJobs
+# Cache em memória com expiração (estatísticas e relatórios)
+from cache import CacheTTL
+# Séries temporais dos relatórios de crescimento
+from relatorios import GRANULARIDADES, MAX_PERIODOS, contar_periodos, expressao_periodo, montar_series, periodos
+# Hash de senhas com algoritmo/custo configuráveis (SENHA_METODO)
+from senhas import gerar_hash as gerar_hash_senha, precisa_rehash, verificar_senha
+# Fila de e-mails enviada fora das requisições
+from envio_emails import LOTE_PADRAO as EMAIL_LOTE, criar_backend as criar_backend_email, processar_fila as processar_fila_emails
+# Sessões guardadas no servidor (cookie só com o ID)
+from sessoes import criar_interface as criar_interface_sessoes
 # Legacy session-based login will be used
 
 # Caminhos absolutos
@@ -72,6 +87,10 @@ if database_url and database_url.startswith('postgres://'):
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url or f'sqlite:///{DB_PATH}'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Pub/sub de eventos das reservas (ver eventos.py para EVENTOS_BROKER)
+hub_eventos = HubEventos(criar_broker(app.config['SQLALCHEMY_DATABASE_URI']))
+EVENTOS_STREAM_DURACAO = int(os.environ.get('EVENTOS_STREAM_DURACAO', 600))  # segundos por conexão SSE
+
 # Configuração de upload de imagens - ajustada para Railway
 UPLOAD_FOLDER = os.path.join(BASE_DIR, 'static', 'uploads', 'logos')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
@@ -115,6 +134,8 @@ db = SQLAlchemy(app)
 # Isentar rotas de API da proteção CSRF (somente JSON)
 csrf.exempt('api_agendamentos_hoje')
 csrf.exempt('api_agendamentos_todos')
+csrf.exempt('api_agendamentos_sync')
+csrf.exempt('api_stream')
 csrf.exempt('api_reservas_cliente')
 csrf.exempt('sincronizar_chamados_manual')  # Sincronização manual de chamados
 # Removido CSRF exempt para admin_cancelar_agendamento - deve usar CSRF token
@@ -145,8 +166,8 @@ def set_security_headers(response):
         "connect-src 'self'; "
         "img-src 'self' data:;"
     )
-    # Desabilitar cache para páginas HTML (facilitar desenvolvimento)
-    if response.content_type and 'text/html' in response.content_type:
+    # Desabilitar cache para páginas HTML (exceto as que definem o próprio Cache-Control)
+    if response.content_type and 'text/html' in response.content_type and 'Cache-Control' not in response.headers:
         response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '0'
@@ -160,6 +181,7 @@ sys.path.insert(0, os.path.join(BASE_DIR, 'scripts'))
 
 # Importar sistema multi-tenant após db ser criado
 from tenant import setup_tenant_context, require_tenant, require_admin, require_barbeiro, require_role, get_current_barbearia_id, get_current_barbearia, is_super_admin
+from tenant import buscar_barbearia_ativa, invalidar_cache_barbearia, get_current_usuario, current_user, invalidar_cache_usuario
 
 def require_super_admin(f):
     """Decorator que exige permissão de super admin"""
@@ -172,7 +194,7 @@ def require_super_admin(f):
             return redirect(url_for('super_admin_login'))
         
         # Buscar usuário e verificar tipo
-        usuario = Usuario.query.get(session['usuario_id'])
+        usuario = get_current_usuario(Usuario, db)
         if not usuario:
             session.clear()
             flash('Sessão inválida. Faça login novamente.', 'error')
@@ -187,6 +209,39 @@ def require_super_admin(f):
     return decorated_function
 
 # ---------- MODELOS ----------
+class DataISO(db.TypeDecorator):
+    """Coluna DATE no banco, exposta no Python como texto 'YYYY-MM-DD'.
+    
+    Permite índices e comparações por intervalo no banco sem mudar o formato que
+    rotas, templates e a API JSON já usam.
+    """
+    impl = db.Date
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        from datetime import date
+        if isinstance(value, str):
+            return date.fromisoformat(value)
+        return value
+    
+    def process_result_value(self, value, dialect):
+        return value.isoformat() if value is not None else None
+
+class HoraHM(db.TypeDecorator):
+    """Coluna TIME no banco, exposta no Python como texto 'HH:MM'"""
+    impl = db.Time
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        from datetime import time
+        if isinstance(value, str):
+            horas, minutos = value.split(':')[:2]
+            return time(int(horas), int(minutos))
+        return value
+    
+    def process_result_value(self, value, dialect):
+        return value.strftime('%H:%M') if value is not None else None
+
 class Barbearia(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     uuid = db.Column(db.String(36), unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
@@ -198,6 +253,8 @@ class Barbearia(db.Model):
     logo = db.Column(db.String(200), nullable=True)  # caminho da logo
     ativa = db.Column(db.Boolean, default=True, nullable=False)
     data_criacao = db.Column(db.DateTime, default=db.func.current_timestamp())
+    # Última alteração da página pública (barbearia, serviços ou planos): versão do cache e ETag
+    conteudo_atualizado_em = db.Column(db.DateTime, default=datetime.utcnow)
     
     # CSS personalizado único para cada barbearia
     custom_css = db.Column(db.Text, nullable=True)
@@ -279,16 +336,19 @@ class Usuario(db.Model):
     # Campo telefone do usuário
     telefone = db.Column(db.String(20), nullable=True)
     ativo = db.Column(db.Boolean, default=True, nullable=False)
-    data_criacao = db.Column(db.DateTime, default=db.func.current_timestamp())
+    data_criacao = db.Column(db.DateTime, default=db.func.current_timestamp(), index=True)
     
     # Tipo geral do usuário no sistema
     tipo_conta = db.Column(db.String(20), nullable=False, default='cliente')  # admin_sistema, admin_barbearia, barbeiro, cliente
     
+    # Incrementada a cada alteração do usuário ou dos vínculos (revalida o cache de usuários)
+    versao = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    
     # Relacionamentos
     barbearias = db.relationship('UsuarioBarbearia', back_populates='usuario', cascade="all, delete-orphan")
     
     def set_senha(self, senha_plana):
-        self.senha = generate_password_hash(senha_plana)
+        self.senha = gerar_hash_senha(senha_plana)
         
     def __repr__(self):
         return f'<Usuario {self.nome}>'
@@ -358,20 +418,327 @@ class Reserva(db.Model):
     cliente_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)  # cliente que fez a reserva
     barbeiro_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=True)  # barbeiro responsável
     servico_id = db.Column(db.Integer, db.ForeignKey('servico.id'), nullable=False)
-    data = db.Column(db.String(10), nullable=False)
-    hora_inicio = db.Column(db.String(5), nullable=False)
-    hora_fim = db.Column(db.String(5), nullable=False)
+    data = db.Column(DataISO, nullable=False)         # YYYY-MM-DD
+    hora_inicio = db.Column(HoraHM, nullable=False)   # HH:MM
+    hora_fim = db.Column(HoraHM, nullable=False)      # HH:MM
     status = db.Column(db.String(20), default='agendada')  # agendada, confirmada, cancelada, concluida
     observacoes = db.Column(db.Text, nullable=True)
     data_criacao = db.Column(db.DateTime, default=db.func.current_timestamp())
     
+    # Versão de alteração (monotônica por barbearia) usada pela sincronização incremental
+    versao = db.Column(db.BigInteger, nullable=False, default=0)
+    
     # Relacionamentos
     cliente = db.relationship('Usuario', foreign_keys=[cliente_id], backref='reservas_cliente')
     barbeiro = db.relationship('Usuario', foreign_keys=[barbeiro_id], backref='reservas_barbeiro')
     
+    # Índices no formato das consultas: agenda por dia/período, filtros por status
+    # e reservas do cliente (ver scripts/adicionar_indices_reservas.py)
+    __table_args__ = (
+        db.Index('ix_reserva_barbearia_versao', 'barbearia_id', 'versao'),
+        db.Index('ix_reserva_barbearia_data', 'barbearia_id', 'data', 'hora_inicio'),
+        db.Index('ix_reserva_barbearia_status_data', 'barbearia_id', 'status', 'data'),
+        db.Index('ix_reserva_barbearia_cliente_status', 'barbearia_id', 'cliente_id', 'status'),
+        db.Index('ix_reserva_data_criacao', 'data_criacao', 'barbearia_id'),
+    )
+    
     def __repr__(self):
         return f'<Reserva {self.cliente.nome} - {self.servico.nome} - {self.data} {self.hora_inicio}>'
 
+class ContadorVersao(db.Model):
+    """Último número de versão de reservas emitido para cada barbearia"""
+    __tablename__ = 'contador_versao'
+    
+    barbearia_id = db.Column(db.Integer, db.ForeignKey('barbearia.id'), primary_key=True)
+    versao = db.Column(db.BigInteger, nullable=False, default=0)
+
+class ReservaExcluida(db.Model):
+    """Registro (tombstone) de reservas excluídas, para a sincronização incremental"""
+    __tablename__ = 'reserva_excluida'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    reserva_uuid = db.Column(db.String(36), nullable=False)
+    barbearia_id = db.Column(db.Integer, db.ForeignKey('barbearia.id'), nullable=False)
+    versao = db.Column(db.BigInteger, nullable=False)
+    data_exclusao = db.Column(db.DateTime, default=db.func.current_timestamp())
+    
+    __table_args__ = (
+        db.Index('ix_reserva_excluida_barbearia_versao', 'barbearia_id', 'versao'),
+    )
+
+def proxima_versao_reservas(session, barbearia_id):
+    """Incrementa e retorna o contador de versões da barbearia.
+    
+    O UPDATE bloqueia a linha do contador até o fim da transação, então as versões
+    ficam visíveis na mesma ordem em que são emitidas, mesmo entre vários workers.
+    """
+    conn = session.connection()
+    tabela = ContadorVersao.__table__
+    resultado = conn.execute(
+        tabela.update()
+        .where(tabela.c.barbearia_id == barbearia_id)
+        .values(versao=tabela.c.versao + 1)
+    )
+    if resultado.rowcount == 0:
+        conn.execute(tabela.insert().values(barbearia_id=barbearia_id, versao=1))
+        return 1
+    return conn.execute(
+        db.select(tabela.c.versao).where(tabela.c.barbearia_id == barbearia_id)
+    ).scalar()
+
+def versao_atual_reservas(barbearia_id):
+    """Retorna a última versão de reservas emitida para a barbearia"""
+    versao = db.session.query(ContadorVersao.versao).filter_by(barbearia_id=barbearia_id).scalar()
+    return versao or 0
+
+@db.event.listens_for(db.session, 'before_flush')
+def versionar_reservas(session, flush_context, instances):
+    """Atribui uma nova versão às reservas criadas/alteradas e registra as excluídas"""
+    alteradas = {}
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Reserva) and (obj in session.new or session.is_modified(obj, include_collections=False)):
+            alteradas.setdefault(obj.barbearia_id, []).append(obj)
+    
+    excluidas = {}
+    for obj in session.deleted:
+        if isinstance(obj, Reserva):
+            excluidas.setdefault(obj.barbearia_id, []).append(obj)
+    
+    for barbearia_id in set(alteradas) | set(excluidas):
+        versao = proxima_versao_reservas(session, barbearia_id)
+        session.info.setdefault('reservas_versionadas', {})[barbearia_id] = versao
+        for reserva in alteradas.get(barbearia_id, []):
+            reserva.versao = versao
+        for reserva in excluidas.get(barbearia_id, []):
+            session.add(ReservaExcluida(
+                reserva_uuid=reserva.uuid,
+                barbearia_id=barbearia_id,
+                versao=versao
+            ))
+
+@db.event.listens_for(db.session, 'after_commit')
+def publicar_eventos_reservas(session):
+    """Avisa os dashboards conectados (SSE) das barbearias cujas reservas mudaram"""
+    for barbearia_id, versao in session.info.pop('reservas_versionadas', {}).items():
+        hub_eventos.publicar(barbearia_id, {'tipo': 'reservas', 'versao': versao})
+
+@db.event.listens_for(db.session, 'after_rollback')
+def descartar_eventos_reservas(session):
+    session.info.pop('reservas_versionadas', None)
+
+@db.event.listens_for(db.session, 'before_flush')
+def versionar_usuarios(session, flush_context, instances):
+    """Incrementa Usuario.versao quando o usuário ou algum vínculo dele muda"""
+    versionados = set()
+    for obj in session.dirty:
+        if isinstance(obj, Usuario) and session.is_modified(obj, include_collections=False):
+            # Incremento no próprio UPDATE (versao = versao + 1): o objeto pode ser a
+            # cópia do cache (merge sem load), com uma versão já ultrapassada no banco
+            obj.versao = db.func.coalesce(Usuario.versao, 0) + 1
+            versionados.add(obj.id)
+    
+    vinculos = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, UsuarioBarbearia) and (obj not in session.dirty or session.is_modified(obj, include_collections=False)):
+            usuario_id = obj.usuario_id or (obj.usuario.id if obj.usuario else None)
+            if usuario_id:
+                vinculos.add(usuario_id)
+    
+    pendentes = vinculos - versionados
+    if pendentes:
+        tabela = Usuario.__table__
+        session.connection().execute(
+            tabela.update().where(tabela.c.id.in_(pendentes)).values(versao=tabela.c.versao + 1)
+        )
+    if versionados or vinculos:
+        session.info.setdefault('usuarios_alterados', set()).update(versionados | vinculos)
+
+@db.event.listens_for(db.session, 'after_commit')
+def invalidar_usuarios_alterados(session):
+    for usuario_id in session.info.pop('usuarios_alterados', ()):
+        invalidar_cache_usuario(usuario_id)
+
+@db.event.listens_for(db.session, 'after_rollback')
+def descartar_usuarios_alterados(session):
+    session.info.pop('usuarios_alterados', None)
+
+# Status em que a reserva ocupa uma vaga do horário
+STATUS_OCUPAM_HORARIO = ('agendada', 'confirmada')
+
+class OcupacaoHorario(db.Model):
+    """Contador de vagas ocupadas por (barbearia, data, bloco de horário).
+    
+    Cada reserva ativa soma 1 em todos os blocos de agenda.GRANULARIDADE minutos
+    entre hora_inicio e hora_fim. Mantido na mesma transação das reservas (ver
+    atualizar_ocupacao_horarios), para que a consulta de horários livres não
+    precise ler as reservas.
+    """
+    __tablename__ = 'ocupacao_horario'
+    
+    barbearia_id = db.Column(db.Integer, db.ForeignKey('barbearia.id'), primary_key=True)
+    data = db.Column(db.String(10), primary_key=True)  # YYYY-MM-DD
+    hora = db.Column(db.String(5), primary_key=True)   # HH:MM (início do bloco)
+    ocupadas = db.Column(db.Integer, nullable=False, default=0)
+
+def _valores_reserva(reserva, atributos, anterior=False):
+    """Valores dos atributos da reserva; com ``anterior=True``, os carregados do banco
+    (antes das alterações pendentes na sessão)"""
+    valores = {}
+    estado = db.inspect(reserva)
+    for atributo in atributos:
+        valor = getattr(reserva, atributo)
+        if anterior:
+            historico = estado.attrs[atributo].history
+            if historico.deleted:
+                valor = historico.deleted[0]
+        valores[atributo] = valor
+    # status None = default da coluna ('agendada') ainda não aplicado
+    if 'status' in valores:
+        valores['status'] = valores['status'] or 'agendada'
+    return valores
+
+def _carregar_valor_anterior(reserva, valor, anterior, iniciador):
+    pass
+
+# Atributos usados pelos contadores: ao alterar um atributo expirado (ex.: depois de
+# um commit) o valor do banco é carregado antes, senão o histórico fica sem o anterior
+for _atributo in ('barbearia_id', 'data', 'hora_inicio', 'hora_fim', 'status', 'servico_id', 'barbeiro_id'):
+    db.event.listen(getattr(Reserva, _atributo), 'set', _carregar_valor_anterior, active_history=True)
+
+def _intervalo_ocupado(reserva, anterior=False):
+    """(barbearia_id, data, hora_inicio, hora_fim) ocupado pela reserva, ou None se não ocupa"""
+    valores = _valores_reserva(reserva, ('barbearia_id', 'data', 'hora_inicio', 'hora_fim', 'status'), anterior)
+    if valores['status'] not in STATUS_OCUPAM_HORARIO:
+        return None
+    return (valores['barbearia_id'], valores['data'], valores['hora_inicio'], valores['hora_fim'])
+
+@db.event.listens_for(db.session, 'before_flush')
+def atualizar_ocupacao_horarios(session, flush_context, instances):
+    """Aplica aos contadores de ocupação as reservas criadas, alteradas e excluídas"""
+    deltas = {}
+    
+    def somar(intervalo, quantidade):
+        barbearia_id, data, hora_inicio, hora_fim = intervalo
+        for bloco in blocos_do_intervalo(hora_inicio, hora_fim):
+            chave = (barbearia_id, data, bloco)
+            deltas[chave] = deltas.get(chave, 0) + quantidade
+    
+    for obj in session.new:
+        if isinstance(obj, Reserva):
+            intervalo = _intervalo_ocupado(obj)
+            if intervalo:
+                somar(intervalo, 1)
+    
+    for obj in session.dirty:
+        if isinstance(obj, Reserva) and session.is_modified(obj, include_collections=False):
+            antes, depois = _intervalo_ocupado(obj, anterior=True), _intervalo_ocupado(obj)
+            if antes != depois:
+                if antes:
+                    somar(antes, -1)
+                if depois:
+                    somar(depois, 1)
+    
+    for obj in session.deleted:
+        if isinstance(obj, Reserva):
+            intervalo = _intervalo_ocupado(obj, anterior=True)
+            if intervalo:
+                somar(intervalo, -1)
+    
+    # Um UPDATE por (barbearia, data, delta) cobrindo todos os blocos afetados
+    grupos = {}
+    for (barbearia_id, data, bloco), delta in deltas.items():
+        if delta:
+            grupos.setdefault((barbearia_id, data, delta), []).append(bloco)
+    if not grupos:
+        return
+    
+    conn = session.connection()
+    tabela = OcupacaoHorario.__table__
+    # Ordem fixa: transações concorrentes bloqueiam as linhas na mesma ordem
+    for (barbearia_id, data, delta), blocos in sorted(grupos.items()):
+        filtro = (tabela.c.barbearia_id == barbearia_id, tabela.c.data == data, tabela.c.hora.in_(blocos))
+        resultado = conn.execute(tabela.update().where(*filtro).values(ocupadas=tabela.c.ocupadas + delta))
+        if resultado.rowcount < len(blocos):
+            existentes = set(conn.execute(db.select(tabela.c.hora).where(*filtro)).scalars())
+            conn.execute(tabela.insert(), [
+                {'barbearia_id': barbearia_id, 'data': data, 'hora': bloco, 'ocupadas': max(delta, 0)}
+                for bloco in sorted(blocos) if bloco not in existentes
+            ])
+
+# Status em que a reserva conta como faturada
+STATUS_FATURADOS = ('confirmada', 'concluida')
+
+class FaturamentoDiario(db.Model):
+    """Resumo diário de atendimentos faturados por (barbearia, data, serviço, barbeiro).
+    
+    Mantido na mesma transação das reservas (ver atualizar_faturamento_diario).
+    Guarda apenas a quantidade: o valor é quantidade × preço atual do serviço,
+    o mesmo critério dos relatórios feitos direto sobre as reservas.
+    """
+    __tablename__ = 'faturamento_diario'
+    
+    barbearia_id = db.Column(db.Integer, db.ForeignKey('barbearia.id'), primary_key=True)
+    data = db.Column(db.String(10), primary_key=True)  # YYYY-MM-DD
+    servico_id = db.Column(db.Integer, primary_key=True)
+    barbeiro_id = db.Column(db.Integer, primary_key=True, default=0)  # 0 = sem barbeiro
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+
+def _chave_faturamento(reserva, anterior=False):
+    """(barbearia_id, data, servico_id, barbeiro_id) se a reserva está faturada, senão None"""
+    valores = _valores_reserva(reserva, ('barbearia_id', 'data', 'servico_id', 'barbeiro_id', 'status'), anterior)
+    if valores['status'] not in STATUS_FATURADOS:
+        return None
+    return (valores['barbearia_id'], valores['data'], valores['servico_id'], valores['barbeiro_id'] or 0)
+
+@db.event.listens_for(db.session, 'before_flush')
+def atualizar_faturamento_diario(session, flush_context, instances):
+    """Aplica ao resumo diário as reservas que entram ou saem de confirmada/concluida"""
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Reserva):
+            chave = _chave_faturamento(obj)
+            if chave:
+                deltas[chave] = deltas.get(chave, 0) + 1
+    
+    for obj in session.dirty:
+        if isinstance(obj, Reserva) and session.is_modified(obj, include_collections=False):
+            antes, depois = _chave_faturamento(obj, anterior=True), _chave_faturamento(obj)
+            if antes != depois:
+                if antes:
+                    deltas[antes] = deltas.get(antes, 0) - 1
+                if depois:
+                    deltas[depois] = deltas.get(depois, 0) + 1
+    
+    for obj in session.deleted:
+        if isinstance(obj, Reserva):
+            chave = _chave_faturamento(obj, anterior=True)
+            if chave:
+                deltas[chave] = deltas.get(chave, 0) - 1
+    
+    if not any(deltas.values()):
+        return
+    
+    conn = session.connection()
+    tabela = FaturamentoDiario.__table__
+    for (barbearia_id, data, servico_id, barbeiro_id), delta in sorted(deltas.items()):
+        if delta == 0:
+            continue
+        resultado = conn.execute(
+            tabela.update()
+            .where(
+                tabela.c.barbearia_id == barbearia_id,
+                tabela.c.data == data,
+                tabela.c.servico_id == servico_id,
+                tabela.c.barbeiro_id == barbeiro_id
+            )
+            .values(quantidade=tabela.c.quantidade + delta)
+        )
+        if resultado.rowcount == 0:
+            conn.execute(tabela.insert().values(
+                barbearia_id=barbearia_id, data=data, servico_id=servico_id,
+                barbeiro_id=barbeiro_id, quantidade=max(delta, 0)
+            ))
+
 class Despesa(db.Model):
     """Controle de despesas da barbearia"""
     __tablename__ = 'despesa'
@@ -390,10 +757,20 @@ class Despesa(db.Model):
     criado_por = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
     data_criacao = db.Column(db.DateTime, default=db.func.current_timestamp())
     
+    # Ocorrências geradas a partir de uma despesa recorrente (ver materializar_despesas_recorrentes)
+    despesa_origem_id = db.Column(db.Integer, db.ForeignKey('despesa.id', ondelete='SET NULL'), nullable=True)
+    periodo = db.Column(db.String(7), nullable=True)  # YYYY-MM da ocorrência
+    
     # Relacionamentos
     barbearia = db.relationship('Barbearia', backref='despesas')
     criador = db.relationship('Usuario', backref='despesas_criadas')
     
+    __table_args__ = (
+        db.Index('ix_despesa_barbearia_vencimento', 'barbearia_id', 'data_vencimento'),
+        # Uma ocorrência por despesa recorrente e mês: torna a geração idempotente
+        db.Index('ux_despesa_origem_periodo', 'despesa_origem_id', 'periodo', unique=True),
+    )
+    
     def __repr__(self):
         return f'<Despesa {self.descricao} - R$ {self.valor}>'
     
@@ -404,6 +781,20 @@ class Despesa(db.Model):
         if self.status == 'pendente' and self.data_vencimento < date.today():
             return True
         return False
+    
+    @property
+    def status_atual(self):
+        """Status considerando o vencimento, mesmo antes da tarefa marcar_despesas_atrasadas rodar"""
+        return 'atrasada' if self.esta_atrasada else self.status
+    
+    @classmethod
+    def expressao_status(cls):
+        """Expressão SQL equivalente a status_atual, para filtros e agregações"""
+        from datetime import date
+        return db.case(
+            (db.and_(cls.status == 'pendente', cls.data_vencimento < date.today()), 'atrasada'),
+            else_=cls.status
+        )
 
 class PlanoMensal(db.Model):
     """Planos mensais oferecidos pelas barbearias"""
@@ -481,6 +872,33 @@ class DisponibilidadeSemanal(db.Model):
     def set_config(self, config_dict):
         self.config_json = json.dumps(config_dict)
     
+    # Configuração usada enquanto a semana não for configurada pelo admin
+    CONFIG_PADRAO = {
+        'monday': {'ativo': True, 'horarios': ['09:00', '10:00', '11:00', '14:00', '15:00', '16:00']},
+        'tuesday': {'ativo': True, 'horarios': ['09:00', '10:00', '11:00', '14:00', '15:00', '16:00']},
+        'wednesday': {'ativo': True, 'horarios': ['09:00', '10:00', '11:00', '14:00', '15:00', '16:00']},
+        'thursday': {'ativo': True, 'horarios': ['09:00', '10:00', '11:00', '14:00', '15:00', '16:00']},
+        'friday': {'ativo': True, 'horarios': ['09:00', '10:00', '11:00', '14:00', '15:00', '16:00']},
+        'saturday': {'ativo': False, 'horarios': []},
+        'sunday': {'ativo': False, 'horarios': []}
+    }
+    
+    @staticmethod
+    def configs_das_semanas(barbearia_id, inicios_semana, barbeiro_id=None):
+        """Configurações das semanas informadas (segundas-feiras 'YYYY-MM-DD'), sem gravar nada.
+        
+        Retorna {data_inicio: config}; semanas ainda não configuradas recebem CONFIG_PADRAO.
+        """
+        configs = {inicio: DisponibilidadeSemanal.CONFIG_PADRAO for inicio in inicios_semana}
+        semanas = DisponibilidadeSemanal.query.filter(
+            DisponibilidadeSemanal.barbearia_id == barbearia_id,
+            DisponibilidadeSemanal.barbeiro_id == barbeiro_id,
+            DisponibilidadeSemanal.data_inicio.in_(list(configs))
+        ).all()
+        for semana in semanas:
+            configs[semana.data_inicio] = semana.get_config()
+        return configs
+    
     @staticmethod
     def get_ou_criar_semana(data_str, barbearia_id, barbeiro_id=None):
         """Obtém ou cria a configuração para a semana da data fornecida"""
@@ -505,22 +923,12 @@ class DisponibilidadeSemanal(db.Model):
         
         if not config_semana:
             # Criar configuração padrão para a semana
-            config_padrao = {
-                'monday': {'ativo': True, 'horarios': ['09:00', '10:00', '11:00', '14:00', '15:00', '16:00']},
-                'tuesday': {'ativo': True, 'horarios': ['09:00', '10:00', '11:00', '14:00', '15:00', '16:00']},
-                'wednesday': {'ativo': True, 'horarios': ['09:00', '10:00', '11:00', '14:00', '15:00', '16:00']},
-                'thursday': {'ativo': True, 'horarios': ['09:00', '10:00', '11:00', '14:00', '15:00', '16:00']},
-                'friday': {'ativo': True, 'horarios': ['09:00', '10:00', '11:00', '14:00', '15:00', '16:00']},
-                'saturday': {'ativo': False, 'horarios': []},
-                'sunday': {'ativo': False, 'horarios': []}
-            }
-            
             config_semana = DisponibilidadeSemanal(
                 barbearia_id=barbearia_id,
                 barbeiro_id=barbeiro_id,
                 data_inicio=data_inicio_str,
                 data_fim=data_fim_str,
-                config_json=json.dumps(config_padrao)
+                config_json=json.dumps(DisponibilidadeSemanal.CONFIG_PADRAO)
             )
             db.session.add(config_semana)
             db.session.commit()
@@ -554,11 +962,98 @@ class Chamado(db.Model):
     resposta_api = db.Column(db.Text)  # Resposta da API externa
     api_chamado_id = db.Column(db.String(100))  # ID retornado pela API externa
     
+    # Agenda adaptativa de sincronização com a API (ver chamados_sync.py)
+    intervalo_sincronizacao = db.Column(db.Integer)  # segundos
+    proxima_sincronizacao = db.Column(db.DateTime, index=True)  # None: consultar no próximo ciclo
+    
     # Relacionamentos
     barbearia = db.relationship('Barbearia', backref=db.backref('chamados', lazy=True))
     usuario = db.relationship('Usuario', backref=db.backref('chamados', lazy=True))
 
+class JobLease(db.Model):
+    """Lease de líder do executor de tarefas periódicas (um único dono por vez)"""
+    __tablename__ = 'job_lease'
+
+    nome = db.Column(db.String(50), primary_key=True)
+    dono = db.Column(db.String(120), nullable=False)
+    expira_em = db.Column(db.DateTime, nullable=False)
+
+class JobExecucao(db.Model):
+    """Métricas acumuladas de cada tarefa periódica (exibidas em /_jobs)"""
+    __tablename__ = 'job_execucao'
+
+    nome = db.Column(db.String(50), primary_key=True)
+    dono = db.Column(db.String(120))  # processo que executou por último
+    execucoes = db.Column(db.Integer, nullable=False, default=0)
+    falhas = db.Column(db.Integer, nullable=False, default=0)
+    ultima_execucao = db.Column(db.DateTime)
+    ultima_duracao = db.Column(db.Float)
+    duracao_total = db.Column(db.Float, nullable=False, default=0)
+    duracao_maxima = db.Column(db.Float, nullable=False, default=0)
+    ultimo_erro = db.Column(db.Text)
+    proxima_execucao = db.Column(db.DateTime)
+    execucoes_sem_lease = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # lease perdido durante a execução
+
+class EmailFila(db.Model):
+    """E-mails a enviar; gravados pelas rotas e entregues pela tarefa 'enviar_emails'"""
+    __tablename__ = 'email_fila'
+
+    id = db.Column(db.Integer, primary_key=True)
+    remetente = db.Column(db.String(200), nullable=False)
+    destino = db.Column(db.String(200), nullable=False)
+    assunto = db.Column(db.String(200), nullable=False)
+    corpo_html = db.Column(db.Text, nullable=False)
+    corpo_texto = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False, default='pendente')  # pendente, enviado, falhou
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    proxima_tentativa = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    ultimo_erro = db.Column(db.Text)
+    data_criacao = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    enviado_em = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_email_fila_status_proxima', 'status', 'proxima_tentativa'),
+    )
+
+class Sessao(db.Model):
+    """Dados das sessões (SESSAO_BACKEND=banco); o id é o SHA-256 do ID do cookie"""
+    __tablename__ = 'sessao'
+
+    id = db.Column(db.String(64), primary_key=True)
+    dados = db.Column(db.Text, nullable=False)
+    expira_em = db.Column(db.DateTime, nullable=False, index=True)
+    usuario_id = db.Column(db.Integer, index=True)
+    barbearia_id = db.Column(db.Integer)
+
+# Sessões no servidor (SESSAO_BACKEND=cookie mantém a sessão assinada em cookie)
+interface_sessoes = criar_interface_sessoes(db, Sessao)
+if interface_sessoes:
+    app.session_interface = interface_sessoes
+
+def encerrar_sessoes_usuario(usuario_id):
+    """Desconecta o usuário em todos os dispositivos (sem efeito com sessão em cookie)"""
+    if interface_sessoes:
+        removidas = interface_sessoes.encerrar_sessoes_usuario(usuario_id)
+        print(f"🔒 [SESSAO] {removidas} sessões do usuário {usuario_id} encerradas")
+
 # ---------- UTIL ---------- 
+def autenticar_usuario(usuario, senha):
+    """Confere a senha (com o mesmo custo se o usuário não existe) e regrava hashes fora da política"""
+    if not verificar_senha(usuario.senha if usuario else None, senha):
+        return False
+    if precisa_rehash(usuario.senha):
+        usuario.set_senha(senha)
+        db.session.commit()
+    return True
+
+def limites_do_mes(mes):
+    """(primeiro dia, primeiro dia do mês seguinte) de 'YYYY-MM', para filtros por intervalo"""
+    from datetime import date
+    ano, mes = (int(parte) for parte in mes.split('-')[:2])
+    inicio = date(ano, mes, 1)
+    proximo = date(ano + 1, 1, 1) if mes == 12 else date(ano, mes + 1, 1)
+    return inicio, proximo
+
 def check_required_templates(required):
     available = set()
     try:
@@ -631,6 +1126,13 @@ def before_request():
 
 # ---------- FUNÇÕES HELPER ----------
 
+def get_barbearia_por_slug(slug):
+    """Obtém a barbearia ativa do slug, reutilizando o contexto do tenant e o cache"""
+    tenant = getattr(g, 'tenant', None)
+    if tenant and tenant.barbearia and tenant.barbearia.slug == slug:
+        return tenant.barbearia
+    return buscar_barbearia_ativa(slug=slug, Barbearia=Barbearia, db=db)
+
 def get_current_barbearia_slug():
     """Obtém o slug da barbearia atual do contexto"""
     try:
@@ -650,52 +1152,220 @@ def get_current_barbearia_slug():
         return 'principal'
 
 
-def enviar_email_reset(destino, assunto, corpo_html, corpo_texto=None):
-    """Modo de teste: imprime o link no console. Se variáveis SMTP estiverem configuradas, tenta enviar."""
-    try:
-        mail_from = os.environ.get('MAIL_FROM') or f'no-reply@{get_current_barbearia_slug()}.local'
-
-        # Imprime no console (modo teste)
-        print(f"[EMAIL-TEST] Para: {destino}")
-        print(f"[EMAIL-TEST] Assunto: {assunto}")
-        print(f"[EMAIL-TEST] HTML:\n{corpo_html}")
-
-        # Se houver configuração SMTP correta, tenta enviar de verdade
-        smtp_host = os.environ.get('SMTP_HOST')
-        smtp_port = os.environ.get('SMTP_PORT')
-        smtp_user = os.environ.get('SMTP_USER')
-        smtp_pass = os.environ.get('SMTP_PASS')
-        smtp_starttls = os.environ.get('SMTP_STARTTLS', 'false').lower() in ('1', 'true', 'yes')
-
-        if smtp_host and smtp_port and smtp_user and smtp_pass:
-            msg = EmailMessage()
-            msg['Subject'] = assunto
-            msg['From'] = mail_from
-            msg['To'] = destino
-            msg.set_content(corpo_texto or 'Verifique o HTML do e-mail')
-            msg.add_alternative(corpo_html, subtype='html')
-            try:
-                port = int(smtp_port)
-                if smtp_starttls:
-                    # Porta típica 587 (STARTTLS)
-                    with smtplib.SMTP(smtp_host, port) as server:
-                        server.ehlo()
-                        server.starttls()
-                        server.login(smtp_user, smtp_pass)
-                        server.send_message(msg)
-                else:
-                    # Usa SSL direto (porta típica 465)
-                    with smtplib.SMTP_SSL(smtp_host, port) as server:
-                        server.login(smtp_user, smtp_pass)
-                        server.send_message(msg)
+def enfileirar_email(destino, assunto, corpo_html, corpo_texto=None):
+    """Grava o e-mail na fila (envio pela tarefa 'enviar_emails'); o commit fica com quem chama"""
+    mail_from = os.environ.get('MAIL_FROM') or f'no-reply@{get_current_barbearia_slug()}.local'
+    email = EmailFila(
+        remetente=mail_from,
+        destino=destino,
+        assunto=assunto,
+        corpo_html=corpo_html,
+        corpo_texto=corpo_texto
+    )
+    db.session.add(email)
+    return email
 
-                print('[EMAIL-TEST] E-mail enviado via SMTP')
-            except Exception as e:
-                print('[EMAIL-TEST] Falha ao enviar via SMTP:', e)
-        else:
-            print('[EMAIL-TEST] SMTP não configurado completamente; envio real não tentado')
-    except Exception as e:
-        print('[EMAIL-TEST] Erro ao preparar email:', e)
+# ---------- CONSULTAS DE RESERVAS ----------
+
+def buscar_assinaturas_ativas(cliente_ids, barbearia_id):
+    """Retorna {cliente_id: AssinaturaPlano} com a assinatura ativa de cada cliente na barbearia"""
+    from sqlalchemy.orm import contains_eager
+    
+    cliente_ids = list(cliente_ids)
+    assinaturas_por_cliente = {}
+    # Lotes para respeitar o limite de parâmetros do SQLite
+    for i in range(0, len(cliente_ids), 500):
+        assinaturas = AssinaturaPlano.query.join(
+            PlanoMensal, AssinaturaPlano.plano_id == PlanoMensal.id
+        ).options(
+            contains_eager(AssinaturaPlano.plano)
+        ).filter(
+            AssinaturaPlano.cliente_id.in_(cliente_ids[i:i + 500]),
+            AssinaturaPlano.status == 'ativa',
+            PlanoMensal.barbearia_id == barbearia_id
+        ).all()
+        for assinatura in assinaturas:
+            assinaturas_por_cliente.setdefault(assinatura.cliente_id, assinatura)
+    return assinaturas_por_cliente
+
+def carregar_reservas_enriquecidas(query, barbearia_id):
+    """Executa a query de reservas com cliente, serviço e barbeiro carregados e
+    anota em cada reserva os dados do plano ativo do cliente (tem_plano, plano_nome,
+    sem_cortes_restantes) usando uma única consulta de assinaturas"""
+    from sqlalchemy.orm import joinedload
+    
+    reservas = query.options(
+        joinedload(Reserva.cliente),
+        joinedload(Reserva.servico),
+        joinedload(Reserva.barbeiro)
+    ).all()
+    
+    assinaturas = buscar_assinaturas_ativas({r.cliente_id for r in reservas}, barbearia_id)
+    for reserva in reservas:
+        assinatura = assinaturas.get(reserva.cliente_id) if reserva.cliente else None
+        reserva.tem_plano = assinatura is not None
+        reserva.plano_nome = assinatura.plano.nome if assinatura else None
+        reserva.sem_cortes_restantes = bool(assinatura) and assinatura.atendimentos_restantes == 0
+    return reservas
+
+def serializar_reserva(r):
+    """Converte uma reserva enriquecida no formato JSON usado pelo dashboard admin"""
+    return {
+        'id': r.id,
+        'uuid': r.uuid,
+        'cliente_id': r.cliente_id,
+        'cliente_nome': r.cliente.nome if r.cliente else 'Cliente Desconhecido',
+        'cliente_telefone': r.cliente.telefone if r.cliente and r.cliente.telefone else 'Não informado',
+        'tem_plano': r.tem_plano,
+        'plano_nome': r.plano_nome,
+        'servico_id': r.servico_id,
+        'servico_nome': r.servico.nome if r.servico else 'Serviço N/A',
+        'servico_duracao': r.servico.duracao if r.servico else 30,
+        'servico_preco': r.servico.preco if r.servico else 0,
+        'data': r.data,
+        'hora_inicio': r.hora_inicio,
+        'hora_fim': r.hora_fim,
+        'status': r.status
+    }
+
+# ---------- DISPONIBILIDADE DE HORÁRIOS ----------
+
+# Chaves do config_json de DisponibilidadeSemanal, na ordem de date.weekday()
+DIAS_SEMANA = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+def capacidade_por_horario(barbearia):
+    """Quantos clientes a barbearia atende no mesmo horário (vagas_por_horario)"""
+    try:
+        return max(int(barbearia.get_configuracoes().get('vagas_por_horario', 1)), 1)
+    except (TypeError, ValueError):
+        return 1
+
+def inicio_da_semana(data):
+    """Segunda-feira ('YYYY-MM-DD') da semana de uma date"""
+    from datetime import timedelta
+    return (data - timedelta(days=data.weekday())).strftime('%Y-%m-%d')
+
+def config_do_dia(barbearia_id, data):
+    """Configuração ({'ativo', 'horarios'}) de uma date, sem criar a semana no banco"""
+    semana = inicio_da_semana(data)
+    config = DisponibilidadeSemanal.configs_das_semanas(barbearia_id, [semana])[semana]
+    return config.get(DIAS_SEMANA[data.weekday()], {'ativo': False, 'horarios': []})
+
+def ocupacao_maxima_no_banco(barbearia_id, data, hora_inicio, hora_fim):
+    """Maior ocupação entre os blocos de [hora_inicio, hora_fim), lida do banco (não da sessão)"""
+    return db.session.execute(
+        db.select(db.func.max(OcupacaoHorario.ocupadas)).where(
+            OcupacaoHorario.barbearia_id == barbearia_id,
+            OcupacaoHorario.data == data,
+            OcupacaoHorario.hora.in_(blocos_do_intervalo(hora_inicio, hora_fim))
+        )
+    ).scalar() or 0
+
+def carregar_agendas(barbearia_id, data_inicio, data_fim):
+    """AgendaDia de cada data ('YYYY-MM-DD') do intervalo, em uma consulta pela PK"""
+    ocupacao = {}
+    linhas = db.session.query(OcupacaoHorario.data, OcupacaoHorario.hora, OcupacaoHorario.ocupadas).filter(
+        OcupacaoHorario.barbearia_id == barbearia_id,
+        OcupacaoHorario.data.between(data_inicio, data_fim),
+        OcupacaoHorario.ocupadas > 0
+    )
+    for data, hora, ocupadas in linhas:
+        ocupacao.setdefault(data, {})[hora] = ocupadas
+    return {data: AgendaDia(blocos) for data, blocos in ocupacao.items()}
+
+def horarios_livres(barbearia, data_inicio, dias=1, duracao=None):
+    """Horários configurados em que cabe um atendimento, para cada dia de [data_inicio, data_inicio + dias).
+    
+    Com ``duracao`` (minutos) o atendimento inteiro precisa caber na capacidade;
+    sem ela verifica-se apenas o bloco do início. Usa duas consultas
+    independentemente do número de reservas: as configurações das semanas
+    envolvidas e os contadores de ocupação do intervalo.
+    Retorna {'YYYY-MM-DD': ['HH:MM', ...]}.
+    """
+    from datetime import timedelta
+    
+    datas = [data_inicio + timedelta(days=i) for i in range(dias)]
+    configs = DisponibilidadeSemanal.configs_das_semanas(barbearia.id, {inicio_da_semana(d) for d in datas})
+    capacidade = capacidade_por_horario(barbearia)
+    agendas = carregar_agendas(barbearia.id, datas[0].strftime('%Y-%m-%d'), datas[-1].strftime('%Y-%m-%d'))
+    agenda_vazia = AgendaDia()
+    
+    resultado = {}
+    for data in datas:
+        data_str = data.strftime('%Y-%m-%d')
+        dia_config = configs[inicio_da_semana(data)].get(DIAS_SEMANA[data.weekday()], {})
+        if not dia_config.get('ativo', False):
+            resultado[data_str] = []
+            continue
+        agenda = agendas.get(data_str, agenda_vazia)
+        resultado[data_str] = agenda.inicios_viaveis(duracao, capacidade, dia_config.get('horarios', []))
+    
+    return resultado
+
+def duracao_do_servico(barbearia_id, servico_id):
+    """Duração (minutos) de um serviço da barbearia, ou None se não informado/inexistente"""
+    if not servico_id:
+        return None
+    servico = Servico.query.filter_by(id=servico_id, barbearia_id=barbearia_id).first()
+    return servico.duracao if servico else None
+
+# ---------- RELATÓRIOS DE FATURAMENTO ----------
+# Agregações sobre o resumo faturamento_diario (GROUP BY no banco); retornam tuplas
+# simples e não dependem do tamanho do histórico de reservas
+
+def _consulta_faturamento(inicio, fim, *colunas, barbearia_id=None):
+    """SELECT colunas, quantidade, valor do resumo diário em [inicio, fim] ('YYYY-MM-DD').
+    
+    Sem ``barbearia_id`` considera todas as barbearias (relatórios do super admin).
+    """
+    consulta = db.session.query(
+        *colunas,
+        db.func.coalesce(db.func.sum(FaturamentoDiario.quantidade), 0),
+        db.func.coalesce(db.func.sum(FaturamentoDiario.quantidade * Servico.preco), 0)
+    ).join(Servico, FaturamentoDiario.servico_id == Servico.id).filter(
+        FaturamentoDiario.data >= inicio,
+        FaturamentoDiario.data <= fim,
+        FaturamentoDiario.quantidade > 0
+    )
+    if barbearia_id is not None:
+        consulta = consulta.filter(FaturamentoDiario.barbearia_id == barbearia_id)
+    return consulta
+
+def faturamento_por_dia(barbearia_id, inicio, fim):
+    """[(data, quantidade, valor)] de cada dia com faturamento no intervalo"""
+    return _consulta_faturamento(
+        inicio, fim, FaturamentoDiario.data, barbearia_id=barbearia_id
+    ).group_by(FaturamentoDiario.data).all()
+
+def faturamento_por_mes(barbearia_id, inicio, fim):
+    """[('YYYY-MM', quantidade, valor)] de cada mês com faturamento no intervalo"""
+    mes = db.func.substr(FaturamentoDiario.data, 1, 7)
+    return _consulta_faturamento(inicio, fim, mes, barbearia_id=barbearia_id).group_by(mes).all()
+
+def faturamento_por_servico(barbearia_id, inicio, fim, limite=None):
+    """[(servico_nome, quantidade, valor)] ordenado pelos mais vendidos"""
+    consulta = _consulta_faturamento(inicio, fim, Servico.nome, barbearia_id=barbearia_id).group_by(
+        Servico.id, Servico.nome
+    ).order_by(db.func.sum(FaturamentoDiario.quantidade).desc())
+    return consulta.limit(limite).all() if limite else consulta.all()
+
+def faturamento_por_barbeiro(barbearia_id, inicio, fim, limite=None):
+    """[(barbeiro_nome, quantidade, valor)] ordenado pelo maior faturamento"""
+    consulta = _consulta_faturamento(inicio, fim, Usuario.nome, barbearia_id=barbearia_id).join(
+        Usuario, FaturamentoDiario.barbeiro_id == Usuario.id
+    ).group_by(Usuario.id, Usuario.nome).order_by(
+        db.func.sum(FaturamentoDiario.quantidade * Servico.preco).desc()
+    )
+    return consulta.limit(limite).all() if limite else consulta.all()
+
+def faturamento_por_barbearia(inicio, fim):
+    """{barbearia_id: (quantidade, valor)} de todas as barbearias no intervalo"""
+    return {
+        barbearia_id: (quantidade, valor)
+        for barbearia_id, quantidade, valor in _consulta_faturamento(
+            inicio, fim, FaturamentoDiario.barbearia_id
+        ).group_by(FaturamentoDiario.barbearia_id)
+    }
 
 @app.template_filter('format_phone')
 def format_phone(value):
@@ -729,7 +1399,7 @@ def index_login():
             Usuario.tipo_conta == 'super_admin'
         ).first()
         
-        if usuario and check_password_hash(usuario.senha, senha):
+        if autenticar_usuario(usuario, senha):
             session['usuario_id'] = usuario.id
             return redirect('/selecionar_barbearia')
         else:
@@ -743,7 +1413,7 @@ def selecionar_barbearia():
     if 'usuario_id' not in session:
         return redirect('/')
     
-    usuario = Usuario.query.get(session['usuario_id'])
+    usuario = get_current_usuario(Usuario, db)
     if not usuario or usuario.tipo_conta != 'super_admin':
         return redirect('/')
     
@@ -756,20 +1426,52 @@ def admin_index():
     barbearias = Barbearia.query.filter_by(ativa=True).all()
     return render_template('barbearias_lista.html', barbearias=barbearias)
 
+# ---------- CACHE DE PLANOS ----------
+
+PLANOS_CACHE_TTL = int(os.environ.get('PLANOS_CACHE_TTL', 300))  # segundos
+cache_planos = CacheTTL(PLANOS_CACHE_TTL)
+
+def _carregar_planos_ativos(barbearia_id):
+    """Cópias desanexadas dos planos ativos da barbearia, para guardar no cache"""
+    from sqlalchemy import inspect as sa_inspect
+    from sqlalchemy.orm import make_transient_to_detached
+    
+    colunas = [attr.key for attr in sa_inspect(PlanoMensal).column_attrs]
+    copias = []
+    for plano in PlanoMensal.query.filter_by(barbearia_id=barbearia_id, ativo=True).order_by(PlanoMensal.id):
+        copia = PlanoMensal(**{coluna: getattr(plano, coluna) for coluna in colunas})
+        make_transient_to_detached(copia)
+        copias.append(copia)
+    return copias
+
+def planos_ativos(barbearia_id):
+    """Planos ativos da barbearia, do cache do processo"""
+    copias = cache_planos.obter(barbearia_id, lambda: _carregar_planos_ativos(barbearia_id))
+    # merge sem load não consulta o banco: anexa as cópias à sessão do request
+    return [db.session.merge(plano, load=False) for plano in copias]
+
+def tem_planos_ativos(barbearia_id):
+    return bool(cache_planos.obter(barbearia_id, lambda: _carregar_planos_ativos(barbearia_id)))
+
+def invalidar_cache_planos(barbearia_id=None):
+    """Remove os planos de uma barbearia (ou de todas) do cache do processo"""
+    cache_planos.invalidar(barbearia_id)
+
 # ============= REDIRECIONAMENTOS LEGADOS =============
 @app.context_processor
 def inject_planos_navbar():
-    """Injeta a variável tem_planos em todos os templates para controle da navbar"""
-    def check_planos():
-        try:
-            from tenant import get_current_barbearia_id
-            b_id = get_current_barbearia_id()
-            if b_id:
-                return PlanoMensal.query.filter_by(barbearia_id=b_id, ativo=True).count() > 0
-            return False
-        except:
-            return False
-    return dict(tem_planos_sistema=check_planos())
+    """Injeta a variável tem_planos_sistema em todos os templates para controle da navbar"""
+    class TemPlanos:
+        # Avaliado só quando o template usa a variável (apenas a navbar do cliente)
+        def __bool__(self):
+            if not hasattr(self, 'valor'):
+                try:
+                    b_id = get_current_barbearia_id()
+                    self.valor = bool(b_id) and tem_planos_ativos(b_id)
+                except Exception:
+                    self.valor = False
+            return self.valor
+    return dict(tem_planos_sistema=TemPlanos())
 
 @app.route('/nova_reserva')
 def nova_reserva_redirect():
@@ -786,12 +1488,91 @@ def cadastro_redirect():
     """Redireciona /cadastro para barbearia principal"""
     return redirect(url_for('cadastro', slug='principal'))
 
+# ---------- CACHE DA PÁGINA PÚBLICA ----------
+
+PAGINA_PUBLICA_CACHE_TTL = int(os.environ.get('PAGINA_PUBLICA_CACHE_TTL', 600))  # segundos
+cache_paginas_publicas = CacheTTL(PAGINA_PUBLICA_CACHE_TTL)
+
+# Entra no ETag: um deploy que muda o template não devolve 304 com a página antiga
+with open(os.path.join(TEMPLATES_DIR, 'barbearia_home.html'), 'rb') as _arquivo:
+    VERSAO_TEMPLATE_PUBLICO = hashlib.sha1(_arquivo.read()).hexdigest()[:8]
+
+@db.event.listens_for(db.session, 'before_flush')
+def marcar_paginas_publicas_alteradas(session, flush_context, instances):
+    """Atualiza Barbearia.conteudo_atualizado_em quando a barbearia, serviços ou planos mudam"""
+    agora = datetime.utcnow()
+    atualizadas = set()
+    for obj in session.dirty:
+        if isinstance(obj, Barbearia) and session.is_modified(obj, include_collections=False):
+            obj.conteudo_atualizado_em = agora
+            atualizadas.add(obj.id)
+    
+    alteradas = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Servico, PlanoMensal)) and (obj not in session.dirty or session.is_modified(obj, include_collections=False)):
+            if obj.barbearia_id:
+                alteradas.add(obj.barbearia_id)
+    
+    pendentes = alteradas - atualizadas
+    if pendentes:
+        tabela = Barbearia.__table__
+        session.connection().execute(
+            tabela.update().where(tabela.c.id.in_(pendentes)).values(conteudo_atualizado_em=agora)
+        )
+    if atualizadas or alteradas:
+        session.info.setdefault('paginas_publicas_alteradas', set()).update(atualizadas | alteradas)
+
+@db.event.listens_for(db.session, 'after_commit')
+def invalidar_paginas_publicas(session):
+    for barbearia_id in session.info.pop('paginas_publicas_alteradas', ()):
+        # A versão nova só é vista depois de recarregar a barbearia do cache de tenants
+        invalidar_cache_barbearia(barbearia_id)
+        cache_paginas_publicas.invalidar_onde(lambda chave: chave[0] == barbearia_id)
+
+@db.event.listens_for(db.session, 'after_rollback')
+def descartar_paginas_publicas_alteradas(session):
+    session.info.pop('paginas_publicas_alteradas', None)
+
+def renderizar_pagina_publica(barbearia):
+    """HTML da página pública, com serviços e planos lidos do banco (só em falta no cache)"""
+    servicos = Servico.query.filter_by(barbearia_id=barbearia.id, ativo=True).all()
+    planos = PlanoMensal.query.filter_by(barbearia_id=barbearia.id, ativo=True).order_by(PlanoMensal.id).all()
+    return render_template('barbearia_home.html', 
+                         barbearia=barbearia, 
+                         servicos=servicos,
+                         planos=planos)
+
+def resposta_pagina_publica(barbearia):
+    """Página pública do cache do processo (chave: barbearia e versão do conteúdo), com ETag/Last-Modified"""
+    from datetime import timezone
+    
+    versao = barbearia.conteudo_atualizado_em
+    etag = f"{barbearia.id}-{versao:%Y%m%d%H%M%S%f}-{VERSAO_TEMPLATE_PUBLICO}"
+    ultima_alteracao = versao.replace(microsecond=0, tzinfo=timezone.utc)
+    
+    if request.if_none_match:
+        nao_modificada = request.if_none_match.contains(etag)
+    else:
+        nao_modificada = bool(request.if_modified_since and request.if_modified_since >= ultima_alteracao)
+    
+    if nao_modificada:
+        resposta = Response(status=304)
+    else:
+        resposta = Response(cache_paginas_publicas.obter(
+            (barbearia.id, versao), lambda: renderizar_pagina_publica(barbearia)
+        ))
+    resposta.set_etag(etag)
+    resposta.last_modified = ultima_alteracao
+    # O navegador guarda a página, mas confirma a versão a cada visita (304 se não mudou)
+    resposta.cache_control.no_cache = True
+    return resposta
+
 # ============= ÁREA PÚBLICA (CLIENTES) =============
 @app.route('/<slug>')
 def barbearia_publica(slug):
     """Página pública de uma barbearia específica"""
     try:
-        barbearia = Barbearia.query.filter_by(slug=slug, ativa=True).first()
+        barbearia = get_barbearia_por_slug(slug)
         if not barbearia:
             return f"""
             <html>
@@ -803,12 +1584,12 @@ def barbearia_publica(slug):
             </html>
             """
         
-        # Define contexto da barbearia
-        session['barbearia_id'] = barbearia.id
+        # Define contexto da barbearia (visitantes anônimos não recebem cookie de sessão)
+        if 'usuario_id' in session:
+            session['barbearia_id'] = barbearia.id
         
         # Mostra página da barbearia com serviços e planos ativos
-        servicos = Servico.query.filter_by(barbearia_id=barbearia.id, ativo=True).all()
-        planos = PlanoMensal.query.filter_by(barbearia_id=barbearia.id, ativo=True).all()
+        return resposta_pagina_publica(barbearia)
     except Exception as e:
         db.session.rollback()
         app.logger.error(f"Erro ao carregar barbearia {slug}: {str(e)}")
@@ -821,25 +1602,24 @@ def barbearia_publica(slug):
         </body>
         </html>
         """, 500
-    
-    return render_template('barbearia_home.html', 
-                         barbearia=barbearia, 
-                         servicos=servicos,
-                         planos=planos)
 
 @app.route('/recuperar_senha', methods=['GET','POST'])
 def recuperar_senha():
     if request.method == 'POST':
         # Rate limiting por IP
         client_ip = get_client_ip()
-        allowed, remaining, lockout_seconds = check_rate_limit(client_ip, max_attempts=3, window=300) # 3 tentativas a cada 5 min
+        chave_limite = f'recuperar_senha:{client_ip}'
+        allowed, remaining, lockout_seconds = check_rate_limit(chave_limite, max_attempts=3, window=300) # 3 tentativas a cada 5 min
         
         if not allowed:
-            minutes = lockout_seconds // 60
+            minutes = max(1, lockout_seconds // 60)
             flash(f'Muitas solicitações. Tente novamente em {minutes} minutos.', 'error')
             audit_log('recuperar_senha_blocked', details={'ip': client_ip})
             return render_template('recuperar_senha.html')
 
+        # Toda solicitação conta para o limite, exista ou não a conta
+        record_login_attempt(chave_limite, success=False, window=300)
+
         email = sanitize_input(request.form.get('email','').strip())
         mensagem_generica = 'Se houver uma conta com este e-mail, você receberá um link para recuperação.'
         if not email:
@@ -854,12 +1634,20 @@ def recuperar_senha():
         rec = RecuperacaoSenha(usuario_id=usuario.id)
         rec.gerar_token(horas_validade=1)
         db.session.add(rec)
-        db.session.commit()
 
         link = url_for('recuperar_senha_token', token=rec.token, _external=True)
         print(f"[INFO] Recuperação de senha solicitada para {usuario.email} - link: {link}")
         html = render_template('emails/reset_senha.html', usuario=usuario, link=link, validade_horas=1)
-        enviar_email_reset(usuario.email, 'Recuperação de senha', html)
+        # Só enfileira: o envio (SMTP) acontece fora da requisição
+        enfileirar_email(usuario.email, 'Recuperação de senha', html)
+        db.session.commit()
+        if not executor_jobs.ativo:
+            # Sem executor neste processo (ex.: JOBS_ATIVOS=0) ninguém esvaziaria a fila
+            try:
+                enviar_emails()
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️ [EMAIL] Erro ao enviar e-mails da fila: {e}")
 
         flash('Se enviamos um e-mail, verifique sua caixa de entrada (ou console do servidor em modo teste).', 'info')
         return redirect(url_for('recuperar_senha'))
@@ -903,6 +1691,7 @@ def recuperar_senha_token(token):
             rec.usado = True
             rec.data_uso = datetime.utcnow()
             db.session.commit()
+            encerrar_sessoes_usuario(usuario.id)
             
             audit_log('SUCCESS_PASSWORD_RESET', user_id=usuario.id, details="Senha alterada via token")
             flash('Sua senha foi alterada com sucesso! Agora você pode fazer login.', 'success')
@@ -925,7 +1714,7 @@ def recuperar_senha_token(token):
 @app.route('/<slug>/login', methods=['GET','POST'])
 def login(slug):
     # Verificar se a barbearia existe
-    barbearia = Barbearia.query.filter_by(slug=slug, ativa=True).first()
+    barbearia = get_barbearia_por_slug(slug)
     if not barbearia:
         return redirect('/')
     
@@ -938,11 +1727,12 @@ def login(slug):
     if request.method == 'POST':
         # Rate limiting por IP
         client_ip = get_client_ip()
+        chave_limite = f'login:{client_ip}'  # compartilhado com o login do super admin
         
-        allowed, remaining, lockout_seconds = check_rate_limit(client_ip)
+        allowed, remaining, lockout_seconds = check_rate_limit(chave_limite)
         
         if not allowed:
-            minutes = lockout_seconds // 60
+            minutes = max(1, lockout_seconds // 60)
             flash(f'Muitas tentativas de login. Tente novamente em {minutes} minutos.', 'error')
             audit_log('login_blocked', details={'ip': client_ip, 'slug': slug})
             return render_template('cliente/login.html', barbearia=barbearia)
@@ -961,7 +1751,7 @@ def login(slug):
             Usuario.ativo == True
         ).first()
         
-        if usuario and check_password_hash(usuario.senha, senha):
+        if autenticar_usuario(usuario, senha):
             # Super admin tem acesso a qualquer barbearia
             if usuario.tipo_conta == 'super_admin':
                 session.clear()  # Limpar sessão anterior
@@ -973,7 +1763,7 @@ def login(slug):
                 session.permanent = True  # Usar PERMANENT_SESSION_LIFETIME
                 
                 # Registrar sucesso
-                record_login_attempt(client_ip, success=True)
+                record_login_attempt(chave_limite, success=True)
                 audit_log('login_success', user_id=usuario.id, details={'slug': slug, 'role': 'super_admin'})
                 
                 flash('Login realizado com sucesso!', 'success')
@@ -987,7 +1777,7 @@ def login(slug):
             ).first()
             
             if not usuario_barbearia:
-                record_login_attempt(client_ip, success=False)
+                record_login_attempt(chave_limite, success=False)
                 audit_log('login_failed', user_id=usuario.id, details={'reason': 'no_access_to_barbearia', 'slug': slug})
                 flash('Usuário não tem acesso a esta barbearia!', 'error')
                 return render_template('cliente/login.html', barbearia=barbearia)
@@ -1001,14 +1791,14 @@ def login(slug):
             session.permanent = True  # Usar PERMANENT_SESSION_LIFETIME
             
             # Registrar sucesso
-            record_login_attempt(client_ip, success=True)
+            record_login_attempt(chave_limite, success=True)
             audit_log('login_success', user_id=usuario.id, details={'slug': slug, 'role': usuario_barbearia.role})
             
             flash('Login realizado com sucesso!', 'success')
             return redirect(url_for('dashboard', slug=slug))
         else:
             # Login falhou
-            record_login_attempt(client_ip, success=False)
+            record_login_attempt(chave_limite, success=False)
             if usuario:
                 audit_log('login_failed', user_id=usuario.id, details={'reason': 'wrong_password', 'slug': slug})
             else:
@@ -1026,7 +1816,7 @@ def login(slug):
 @app.route('/<slug>/cadastro', methods=['GET','POST'])
 def cadastro(slug):
     # Verificar se a barbearia existe
-    barbearia = Barbearia.query.filter_by(slug=slug, ativa=True).first()
+    barbearia = get_barbearia_por_slug(slug)
     if not barbearia:
         return redirect('/')
     
@@ -1079,7 +1869,7 @@ def cadastro(slug):
             nome=nome, 
             email=email, 
             telefone=telefone,
-            senha=generate_password_hash(senha), 
+            senha=gerar_hash_senha(senha), 
             tipo_conta='cliente',
             ativo=True
         )
@@ -1110,7 +1900,7 @@ def cadastro(slug):
 @app.route('/<slug>/dashboard')
 def dashboard(slug):
     try:
-        barbearia = Barbearia.query.filter_by(slug=slug, ativa=True).first()
+        barbearia = get_barbearia_por_slug(slug)
         if not barbearia:
             return redirect('/')
         # garantir contexto
@@ -1119,7 +1909,7 @@ def dashboard(slug):
         # se usuário logado e for admin da barbearia ou barbeiro, mostrar dashboard admin
         usuario = None
         if 'usuario_id' in session:
-            usuario = Usuario.query.get(session['usuario_id'])
+            usuario = get_current_usuario(Usuario, db)
     except Exception as e:
         db.session.rollback()
         app.logger.error(f"Erro no dashboard {slug}: {str(e)}")
@@ -1155,7 +1945,7 @@ def dashboard(slug):
         reservas = Reserva.query.filter_by(barbearia_id=barbearia.id, cliente_id=session['usuario_id']).filter(Reserva.status.in_(['agendada', 'confirmada'])).all()
         total_reservas = Reserva.query.filter_by(barbearia_id=barbearia.id, cliente_id=session['usuario_id']).filter(Reserva.status != 'cancelada').count()
     servicos = Servico.query.filter_by(barbearia_id=barbearia.id, ativo=True).all()
-    planos = PlanoMensal.query.filter_by(barbearia_id=barbearia.id, ativo=True).all()
+    planos = planos_ativos(barbearia.id)
     return render_template('usuario_dashboard.html', reservas=reservas, total_reservas=total_reservas, servicos=servicos, planos=planos, barbearia=barbearia, user_type='cliente', filtro='pendentes')
 
 @app.route('/<slug>/logout')
@@ -1172,13 +1962,13 @@ def planos_mensais(slug):
     if 'usuario_id' not in session:
         return redirect(url_for('login', slug=slug))
     
-    barbearia = Barbearia.query.filter_by(slug=slug, ativa=True).first()
+    barbearia = get_barbearia_por_slug(slug)
     if not barbearia:
         flash('Barbearia não encontrada.', 'error')
         return redirect('/')
     
-    # Buscar planos ativos da barbearia
-    planos = PlanoMensal.query.filter_by(barbearia_id=barbearia.id, ativo=True).all()
+    # Planos ativos da barbearia (cache do processo)
+    planos = planos_ativos(barbearia.id)
     
     if not planos:
         return redirect(url_for('dashboard', slug=slug))
@@ -1201,7 +1991,7 @@ def planos_mensais(slug):
 @require_super_admin
 def super_admin_login_as(slug):
     # Busca barbearia
-    barbearia = Barbearia.query.filter_by(slug=slug, ativa=True).first()
+    barbearia = get_barbearia_por_slug(slug)
     if not barbearia:
         flash('Barbearia não encontrada.', 'error')
         return redirect(url_for('super_admin_barbearias'))
@@ -1298,41 +2088,44 @@ def horarios_disponiveis():
     
     try:
         from datetime import datetime
-        data_obj = datetime.strptime(data, '%Y-%m-%d')
-        dia_semana = data_obj.strftime('%A').lower()
+        data_obj = datetime.strptime(data, '%Y-%m-%d').date()
         
         # Obter barbearia atual
-        barbearia_id = get_current_barbearia_id()
-        if not barbearia_id:
+        barbearia = get_current_barbearia()
+        if not barbearia:
             return jsonify({'error': 'Barbearia não encontrada'}), 400
         
-        # Obter configuração da semana para esta data
-        config_semana = DisponibilidadeSemanal.get_ou_criar_semana(data, barbearia_id)
-        config = config_semana.get_config()
-        
-        # Verificar se o dia está ativo
-        dia_config = config.get(dia_semana, {'ativo': False, 'horarios': []})
-        if not dia_config.get('ativo', False):
-            return jsonify({'horarios': []})
-        
-        # Obter horários configurados para este dia
-        horarios_config = dia_config.get('horarios', [])
-        
-        # Obter horários já reservados para essa data na barbearia atual
-        reservas_existentes = Reserva.query.filter_by(
-            data=data, 
-            barbearia_id=barbearia_id
-        ).all()
-        horarios_ocupados = [r.hora_inicio for r in reservas_existentes]
-        
-        # Filtrar horários disponíveis
-        horarios_disponiveis_list = [h for h in horarios_config if h not in horarios_ocupados]
-        
-        return jsonify({'horarios': horarios_disponiveis_list})
+        duracao = duracao_do_servico(barbearia.id, request.args.get('servico_id', type=int))
+        # Chave normalizada: strptime aceita '2026-1-5', o resultado usa '2026-01-05'
+        return jsonify({'horarios': horarios_livres(barbearia, data_obj, duracao=duracao)[data_obj.isoformat()]})
     
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/horarios_disponiveis_semana')
+def horarios_disponiveis_semana():
+    """Horários livres de vários dias em uma chamada (calendário de agendamento).
+    
+    Aceita ``servico_id`` para considerar a duração do serviço, como horarios_disponiveis.
+    """
+    inicio = request.args.get('inicio')
+    if not inicio:
+        return jsonify({'error': 'Data inicial não fornecida'}), 400
+    
+    try:
+        from datetime import datetime
+        data_inicio = datetime.strptime(inicio, '%Y-%m-%d').date()
+        dias = min(max(int(request.args.get('dias', 7)), 1), 31)
+    except ValueError:
+        return jsonify({'error': 'Parâmetros inválidos'}), 400
+    
+    barbearia = get_current_barbearia()
+    if not barbearia:
+        return jsonify({'error': 'Barbearia não encontrada'}), 400
+    
+    duracao = duracao_do_servico(barbearia.id, request.args.get('servico_id', type=int))
+    return jsonify({'dias': horarios_livres(barbearia, data_inicio, dias, duracao)})
+
 @app.route('/<slug>/nova_reserva', methods=['GET','POST'])
 def nova_reserva(slug):
     if 'usuario_id' not in session: return redirect(url_for('login', slug=slug))
@@ -1341,7 +2134,7 @@ def nova_reserva(slug):
         return redirect(url_for('dashboard', slug=slug))
     
     # Obter barbearia pelo slug
-    barbearia = Barbearia.query.filter_by(slug=slug, ativa=True).first()
+    barbearia = get_barbearia_por_slug(slug)
     if not barbearia:
         flash('Barbearia não encontrada.', 'error')
         return redirect(url_for('admin_index'))
@@ -1375,15 +2168,10 @@ def nova_reserva(slug):
         try:
             from datetime import datetime
             data_obj = datetime.strptime(data, '%Y-%m-%d')
-            dia_semana = data_obj.strftime('%A').lower()
-            
-            # Usar a barbearia já obtida
-            temp_barbearia_id = barbearia.id
-                
-            config_semana = DisponibilidadeSemanal.get_ou_criar_semana(data, temp_barbearia_id)
-            config = config_semana.get_config()
+            # Mesmo formato das chaves de ocupacao_horario ('2026-1-5' -> '2026-01-05')
+            data = data_obj.strftime('%Y-%m-%d')
             
-            dia_config = config.get(dia_semana, {'ativo': False, 'horarios': []})
+            dia_config = config_do_dia(barbearia.id, data_obj.date())
             
             if not dia_config.get('ativo', False):
                 flash('Data não disponível para agendamentos.', 'danger')
@@ -1397,27 +2185,22 @@ def nova_reserva(slug):
             flash('Data ou horário inválido.', 'danger')
             return redirect(url_for('nova_reserva', slug=slug))
         
-        # Verificar capacidade da barbearia para este horário
-        config = barbearia.get_configuracoes()
-        capacidade = config.get('vagas_por_horario', 1)
-        
-        agendamentos_no_horario = Reserva.query.filter_by(
-            barbearia_id=barbearia.id, 
-            data=data, 
-            hora_inicio=hora
-        ).filter(Reserva.status.in_(['agendada', 'confirmada'])).count()
-        
-        if agendamentos_no_horario >= capacidade:
-            flash(f'Desculpe, este horário já está totalmente preenchido (máximo {capacidade} clientes).', 'danger')
-            return redirect(url_for('nova_reserva', slug=slug))
-        
         # Calcular hora fim baseado na duração do serviço
-        servico = Servico.query.get(servico_id)
+        servico = Servico.query.filter_by(id=servico_id, barbearia_id=barbearia.id).first()
+        if not servico:
+            flash('Selecione serviço válido.', 'warning'); return redirect(url_for('nova_reserva', slug=slug))
         from datetime import datetime, timedelta
         hora_inicio_dt = datetime.strptime(hora, '%H:%M')
         hora_fim_dt = hora_inicio_dt + timedelta(minutes=servico.duracao)
         hora_fim = hora_fim_dt.strftime('%H:%M')
         
+        # Verificar capacidade da barbearia durante todo o atendimento
+        capacidade = capacidade_por_horario(barbearia)
+        
+        if ocupacao_maxima_no_banco(barbearia.id, data, hora, hora_fim) >= capacidade:
+            flash(f'Desculpe, este horário já está totalmente preenchido (máximo {capacidade} clientes).', 'danger')
+            return redirect(url_for('nova_reserva', slug=slug))
+        
         reserva = Reserva(
             barbearia_id=barbearia.id,
             cliente_id=session['usuario_id'], 
@@ -1426,7 +2209,24 @@ def nova_reserva(slug):
             hora_inicio=hora,
             hora_fim=hora_fim
         )
-        db.session.add(reserva); db.session.commit(); flash('Reserva criada com sucesso!', 'success'); return redirect(url_for('dashboard', slug=slug))
+        db.session.add(reserva)
+        
+        # O flush incrementa os contadores do intervalo e os mantém bloqueados até o
+        # commit: se outra reserva chegou antes, algum contador passou da capacidade
+        from sqlalchemy.exc import IntegrityError
+        try:
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            flash('Este horário acabou de ser reservado. Por favor, tente novamente.', 'warning')
+            return redirect(url_for('nova_reserva', slug=slug))
+        
+        if ocupacao_maxima_no_banco(barbearia.id, data, hora, hora_fim) > capacidade:
+            db.session.rollback()
+            flash(f'Desculpe, este horário já está totalmente preenchido (máximo {capacidade} clientes).', 'danger')
+            return redirect(url_for('nova_reserva', slug=slug))
+        
+        db.session.commit(); flash('Reserva criada com sucesso!', 'success'); return redirect(url_for('dashboard', slug=slug))
     return render_template('cliente/nova_reserva.html', servicos=servicos, barbearia=barbearia)
 
 # ---------- ROTAS ADMINISTRATIVAS POR BARBEARIA ----------
@@ -1485,8 +2285,8 @@ def admin_planos_ativos(slug):
         UsuarioBarbearia.ativo == True
     ).all()
 
-    # Buscar planos disponíveis
-    planos = PlanoMensal.query.filter_by(barbearia_id=barbearia_id, ativo=True).all()
+    # Planos disponíveis (cache do processo)
+    planos = planos_ativos(barbearia_id)
 
     return render_template('admin/planos_ativos.html',
                          assinaturas=assinaturas_ativas,
@@ -1636,6 +2436,159 @@ def admin_renovar_assinatura(slug, assinatura_uuid):
     flash(f'Assinatura de {assinatura.cliente.nome} renovada com sucesso! {assinatura.atendimentos_restantes} cortes disponíveis.', 'success')
     return redirect(url_for('admin_planos_ativos', slug=slug))
 
+# ---------- DESPESAS RECORRENTES ----------
+
+DESPESAS_RECORRENTES_MESES = int(os.environ.get('DESPESAS_RECORRENTES_MESES', 3))
+LOTE_DESPESAS_MAXIMO = 1000  # despesas por requisição de criação em lote
+
+def _vencimento_no_mes(vencimento_original, ano, mes):
+    """Mesmo dia do mês do vencimento original, limitado ao último dia do mês"""
+    from calendar import monthrange
+    from datetime import date
+    return date(ano, mes, min(vencimento_original.day, monthrange(ano, mes)[1]))
+
+def _periodos_seguintes(inicio, fim):
+    """Meses (ano, mes) após ``inicio`` até ``fim`` inclusive"""
+    ano, mes = inicio.year, inicio.month
+    while True:
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+        if (ano, mes) > (fim.year, fim.month):
+            return
+        yield ano, mes
+
+def materializar_despesas_recorrentes(meses=None, barbearia_id=None, despesa_ids=None):
+    """Gera as ocorrências das despesas recorrentes do mês atual até ``meses`` meses à frente.
+
+    Idempotente: cada ocorrência é identificada por (despesa de origem, período);
+    as que já existem são ignoradas e as novas entram em um único INSERT.
+    Retorna o número de ocorrências criadas.
+    """
+    from datetime import date
+    from sqlalchemy.exc import IntegrityError
+
+    meses = DESPESAS_RECORRENTES_MESES if meses is None else meses
+    hoje = date.today()
+    ano_limite, mes_limite = hoje.year + (hoje.month - 1 + meses) // 12, (hoje.month - 1 + meses) % 12 + 1
+    limite = date(ano_limite, mes_limite, 1)
+
+    query = Despesa.query.filter(Despesa.recorrente == True, Despesa.despesa_origem_id.is_(None))
+    if barbearia_id:
+        query = query.filter(Despesa.barbearia_id == barbearia_id)
+    if despesa_ids:
+        query = query.filter(Despesa.id.in_(despesa_ids))
+    modelos = query.all()
+    if not modelos:
+        return 0
+
+    existentes = set(db.session.query(Despesa.despesa_origem_id, Despesa.periodo).filter(
+        Despesa.despesa_origem_id.in_([m.id for m in modelos])
+    ).all())
+
+    novas = []
+    for modelo in modelos:
+        for ano, mes in _periodos_seguintes(modelo.data_vencimento, limite):
+            periodo = f'{ano:04d}-{mes:02d}'
+            # Meses já passados não são preenchidos retroativamente
+            if (ano, mes) < (hoje.year, hoje.month) or (modelo.id, periodo) in existentes:
+                continue
+            novas.append({
+                'uuid': str(uuid.uuid4()),
+                'barbearia_id': modelo.barbearia_id,
+                'descricao': modelo.descricao,
+                'categoria': modelo.categoria,
+                'valor': modelo.valor,
+                'data_vencimento': _vencimento_no_mes(modelo.data_vencimento, ano, mes),
+                'status': 'pendente',
+                'recorrente': False,
+                'observacoes': modelo.observacoes,
+                'criado_por': modelo.criado_por,
+                'despesa_origem_id': modelo.id,
+                'periodo': periodo,
+            })
+
+    if not novas:
+        return 0
+
+    try:
+        db.session.execute(db.insert(Despesa), novas)
+        db.session.commit()
+    except IntegrityError:
+        # Outra execução gerou as mesmas ocorrências ao mesmo tempo
+        db.session.rollback()
+        return 0
+    return len(novas)
+
+def sincronizar_ocorrencias_recorrentes(barbearia_id=None, despesa_ids=None):
+    """Aplica descrição, categoria e valor atuais das despesas recorrentes às ocorrências futuras.
+
+    Só altera ocorrências pendentes com vencimento futuro (as mesmas que
+    admin_excluir_despesa remove junto com a recorrência) e que divergem do
+    modelo, em um único UPDATE. Retorna o número de ocorrências atualizadas.
+    """
+    from datetime import date
+    from sqlalchemy.orm import aliased
+
+    modelo = aliased(Despesa)
+
+    def do_modelo(coluna):
+        return db.select(getattr(modelo, coluna)).where(modelo.id == Despesa.despesa_origem_id).scalar_subquery()
+
+    divergentes = db.select(modelo.id).where(
+        modelo.id == Despesa.despesa_origem_id,
+        db.or_(modelo.descricao != Despesa.descricao,
+               modelo.categoria != Despesa.categoria,
+               modelo.valor != Despesa.valor)
+    ).exists()
+
+    query = Despesa.query.filter(
+        Despesa.despesa_origem_id.isnot(None),
+        Despesa.status == 'pendente',
+        Despesa.data_vencimento > date.today(),
+        divergentes
+    )
+    if barbearia_id:
+        query = query.filter(Despesa.barbearia_id == barbearia_id)
+    if despesa_ids:
+        query = query.filter(Despesa.despesa_origem_id.in_(despesa_ids))
+
+    atualizadas = query.update(
+        {coluna: do_modelo(coluna) for coluna in ('descricao', 'categoria', 'valor')},
+        synchronize_session=False
+    )
+    db.session.commit()
+    return atualizadas
+
+def _valores_despesa(data, barbearia_id, usuario_id):
+    """Valida um item JSON de despesa e retorna os valores da linha (ValueError se inválido)"""
+    from datetime import datetime
+    if not isinstance(data, dict):
+        raise ValueError('item deve ser um objeto')
+    faltando = [campo for campo in ('descricao', 'categoria', 'valor', 'data_vencimento')
+               if campo not in data or data[campo] in (None, '')]
+    if faltando:
+        raise ValueError(f"campos obrigatórios ausentes: {', '.join(faltando)}")
+    try:
+        valor = float(data['valor'])
+    except (TypeError, ValueError):
+        raise ValueError('valor inválido')
+    try:
+        data_vencimento = datetime.strptime(str(data['data_vencimento']), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('data_vencimento deve estar no formato YYYY-MM-DD')
+
+    return {
+        'uuid': str(uuid.uuid4()),
+        'barbearia_id': barbearia_id,
+        'descricao': sanitize_input(str(data['descricao']))[:200],
+        'categoria': sanitize_input(str(data['categoria']))[:50],
+        'valor': valor,
+        'data_vencimento': data_vencimento,
+        'status': 'pendente',
+        'recorrente': bool(data.get('recorrente', False)),
+        'observacoes': sanitize_input(str(data.get('observacoes') or '')),
+        'criado_por': usuario_id,
+    }
+
 @app.route('/<slug>/admin/despesas')
 def admin_despesas(slug):
     """Lista e gerencia despesas da barbearia"""
@@ -1647,7 +2600,6 @@ def admin_despesas(slug):
         return redirect(url_for('dashboard', slug=slug))
     
     from datetime import datetime, date
-    from sqlalchemy import extract, func
     
     barbearia_id = get_current_barbearia_id()
     
@@ -1656,45 +2608,46 @@ def admin_despesas(slug):
     categoria_filtro = request.args.get('categoria', 'todas')
     status_filtro = request.args.get('status', 'todas')
     
-    # Query base
-    query = Despesa.query.filter_by(barbearia_id=barbearia_id)
+    # Filtros comuns à listagem e aos totais
+    status_atual = Despesa.expressao_status()
+    filtros = [Despesa.barbearia_id == barbearia_id]
     
     # Aplicar filtro de mês
     if mes_filtro:
-        ano, mes = mes_filtro.split('-')
-        query = query.filter(
-            extract('year', Despesa.data_vencimento) == int(ano),
-            extract('month', Despesa.data_vencimento) == int(mes)
-        )
+        inicio_mes, inicio_proximo_mes = limites_do_mes(mes_filtro)
+        filtros += [
+            Despesa.data_vencimento >= inicio_mes,
+            Despesa.data_vencimento < inicio_proximo_mes
+        ]
     
     # Aplicar filtro de categoria
     if categoria_filtro != 'todas':
-        query = query.filter_by(categoria=categoria_filtro)
+        filtros.append(Despesa.categoria == categoria_filtro)
     
-    # Aplicar filtro de status
+    # Aplicar filtro de status (pendentes vencidas contam como atrasadas)
     if status_filtro != 'todas':
-        query = query.filter_by(status=status_filtro)
+        filtros.append(status_atual == status_filtro)
     
-    despesas = query.order_by(Despesa.data_vencimento.desc()).all()
+    despesas = Despesa.query.filter(*filtros).order_by(Despesa.data_vencimento.desc()).all()
     
-    # Atualizar status de despesas atrasadas
-    for despesa in despesas:
-        if despesa.esta_atrasada and despesa.status == 'pendente':
-            despesa.status = 'atrasada'
-    db.session.commit()
+    # Estatísticas do mês: uma agregação por categoria e status (a página não grava nada;
+    # o status 'atrasada' é persistido pela tarefa marcar_despesas_atrasadas)
+    totais = db.session.query(
+        Despesa.categoria, status_atual, db.func.sum(Despesa.valor)
+    ).filter(*filtros).group_by(Despesa.categoria, status_atual).all()
     
-    # Estatísticas do mês
-    total_despesas = sum(d.valor for d in despesas)
-    total_pagas = sum(d.valor for d in despesas if d.status == 'paga')
-    total_pendentes = sum(d.valor for d in despesas if d.status == 'pendente')
-    total_atrasadas = sum(d.valor for d in despesas if d.status == 'atrasada')
-    
-    # Despesas por categoria
+    total_despesas = total_pagas = total_pendentes = total_atrasadas = 0
     despesas_por_categoria = {}
-    for despesa in despesas:
-        if despesa.categoria not in despesas_por_categoria:
-            despesas_por_categoria[despesa.categoria] = 0
-        despesas_por_categoria[despesa.categoria] += despesa.valor
+    for categoria, status, valor in totais:
+        valor = valor or 0
+        total_despesas += valor
+        if status == 'paga':
+            total_pagas += valor
+        elif status == 'pendente':
+            total_pendentes += valor
+        elif status == 'atrasada':
+            total_atrasadas += valor
+        despesas_por_categoria[categoria] = despesas_por_categoria.get(categoria, 0) + valor
     
     return render_template('admin/despesas.html',
                          despesas=despesas,
@@ -1736,11 +2689,60 @@ def admin_adicionar_despesa(slug):
         db.session.add(despesa)
         db.session.commit()
         
+        if despesa.recorrente:
+            materializar_despesas_recorrentes(despesa_ids=[despesa.id])
+        
         return jsonify({'success': True, 'message': 'Despesa adicionada com sucesso!'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Erro: {str(e)}'}), 500
 
+@app.route('/<slug>/admin/despesas/lote', methods=['POST'])
+def admin_adicionar_despesas_lote(slug):
+    """Adiciona várias despesas em uma transação (ex.: importação de um ano de despesas)"""
+    if 'usuario_id' not in session:
+        return jsonify({'success': False, 'message': 'Não autenticado'}), 401
+    
+    if not g.tenant.is_admin():
+        return jsonify({'success': False, 'message': 'Acesso negado'}), 403
+    
+    data = request.get_json(silent=True)
+    itens = data.get('despesas') if isinstance(data, dict) else data
+    if not isinstance(itens, list) or not itens:
+        return jsonify({'success': False, 'message': 'Envie uma lista de despesas'}), 400
+    if len(itens) > LOTE_DESPESAS_MAXIMO:
+        return jsonify({'success': False, 'message': f'Máximo de {LOTE_DESPESAS_MAXIMO} despesas por requisição'}), 400
+    
+    # Validar tudo antes de gravar: o lote entra inteiro ou nada entra
+    barbearia_id = get_current_barbearia_id()
+    linhas, erros = [], []
+    for indice, item in enumerate(itens):
+        try:
+            linhas.append(_valores_despesa(item, barbearia_id, session['usuario_id']))
+        except ValueError as e:
+            erros.append({'indice': indice, 'erro': str(e)})
+    if erros:
+        return jsonify({'success': False, 'message': 'Despesas inválidas', 'erros': erros}), 400
+    
+    try:
+        db.session.execute(db.insert(Despesa), linhas)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Erro: {str(e)}'}), 500
+    
+    uuids_recorrentes = [linha['uuid'] for linha in linhas if linha['recorrente']]
+    if uuids_recorrentes:
+        ids = [i for (i,) in db.session.query(Despesa.id).filter(Despesa.uuid.in_(uuids_recorrentes))]
+        materializar_despesas_recorrentes(despesa_ids=ids)
+    
+    return jsonify({
+        'success': True,
+        'message': f'{len(linhas)} despesas adicionadas com sucesso!',
+        'criadas': len(linhas),
+        'uuids': [linha['uuid'] for linha in linhas],
+    })
+
 @app.route('/<slug>/admin/despesas/<string:despesa_uuid>/pagar', methods=['POST'])
 def admin_pagar_despesa(slug, despesa_uuid):
     """Marca despesa como paga"""
@@ -1762,6 +2764,45 @@ def admin_pagar_despesa(slug, despesa_uuid):
     
     return jsonify({'success': True, 'message': 'Despesa marcada como paga!'})
 
+@app.route('/<slug>/admin/despesas/<string:despesa_uuid>/editar', methods=['POST'])
+def admin_editar_despesa(slug, despesa_uuid):
+    """Edita uma despesa (JSON com os campos alterados)"""
+    if 'usuario_id' not in session:
+        return jsonify({'success': False, 'message': 'Não autenticado'}), 401
+    
+    if not g.tenant.is_admin():
+        return jsonify({'success': False, 'message': 'Acesso negado'}), 403
+    
+    despesa = Despesa.query.filter_by(uuid=despesa_uuid).first()
+    if not despesa:
+        return jsonify({'success': False, 'message': 'Despesa não encontrada'}), 404
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Envie os campos da despesa'}), 400
+    try:
+        # Campos não enviados mantêm o valor atual
+        valores = _valores_despesa({
+            'descricao': despesa.descricao,
+            'categoria': despesa.categoria,
+            'valor': despesa.valor,
+            'data_vencimento': despesa.data_vencimento.isoformat(),
+            'observacoes': despesa.observacoes,
+            **data
+        }, despesa.barbearia_id, despesa.criado_por)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    for campo in ('descricao', 'categoria', 'valor', 'data_vencimento', 'observacoes'):
+        setattr(despesa, campo, valores[campo])
+    db.session.commit()
+    
+    if despesa.recorrente and despesa.despesa_origem_id is None:
+        # As ocorrências futuras já geradas seguem o modelo editado
+        sincronizar_ocorrencias_recorrentes(despesa_ids=[despesa.id])
+    
+    return jsonify({'success': True, 'message': 'Despesa atualizada com sucesso!'})
+
 @app.route('/<slug>/admin/despesas/<string:despesa_uuid>/excluir', methods=['POST'])
 def admin_excluir_despesa(slug, despesa_uuid):
     """Exclui uma despesa"""
@@ -1775,6 +2816,19 @@ def admin_excluir_despesa(slug, despesa_uuid):
     if not despesa:
         return jsonify({'success': False, 'message': 'Despesa não encontrada'}), 404
     
+    if despesa.recorrente:
+        # Ocorrências futuras ainda não pagas deixam de existir junto com a recorrência;
+        # as demais ficam como despesas avulsas
+        from datetime import date
+        Despesa.query.filter(
+            Despesa.despesa_origem_id == despesa.id,
+            Despesa.status == 'pendente',
+            Despesa.data_vencimento > date.today()
+        ).delete(synchronize_session=False)
+        Despesa.query.filter(Despesa.despesa_origem_id == despesa.id).update(
+            {'despesa_origem_id': None}, synchronize_session=False
+        )
+    
     db.session.delete(despesa)
     db.session.commit()
     
@@ -1807,7 +2861,7 @@ def admin_agendamentos_slug(slug):
         flash('Acesso negado - apenas administradores', 'error')
         return redirect(url_for('dashboard', slug=slug))
     
-    barbearia = Barbearia.query.filter_by(slug=slug, ativa=True).first()
+    barbearia = get_barbearia_por_slug(slug)
     if not barbearia:
         flash('Barbearia não encontrada.', 'error')
         return redirect(url_for('admin_index'))
@@ -1845,8 +2899,8 @@ def admin_agendamentos_slug(slug):
         fim_semana = (hoje + timedelta(days=(6 - hoje.weekday()))).strftime('%Y-%m-%d')
         query = query.filter(Reserva.data >= inicio_semana, Reserva.data <= fim_semana)
     elif filtro_periodo == 'mes':
-        mes_atual = datetime.now().strftime('%Y-%m')
-        query = query.filter(Reserva.data.like(f'{mes_atual}%'))
+        inicio_mes, inicio_proximo_mes = limites_do_mes(datetime.now().strftime('%Y-%m'))
+        query = query.filter(Reserva.data >= inicio_mes, Reserva.data < inicio_proximo_mes)
     
     # Aplicar filtro de status
     if status_filtro == 'ativos':
@@ -1861,42 +2915,29 @@ def admin_agendamentos_slug(slug):
     elif status_filtro != 'todos':
         query = query.filter_by(status=status_filtro)
     
-    # Ordenar por data e hora
-    reservas = query.order_by(Reserva.data.desc(), Reserva.hora_inicio.desc()).all()
+    # Ordenar por data e hora (cliente, serviço e plano carregados em lote)
+    reservas = carregar_reservas_enriquecidas(
+        query.order_by(Reserva.data.desc(), Reserva.hora_inicio.desc()),
+        barbearia_id
+    )
     
-    # Contar por status
+    # Contar por status em uma única consulta agrupada
+    from sqlalchemy import func
+    contagem = dict(
+        db.session.query(Reserva.status, func.count(Reserva.id))
+        .filter(Reserva.barbearia_id == barbearia_id)
+        .group_by(Reserva.status)
+        .all()
+    )
     status_counts = {
-        'ativos': Reserva.query.filter_by(barbearia_id=barbearia_id).filter(
-            Reserva.status.in_(['agendada', 'confirmada', 'atendendo'])
-        ).count(),
-        'concluidos': Reserva.query.filter_by(barbearia_id=barbearia_id, status='concluida').count(),
-        'todos': Reserva.query.filter_by(barbearia_id=barbearia_id).filter(
-            Reserva.status != 'cancelada'
-        ).count(),
-        'agendada': Reserva.query.filter_by(barbearia_id=barbearia_id, status='agendada').count(),
-        'confirmada': Reserva.query.filter_by(barbearia_id=barbearia_id, status='confirmada').count(),
-        'atendendo': Reserva.query.filter_by(barbearia_id=barbearia_id, status='atendendo').count()
+        'ativos': sum(contagem.get(st, 0) for st in ('agendada', 'confirmada', 'atendendo')),
+        'concluidos': contagem.get('concluida', 0),
+        'todos': sum(qtd for st, qtd in contagem.items() if st != 'cancelada'),
+        'agendada': contagem.get('agendada', 0),
+        'confirmada': contagem.get('confirmada', 0),
+        'atendendo': contagem.get('atendendo', 0)
     }
     
-    # Adicionar informação de plano para cada reserva
-    for reserva in reservas:
-        reserva.tem_plano = False
-        reserva.plano_nome = None
-        reserva.sem_cortes_restantes = False
-        if reserva.cliente:
-            assinatura_ativa = AssinaturaPlano.query.join(
-                PlanoMensal, AssinaturaPlano.plano_id == PlanoMensal.id
-            ).filter(
-                AssinaturaPlano.cliente_id == reserva.cliente_id,
-                AssinaturaPlano.status == 'ativa',
-                PlanoMensal.barbearia_id == barbearia_id
-            ).first()
-            
-            if assinatura_ativa:
-                reserva.tem_plano = True
-                reserva.plano_nome = assinatura_ativa.plano.nome
-                reserva.sem_cortes_restantes = assinatura_ativa.atendimentos_restantes == 0
-    
     return render_template('admin/admin_agendamentos.html', 
                          reservas=reservas,
                          barbearia=barbearia,
@@ -1925,7 +2966,11 @@ def admin_faturamento(slug):
         if not session.get(auth_key):
             if request.method == 'POST' and request.form.get('acao') == 'verificar_senha':
                 senha_digitada = request.form.get('senha_financeira')
-                if check_password_hash(barbearia.senha_financeira, senha_digitada):
+                if verificar_senha(barbearia.senha_financeira, senha_digitada):
+                    if precisa_rehash(barbearia.senha_financeira):
+                        barbearia.senha_financeira = gerar_hash_senha(senha_digitada)
+                        db.session.commit()
+                        invalidar_cache_barbearia(barbearia_id)
                     session[auth_key] = True
                     # Permanecer na mesma página (GET)
                     return redirect(url_for('admin_faturamento', slug=slug))
@@ -1943,8 +2988,9 @@ def admin_faturamento(slug):
             nova_senha = request.form.get('nova_senha')
             confirmar = request.form.get('confirmar_senha')
             if nova_senha and nova_senha == confirmar:
-                barbearia.senha_financeira = generate_password_hash(nova_senha)
+                barbearia.senha_financeira = gerar_hash_senha(nova_senha)
                 db.session.commit()
+                invalidar_cache_barbearia(barbearia_id)
                 session[f'financeiro_auth_{barbearia_id}'] = True
                 flash('Senha financeira definida com sucesso!', 'success')
                 return redirect(url_for('admin_faturamento', slug=slug))
@@ -1957,7 +3003,6 @@ def admin_faturamento(slug):
             return redirect(url_for('dashboard', slug=slug))
 
     from datetime import datetime, timedelta
-    from sqlalchemy import func, extract
     
     barbearia_id = get_current_barbearia_id()
     barbearia = get_current_barbearia()
@@ -1969,105 +3014,82 @@ def admin_faturamento(slug):
     except:
         data_selecionada = datetime.now()
     
-    # ===== FATURAMENTO DO DIA =====
-    reservas_dia = Reserva.query.join(Servico).filter(
-        Reserva.barbearia_id == barbearia_id,
-        Reserva.data == data_selecionada.strftime('%Y-%m-%d'),
-        Reserva.status.in_(['confirmada', 'concluida'])
-    ).all()
-    
-    faturamento_dia = sum([r.servico.preco for r in reservas_dia if r.servico])
-    quantidade_dia = len(reservas_dia)
-    
-    # ===== FATURAMENTO DA SEMANA =====
+    # ===== PERÍODOS =====
     inicio_semana = data_selecionada - timedelta(days=data_selecionada.weekday())
     fim_semana = inicio_semana + timedelta(days=6)
     
-    reservas_semana = Reserva.query.join(Servico).filter(
-        Reserva.barbearia_id == barbearia_id,
-        Reserva.data >= inicio_semana.strftime('%Y-%m-%d'),
-        Reserva.data <= fim_semana.strftime('%Y-%m-%d'),
-        Reserva.status.in_(['confirmada', 'concluida'])
-    ).all()
+    inicio_mes = data_selecionada.replace(day=1)
+    if data_selecionada.month == 12:
+        fim_mes = data_selecionada.replace(year=data_selecionada.year + 1, month=1, day=1) - timedelta(days=1)
+    else:
+        fim_mes = data_selecionada.replace(month=data_selecionada.month + 1, day=1) - timedelta(days=1)
+    
+    inicio_ano = data_selecionada.replace(month=1, day=1)
+    fim_ano = data_selecionada.replace(month=12, day=31)
     
-    faturamento_semana = sum([r.servico.preco for r in reservas_semana if r.servico])
-    quantidade_semana = len(reservas_semana)
+    # Uma única agregação por dia cobre dia, semana, mês e ano (a semana pode cruzar o ano)
+    diario = {
+        data: (quantidade, valor)
+        for data, quantidade, valor in faturamento_por_dia(
+            barbearia_id,
+            min(inicio_ano, inicio_semana).strftime('%Y-%m-%d'),
+            max(fim_ano, fim_semana).strftime('%Y-%m-%d')
+        )
+    }
+    
+    def totalizar(inicio, fim):
+        inicio_str, fim_str = inicio.strftime('%Y-%m-%d'), fim.strftime('%Y-%m-%d')
+        periodo = [v for data, v in diario.items() if inicio_str <= data <= fim_str]
+        return sum(v for _, v in periodo), sum(q for q, _ in periodo)
+    
+    # ===== FATURAMENTO DO DIA =====
+    faturamento_dia, quantidade_dia = totalizar(data_selecionada, data_selecionada)
+    
+    # ===== FATURAMENTO DA SEMANA =====
+    faturamento_semana, quantidade_semana = totalizar(inicio_semana, fim_semana)
     
     # Faturamento por dia da semana
-    faturamento_por_dia = {}
+    faturamento_por_dia_semana = {}
     for i in range(7):
         dia = inicio_semana + timedelta(days=i)
         dia_str = dia.strftime('%Y-%m-%d')
-        reservas_dia_semana = [r for r in reservas_semana if r.data == dia_str]
-        faturamento_por_dia[dia.strftime('%A')] = {
+        quantidade, valor = diario.get(dia_str, (0, 0))
+        faturamento_por_dia_semana[dia.strftime('%A')] = {
             'data': dia_str,
-            'valor': sum([r.servico.preco for r in reservas_dia_semana if r.servico]),
-            'quantidade': len(reservas_dia_semana)
+            'valor': valor,
+            'quantidade': quantidade
         }
     
     # ===== FATURAMENTO DO MÊS =====
-    inicio_mes = data_selecionada.replace(day=1)
-    if data_selecionada.month == 12:
-        fim_mes = data_selecionada.replace(year=data_selecionada.year + 1, month=1, day=1) - timedelta(days=1)
-    else:
-        fim_mes = data_selecionada.replace(month=data_selecionada.month + 1, day=1) - timedelta(days=1)
-    
-    reservas_mes = Reserva.query.join(Servico).filter(
-        Reserva.barbearia_id == barbearia_id,
-        Reserva.data >= inicio_mes.strftime('%Y-%m-%d'),
-        Reserva.data <= fim_mes.strftime('%Y-%m-%d'),
-        Reserva.status.in_(['confirmada', 'concluida'])
-    ).all()
-    
-    faturamento_mes = sum([r.servico.preco for r in reservas_mes if r.servico])
-    quantidade_mes = len(reservas_mes)
+    faturamento_mes, quantidade_mes = totalizar(inicio_mes, fim_mes)
     
     # ===== FATURAMENTO DO ANO =====
-    inicio_ano = data_selecionada.replace(month=1, day=1)
-    fim_ano = data_selecionada.replace(month=12, day=31)
-    
-    reservas_ano = Reserva.query.join(Servico).filter(
-        Reserva.barbearia_id == barbearia_id,
-        Reserva.data >= inicio_ano.strftime('%Y-%m-%d'),
-        Reserva.data <= fim_ano.strftime('%Y-%m-%d'),
-        Reserva.status.in_(['confirmada', 'concluida'])
-    ).all()
-    
-    faturamento_ano = sum([r.servico.preco for r in reservas_ano if r.servico])
-    quantidade_ano = len(reservas_ano)
+    faturamento_ano, quantidade_ano = totalizar(inicio_ano, fim_ano)
     
     # Faturamento por mês do ano
-    faturamento_por_mes = {}
-    for mes in range(1, 13):
-        reservas_mes_ano = [r for r in reservas_ano if datetime.strptime(r.data, '%Y-%m-%d').month == mes]
-        faturamento_por_mes[mes] = {
-            'valor': sum([r.servico.preco for r in reservas_mes_ano if r.servico]),
-            'quantidade': len(reservas_mes_ano)
-        }
+    faturamento_por_mes_ano = {mes: {'valor': 0, 'quantidade': 0} for mes in range(1, 13)}
+    ano_str = str(data_selecionada.year)
+    for data, (quantidade, valor) in diario.items():
+        if data.startswith(ano_str):
+            mes = faturamento_por_mes_ano[int(data[5:7])]
+            mes['valor'] += valor
+            mes['quantidade'] += quantidade
     
     # ===== SERVIÇOS MAIS VENDIDOS =====
-    servicos_count = {}
-    for reserva in reservas_mes:
-        if reserva.servico:
-            servico_nome = reserva.servico.nome
-            if servico_nome not in servicos_count:
-                servicos_count[servico_nome] = {'quantidade': 0, 'valor': 0}
-            servicos_count[servico_nome]['quantidade'] += 1
-            servicos_count[servico_nome]['valor'] += reserva.servico.preco
-    
-    servicos_mais_vendidos = sorted(servicos_count.items(), key=lambda x: x[1]['quantidade'], reverse=True)[:5]
+    servicos_mais_vendidos = [
+        (nome, {'quantidade': quantidade, 'valor': valor})
+        for nome, quantidade, valor in faturamento_por_servico(
+            barbearia_id, inicio_mes.strftime('%Y-%m-%d'), fim_mes.strftime('%Y-%m-%d'), limite=5
+        )
+    ]
     
     # ===== BARBEIROS TOP =====
-    barbeiros_stats = {}
-    for reserva in reservas_mes:
-        if reserva.barbeiro and reserva.servico:
-            barbeiro_nome = reserva.barbeiro.nome
-            if barbeiro_nome not in barbeiros_stats:
-                barbeiros_stats[barbeiro_nome] = {'quantidade': 0, 'valor': 0}
-            barbeiros_stats[barbeiro_nome]['quantidade'] += 1
-            barbeiros_stats[barbeiro_nome]['valor'] += reserva.servico.preco
-    
-    barbeiros_top = sorted(barbeiros_stats.items(), key=lambda x: x[1]['valor'], reverse=True)[:5]
+    barbeiros_top = [
+        (nome, {'quantidade': quantidade, 'valor': valor})
+        for nome, quantidade, valor in faturamento_por_barbeiro(
+            barbearia_id, inicio_mes.strftime('%Y-%m-%d'), fim_mes.strftime('%Y-%m-%d'), limite=5
+        )
+    ]
     
     return render_template('admin/faturamento.html',
                          barbearia=barbearia,
@@ -2076,12 +3098,12 @@ def admin_faturamento(slug):
                          quantidade_dia=quantidade_dia,
                          faturamento_semana=faturamento_semana,
                          quantidade_semana=quantidade_semana,
-                         faturamento_por_dia=faturamento_por_dia,
+                         faturamento_por_dia=faturamento_por_dia_semana,
                          faturamento_mes=faturamento_mes,
                          quantidade_mes=quantidade_mes,
                          faturamento_ano=faturamento_ano,
                          quantidade_ano=quantidade_ano,
-                         faturamento_por_mes=faturamento_por_mes,
+                         faturamento_por_mes=faturamento_por_mes_ano,
                          servicos_mais_vendidos=servicos_mais_vendidos,
                          barbeiros_top=barbeiros_top,
                          inicio_semana=inicio_semana,
@@ -2472,7 +3494,7 @@ def clientes():
         if Usuario.query.filter_by(email=email).first(): flash('Email já cadastrado!', 'warning'); return redirect(url_for('clientes'))
         
         # Criar usuário
-        novo = Usuario(nome=nome, apelido=apelido, email=email, senha=generate_password_hash('senha123'), tipo_conta='cliente', ativo=True)
+        novo = Usuario(nome=nome, apelido=apelido, email=email, senha=gerar_hash_senha('senha123'), tipo_conta='cliente', ativo=True)
         db.session.add(novo)
         db.session.flush() # Para pegar o ID do novo usuário
         
@@ -2610,7 +3632,7 @@ def api_agendamentos_hoje(slug):
             print("⚠️ API: Usuário não autenticado")
             return jsonify({'error': 'Não autorizado'}), 401
         
-        barbearia = Barbearia.query.filter_by(slug=slug).first()
+        barbearia = get_barbearia_por_slug(slug)
         if not barbearia:
             print(f"⚠️ API: Barbearia não encontrada - slug: {slug}")
             return jsonify({'error': 'Barbearia não encontrada'}), 404
@@ -2618,56 +3640,19 @@ def api_agendamentos_hoje(slug):
         from datetime import datetime
         hoje = datetime.now().strftime('%Y-%m-%d')
         
-        # BUSCAR TODAS AS RESERVAS PRIMEIRO PARA DEBUG
-        todas_reservas = Reserva.query.filter_by(barbearia_id=barbearia.id).all()
-        print(f"📊 DEBUG: Total de reservas na barbearia: {len(todas_reservas)}")
-        for r in todas_reservas:
-            print(f"   - Reserva ID {r.id}: data={r.data}, hora={r.hora_inicio}, cliente={r.cliente.nome if r.cliente else 'N/A'}")
-        
-        reservas = Reserva.query.filter_by(
-            barbearia_id=barbearia.id,
-            data=hoje
-        ).filter(
-            Reserva.status != 'cancelada'
-        ).all()
+        reservas = carregar_reservas_enriquecidas(
+            Reserva.query.filter_by(
+                barbearia_id=barbearia.id,
+                data=hoje
+            ).filter(
+                Reserva.status != 'cancelada'
+            ),
+            barbearia.id
+        )
         
         print(f"✅ API: Encontradas {len(reservas)} reservas para hoje ({hoje}) na barbearia {barbearia.nome}")
         
-        result = []
-        for r in reservas:
-            # Verificar se o cliente tem plano ativo
-            tem_plano = False
-            plano_nome = None
-            if r.cliente:
-                assinatura_ativa = AssinaturaPlano.query.join(
-                    PlanoMensal, AssinaturaPlano.plano_id == PlanoMensal.id
-                ).filter(
-                    AssinaturaPlano.cliente_id == r.cliente_id,
-                    AssinaturaPlano.status == 'ativa',
-                    PlanoMensal.barbearia_id == barbearia.id
-                ).first()
-                
-                if assinatura_ativa:
-                    tem_plano = True
-                    plano_nome = assinatura_ativa.plano.nome
-            
-            result.append({
-                'id': r.id,
-                'uuid': r.uuid,
-                'cliente_id': r.cliente_id,
-                'cliente_nome': r.cliente.nome if r.cliente else 'Cliente Desconhecido',
-                'cliente_telefone': r.cliente.telefone if r.cliente and r.cliente.telefone else 'Não informado',
-                'tem_plano': tem_plano,
-                'plano_nome': plano_nome,
-                'servico_id': r.servico_id,
-                'servico_nome': r.servico.nome if r.servico else 'Serviço N/A',
-                'servico_duracao': r.servico.duracao if r.servico else 30,
-                'servico_preco': r.servico.preco if r.servico else 0,
-                'data': r.data,
-                'hora_inicio': r.hora_inicio,
-                'hora_fim': r.hora_fim,
-                'status': r.status
-            })
+        result = [serializar_reserva(r) for r in reservas]
         
         return jsonify(result)
     except Exception as e:
@@ -2686,7 +3671,7 @@ def api_agendamentos_todos(slug):
             print("❌ API: Usuário não autenticado")
             return jsonify({'error': 'Não autorizado'}), 401
         
-        barbearia = Barbearia.query.filter_by(slug=slug).first()
+        barbearia = get_barbearia_por_slug(slug)
         if not barbearia:
             print(f"❌ API: Barbearia não encontrada com slug: {slug}")
             return jsonify({'error': 'Barbearia não encontrada'}), 404
@@ -2707,45 +3692,14 @@ def api_agendamentos_todos(slug):
             # Padrão: tudo exceto cancelado
             query = query.filter(Reserva.status != 'cancelada')
             
-        reservas = query.order_by(Reserva.data.desc(), Reserva.hora_inicio.desc()).all()
+        reservas = carregar_reservas_enriquecidas(
+            query.order_by(Reserva.data.desc(), Reserva.hora_inicio.desc()),
+            barbearia.id
+        )
         
         print(f"✅ API: Encontradas {len(reservas)} reservas (Filtro: {filtro_status})")
         
-        result = []
-        for r in reservas:
-            # Verificar se o cliente tem plano ativo
-            tem_plano = False
-            plano_nome = None
-            if r.cliente:
-                assinatura_ativa = AssinaturaPlano.query.join(
-                    PlanoMensal, AssinaturaPlano.plano_id == PlanoMensal.id
-                ).filter(
-                    AssinaturaPlano.cliente_id == r.cliente_id,
-                    AssinaturaPlano.status == 'ativa',
-                    PlanoMensal.barbearia_id == barbearia.id
-                ).first()
-                
-                if assinatura_ativa:
-                    tem_plano = True
-                    plano_nome = assinatura_ativa.plano.nome
-            
-            result.append({
-                'id': r.id,
-                'uuid': r.uuid,
-                'cliente_id': r.cliente_id,
-                'cliente_nome': r.cliente.nome if r.cliente else 'Cliente Desconhecido',
-                'cliente_telefone': r.cliente.telefone if r.cliente and r.cliente.telefone else 'Não informado',
-                'tem_plano': tem_plano,
-                'plano_nome': plano_nome,
-                'servico_id': r.servico_id,
-                'servico_nome': r.servico.nome if r.servico else 'Serviço N/A',
-                'servico_duracao': r.servico.duracao if r.servico else 30,
-                'servico_preco': r.servico.preco if r.servico else 0,
-                'data': r.data,
-                'hora_inicio': r.hora_inicio,
-                'hora_fim': r.hora_fim,
-                'status': r.status
-            })
+        result = [serializar_reserva(r) for r in reservas]
         
         print(f"📦 API: Retornando {len(result)} agendamentos")
         return jsonify(result)
@@ -2755,6 +3709,174 @@ def api_agendamentos_todos(slug):
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/<slug>/api/agendamentos_sync')
+def api_agendamentos_sync(slug):
+    """API de sincronização incremental de agendamentos.
+    
+    Sem ``since``: carga inicial do histórico (exceto cancelados) paginada por
+    (data, hora_inicio, id) via ``cursor``. A resposta traz ``versao``, a marca
+    d'água que o cliente deve guardar da primeira página.
+    
+    Com ``since``: apenas reservas criadas/alteradas depois dessa versão, mais os
+    UUIDs removidos (cancelados ou excluídos) em ``removidos``.
+    """
+    try:
+        if 'usuario_id' not in session:
+            return jsonify({'error': 'Não autorizado'}), 401
+        
+        if not hasattr(g, 'tenant') or not g.tenant or not g.tenant.is_admin():
+            return jsonify({'error': 'Acesso negado - apenas administradores'}), 403
+        
+        barbearia = get_barbearia_por_slug(slug)
+        if not barbearia:
+            return jsonify({'error': 'Barbearia não encontrada'}), 404
+        
+        try:
+            limite = min(max(int(request.args.get('limite', 200)), 1), 500)
+            since = request.args.get('since')
+            since = int(since) if since is not None else None
+        except ValueError:
+            return jsonify({'error': 'Parâmetros inválidos'}), 400
+        
+        if since is None:
+            # ===== CARGA INICIAL (KEYSET) =====
+            from sqlalchemy import or_, and_
+            
+            versao = versao_atual_reservas(barbearia.id)
+            query = Reserva.query.filter(
+                Reserva.barbearia_id == barbearia.id,
+                Reserva.status != 'cancelada'
+            )
+            
+            cursor = request.args.get('cursor')
+            if cursor:
+                try:
+                    from datetime import date
+                    c_data, c_hora, c_id = cursor.split('|')
+                    # Validar antes de usar nos binds de DataISO/HoraHM
+                    c_data = date.fromisoformat(c_data).isoformat()
+                    c_hora = datetime.strptime(c_hora, '%H:%M').strftime('%H:%M')
+                    c_id = int(c_id)
+                except ValueError:
+                    return jsonify({'error': 'Cursor inválido'}), 400
+                query = query.filter(or_(
+                    Reserva.data < c_data,
+                    and_(Reserva.data == c_data, Reserva.hora_inicio < c_hora),
+                    and_(Reserva.data == c_data, Reserva.hora_inicio == c_hora, Reserva.id < c_id)
+                ))
+            
+            reservas = carregar_reservas_enriquecidas(
+                query.order_by(Reserva.data.desc(), Reserva.hora_inicio.desc(), Reserva.id.desc()).limit(limite + 1),
+                barbearia.id
+            )
+            
+            proximo_cursor = None
+            if len(reservas) > limite:
+                reservas = reservas[:limite]
+                ultima = reservas[-1]
+                proximo_cursor = f'{ultima.data}|{ultima.hora_inicio}|{ultima.id}'
+            
+            return jsonify({
+                'agendamentos': [serializar_reserva(r) for r in reservas],
+                'proximo_cursor': proximo_cursor,
+                'versao': versao
+            })
+        
+        # ===== DELTA DESDE A VERSÃO INFORMADA =====
+        query = Reserva.query.filter(
+            Reserva.barbearia_id == barbearia.id,
+            Reserva.versao > since
+        )
+        reservas = carregar_reservas_enriquecidas(
+            query.order_by(Reserva.versao, Reserva.id).limit(limite + 1),
+            barbearia.id
+        )
+        
+        mais = len(reservas) > limite
+        if mais:
+            # Não cortar no meio de uma versão: completar a última versão incluída
+            reservas = reservas[:limite]
+            versao = reservas[-1].versao
+            ids = {r.id for r in reservas}
+            reservas += [
+                r for r in carregar_reservas_enriquecidas(
+                    Reserva.query.filter_by(barbearia_id=barbearia.id, versao=versao),
+                    barbearia.id
+                ) if r.id not in ids
+            ]
+        
+        excluidas = ReservaExcluida.query.filter(
+            ReservaExcluida.barbearia_id == barbearia.id,
+            ReservaExcluida.versao > since
+        )
+        if mais:
+            excluidas = excluidas.filter(ReservaExcluida.versao <= versao)
+        excluidas = excluidas.all()
+        
+        if not mais:
+            versao = max([since] + [r.versao for r in reservas] + [e.versao for e in excluidas])
+        
+        removidos = [r.uuid for r in reservas if r.status == 'cancelada']
+        removidos += [e.reserva_uuid for e in excluidas]
+        
+        return jsonify({
+            'alterados': [serializar_reserva(r) for r in reservas if r.status != 'cancelada'],
+            'removidos': removidos,
+            'versao': versao,
+            'mais': mais
+        })
+    except Exception as e:
+        print(f"❌ API Erro agendamentos_sync: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        # Não devolver a mensagem da exceção: pode conter o SQL executado
+        return jsonify({'error': 'Erro interno ao sincronizar agendamentos'}), 500
+
+@app.route('/<slug>/api/stream')
+def api_stream(slug):
+    """Canal Server-Sent Events do dashboard admin.
+    
+    Emite um evento ``reservas`` (com a ``versao`` atual) sempre que reservas da
+    barbearia são criadas, alteradas ou removidas; o dashboard então chama
+    ``api_agendamentos_sync`` com ``since``. A conexão é encerrada após
+    EVENTOS_STREAM_DURACAO segundos e o navegador reconecta sozinho.
+    """
+    if 'usuario_id' not in session:
+        return jsonify({'error': 'Não autorizado'}), 401
+    
+    if not hasattr(g, 'tenant') or not g.tenant or not g.tenant.is_admin():
+        return jsonify({'error': 'Acesso negado - apenas administradores'}), 403
+    
+    barbearia = get_barbearia_por_slug(slug)
+    if not barbearia:
+        return jsonify({'error': 'Barbearia não encontrada'}), 404
+    
+    barbearia_id = barbearia.id
+    versao = versao_atual_reservas(barbearia_id)
+    inscricao = hub_eventos.inscrever(barbearia_id)
+    
+    def gerar():
+        # Sem stream_with_context: a sessão do banco é liberada ao fim da view,
+        # a conexão SSE não segura uma conexão do pool
+        try:
+            yield 'retry: 3000\n'
+            yield f"event: reservas\ndata: {json.dumps({'tipo': 'reservas', 'versao': versao})}\n\n"
+            
+            encerrar_em = time.monotonic() + EVENTOS_STREAM_DURACAO
+            while time.monotonic() < encerrar_em:
+                evento = inscricao.aguardar(timeout=20)
+                if evento is None:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: {evento.get('tipo', 'mensagem')}\ndata: {json.dumps(evento)}\n\n"
+        finally:
+            inscricao.cancelar()
+    
+    return Response(gerar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/<slug>/api/reservas_cliente')
 def api_reservas_cliente(slug):
     """API para buscar reservas do cliente com filtro"""
@@ -2765,7 +3887,7 @@ def api_reservas_cliente(slug):
             print("❌ API: Usuário não autenticado")
             return jsonify({'error': 'Não autorizado'}), 401
         
-        barbearia = Barbearia.query.filter_by(slug=slug).first()
+        barbearia = get_barbearia_por_slug(slug)
         if not barbearia:
             print(f"❌ API: Barbearia não encontrada com slug: {slug}")
             return jsonify({'error': 'Barbearia não encontrada'}), 404
@@ -2825,7 +3947,7 @@ def perfil():
         flash('Faça login para acessar o perfil.', 'warning')
         return redirect(url_for('login', slug=get_current_barbearia_slug()))
 
-    usuario = Usuario.query.get(session['usuario_id'])
+    usuario = get_current_usuario(Usuario, db)
 
     if request.method == 'POST':
         novo_nome = request.form.get('nome', usuario.nome).strip()
@@ -2834,7 +3956,7 @@ def perfil():
         if novo_nome:
             usuario.nome = novo_nome
         if nova_senha:
-            usuario.senha = generate_password_hash(nova_senha)
+            usuario.senha = gerar_hash_senha(nova_senha)
 
         db.session.commit()
         session['usuario_nome'] = usuario.nome
@@ -2889,17 +4011,18 @@ def super_admin_login():
     """Login específico para super admin"""
     # Se já está logado como super admin, redireciona para o painel da primeira barbearia ativa (se houver)
     if 'usuario_id' in session:
-        usuario = Usuario.query.get(session['usuario_id'])
+        usuario = get_current_usuario(Usuario, db)
         if usuario and usuario.tipo_conta == 'super_admin':
             return redirect(url_for('super_admin_dashboard'))
     
     if request.method == 'POST':
         # Rate limiting por IP
         client_ip = get_client_ip()
-        allowed, remaining, lockout_seconds = check_rate_limit(client_ip)
+        chave_limite = f'login:{client_ip}'  # compartilhado com o login das barbearias
+        allowed, remaining, lockout_seconds = check_rate_limit(chave_limite)
         
         if not allowed:
-            minutes = lockout_seconds // 60
+            minutes = max(1, lockout_seconds // 60)
             flash(f'Muitas tentativas de login. Tente novamente em {minutes} minutos.', 'error')
             audit_log('super_admin_login_blocked', details={'ip': client_ip})
             return render_template('super_admin/login.html')
@@ -2918,7 +4041,7 @@ def super_admin_login():
             Usuario.ativo == True
         ).first()
         
-        if usuario and check_password_hash(usuario.senha, senha):
+        if autenticar_usuario(usuario, senha):
             # Limpar sessão anterior
             session.clear()
             
@@ -2930,14 +4053,14 @@ def super_admin_login():
             session.permanent = True
             
             # Registrar sucesso
-            record_login_attempt(client_ip, success=True)
+            record_login_attempt(chave_limite, success=True)
             audit_log('super_admin_login_success', user_id=usuario.id, details={'username': usuario.username})
             
             flash('Super Admin logado com sucesso!', 'success')
             return redirect(url_for('super_admin_dashboard'))
         else:
             # Login falhou
-            record_login_attempt(client_ip, success=False)
+            record_login_attempt(chave_limite, success=False)
             if usuario:
                 audit_log('super_admin_login_failed', user_id=usuario.id, details={'reason': 'wrong_password'})
             else:
@@ -2950,49 +4073,199 @@ def super_admin_login():
     
     return render_template('super_admin/login.html')
 
+# ---------- ESTATÍSTICAS DO SUPER ADMIN ----------
+
+ESTATISTICAS_CACHE_TTL = int(os.environ.get('ESTATISTICAS_CACHE_TTL', 30))  # segundos
+cache_estatisticas = CacheTTL(ESTATISTICAS_CACHE_TTL)
+
+# Modelos cujas alterações mudam as estatísticas globais
+MODELOS_ESTATISTICAS = (Barbearia, Usuario, UsuarioBarbearia, Servico, Reserva)
+
+@db.event.listens_for(db.session, 'before_flush')
+def marcar_estatisticas_alteradas(session, flush_context, instances):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, MODELOS_ESTATISTICAS):
+            session.info['estatisticas_alteradas'] = True
+            return
+
+@db.event.listens_for(db.session, 'after_commit')
+def invalidar_estatisticas(session):
+    if session.info.pop('estatisticas_alteradas', False):
+        cache_estatisticas.invalidar()
+
+@db.event.listens_for(db.session, 'after_rollback')
+def descartar_estatisticas_alteradas(session):
+    session.info.pop('estatisticas_alteradas', None)
+
+def calcular_estatisticas_globais():
+    """Contagens do dashboard do super admin em 3 consultas, qualquer que seja o número de barbearias"""
+    # Contagens por barbearia em subconsultas agrupadas, unidas às barbearias ativas
+    usuarios_por_barbearia = db.session.query(
+        UsuarioBarbearia.barbearia_id.label('barbearia_id'), db.func.count().label('total')
+    ).join(Usuario, Usuario.id == UsuarioBarbearia.usuario_id).group_by(UsuarioBarbearia.barbearia_id).subquery()
+    servicos_por_barbearia = db.session.query(
+        Servico.barbearia_id.label('barbearia_id'), db.func.count().label('total')
+    ).filter(Servico.ativo == True).group_by(Servico.barbearia_id).subquery()
+    reservas_por_barbearia = db.session.query(
+        Reserva.barbearia_id.label('barbearia_id'), db.func.count().label('total')
+    ).group_by(Reserva.barbearia_id).subquery()
+
+    linhas = db.session.query(
+        Barbearia.id, Barbearia.nome, Barbearia.slug, Barbearia.telefone,
+        db.func.coalesce(usuarios_por_barbearia.c.total, 0),
+        db.func.coalesce(servicos_por_barbearia.c.total, 0),
+        db.func.coalesce(reservas_por_barbearia.c.total, 0)
+    ).outerjoin(usuarios_por_barbearia, usuarios_por_barbearia.c.barbearia_id == Barbearia.id
+    ).outerjoin(servicos_por_barbearia, servicos_por_barbearia.c.barbearia_id == Barbearia.id
+    ).outerjoin(reservas_por_barbearia, reservas_por_barbearia.c.barbearia_id == Barbearia.id
+    ).filter(Barbearia.ativa == True).order_by(Barbearia.id).all()
+
+    barbearias_stats = [{
+        'barbearia': {'id': id_, 'nome': nome, 'slug': slug, 'telefone': telefone},
+        'usuarios': usuarios,
+        'servicos': servicos,
+        'reservas': reservas
+    } for id_, nome, slug, telefone, usuarios, servicos, reservas in linhas]
+
+    # Usuários ativos por tipo de conta
+    usuarios_stats = {'super_admin': 0, 'admin_barbearia': 0, 'barbeiro': 0, 'cliente': 0}
+    total_usuarios = 0
+    for tipo_conta, total in db.session.query(Usuario.tipo_conta, db.func.count()).filter(
+        Usuario.ativo == True
+    ).group_by(Usuario.tipo_conta):
+        total_usuarios += total
+        if tipo_conta in usuarios_stats:
+            usuarios_stats[tipo_conta] = total
+
+    # Totais globais de serviços e reservas (inclusive de barbearias inativas)
+    total_servicos, total_reservas = db.session.query(
+        db.select(db.func.count()).select_from(Servico).where(Servico.ativo == True).scalar_subquery(),
+        db.select(db.func.count()).select_from(Reserva).scalar_subquery()
+    ).one()
+
+    return {
+        'total_barbearias': len(barbearias_stats),
+        'total_usuarios': total_usuarios,
+        'total_servicos': total_servicos,
+        'total_reservas': total_reservas,
+        'barbearias_stats': barbearias_stats,
+        'usuarios_stats': usuarios_stats,
+    }
+
+# ---------- RELATÓRIOS DE CRESCIMENTO ----------
+
+RELATORIOS_CACHE_TTL = int(os.environ.get('RELATORIOS_CACHE_TTL', 300))  # segundos
+cache_relatorios = CacheTTL(RELATORIOS_CACHE_TTL, max_itens=64)
+
+@db.event.listens_for(db.session, 'before_flush')
+def marcar_relatorios_alterados(session, flush_context, instances):
+    for obj in session.new:
+        if isinstance(obj, UsuarioBarbearia):
+            # Vínculo de um usuário antigo muda períodos passados
+            session.info['relatorios_alterados'] = 'todos'
+            return
+        if isinstance(obj, (Usuario, Reserva)):
+            session.info.setdefault('relatorios_alterados', 'recentes')
+
+@db.event.listens_for(db.session, 'after_commit')
+def invalidar_relatorios(session):
+    alterados = session.info.pop('relatorios_alterados', None)
+    if alterados == 'todos':
+        cache_relatorios.invalidar()
+    elif alterados:
+        # Registros novos só entram em intervalos que chegam até hoje (margem de 1 dia pelo fuso)
+        from datetime import date, timedelta
+        ontem = date.today() - timedelta(days=1)
+        cache_relatorios.invalidar_onde(lambda chave: chave[1] >= ontem)
+
+@db.event.listens_for(db.session, 'after_rollback')
+def descartar_relatorios_alterados(session):
+    session.info.pop('relatorios_alterados', None)
+
+def calcular_crescimento(inicio, fim, granularidade):
+    """Novos usuários e novas reservas por barbearia e período em [inicio, fim] (date).
+    
+    Uma consulta agrupada por métrica; as séries vêm completas com zeros.
+    """
+    from datetime import time, timedelta
+    
+    lista_periodos = periodos(inicio, fim, granularidade)
+    dialeto = db.engine.dialect.name
+    limite_inicio = datetime.combine(inicio, time.min)
+    limite_fim = datetime.combine(fim + timedelta(days=1), time.min)
+    
+    periodo_usuario = expressao_periodo(Usuario.data_criacao, granularidade, dialeto)
+    novos_usuarios = db.session.query(
+        UsuarioBarbearia.barbearia_id, periodo_usuario, db.func.count()
+    ).join(Usuario, Usuario.id == UsuarioBarbearia.usuario_id).filter(
+        Usuario.data_criacao >= limite_inicio,
+        Usuario.data_criacao < limite_fim
+    ).group_by(UsuarioBarbearia.barbearia_id, periodo_usuario).all()
+    
+    periodo_reserva = expressao_periodo(Reserva.data_criacao, granularidade, dialeto)
+    novas_reservas = db.session.query(
+        Reserva.barbearia_id, periodo_reserva, db.func.count()
+    ).filter(
+        Reserva.data_criacao >= limite_inicio,
+        Reserva.data_criacao < limite_fim
+    ).group_by(Reserva.barbearia_id, periodo_reserva).all()
+    
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'granularidade': granularidade,
+        'periodos': [periodo.isoformat() for periodo in lista_periodos],
+        'novos_usuarios': montar_series(novos_usuarios, lista_periodos),
+        'novas_reservas': montar_series(novas_reservas, lista_periodos),
+    }
+
+def relatorio_crescimento(inicio, fim, granularidade):
+    """calcular_crescimento em cache por (inicio, fim, granularidade)"""
+    return cache_relatorios.obter(
+        (inicio, fim, granularidade), lambda: calcular_crescimento(inicio, fim, granularidade)
+    )
+
+def parametros_relatorio():
+    """(inicio, fim, granularidade, aviso) a partir da query string; padrão: mês atual por dia"""
+    from datetime import date
+    
+    hoje = date.today()
+    aviso = None
+    granularidade = request.args.get('granularidade', 'dia')
+    if granularidade not in GRANULARIDADES:
+        aviso = f'Granularidade "{granularidade}" inválida; agrupado por "dia".'
+        granularidade = 'dia'
+    try:
+        inicio = date.fromisoformat(request.args.get('inicio') or hoje.replace(day=1).isoformat())
+        fim = date.fromisoformat(request.args.get('fim') or hoje.isoformat())
+    except ValueError:
+        inicio, fim = hoje.replace(day=1), hoje
+        aviso = 'Datas inválidas; exibindo o mês atual.'
+    if inicio > fim:
+        inicio, fim = fim, inicio
+    
+    # Intervalos longos demais para a granularidade passam para uma mais grossa
+    for alternativa in GRANULARIDADES[GRANULARIDADES.index(granularidade):]:
+        if contar_periodos(inicio, fim, alternativa) <= MAX_PERIODOS:
+            if alternativa != granularidade:
+                aviso = f'Intervalo longo demais para "{granularidade}"; agrupado por "{alternativa}".'
+                granularidade = alternativa
+            break
+    else:
+        granularidade = 'mes'
+        inicio = date(fim.year - MAX_PERIODOS // 12 + 1, 1, 1)
+        aviso = f'Intervalo limitado a partir de {inicio.strftime("%d/%m/%Y")}.'
+    
+    return inicio, fim, granularidade, aviso
+
 @app.route('/super_admin/dashboard')
 @require_super_admin
 def super_admin_dashboard():
     """Dashboard do super admin com visão global"""
-    # Estatísticas globais
-    total_barbearias = Barbearia.query.filter_by(ativa=True).count()
-    total_usuarios = Usuario.query.filter_by(ativo=True).count()
-    total_servicos = Servico.query.filter_by(ativo=True).count()
-    total_reservas = Reserva.query.count()
-    
-    # Barbearias com detalhes
-    barbearias = Barbearia.query.filter_by(ativa=True).all()
-    barbearias_stats = []
+    # Estatísticas em cache por alguns segundos; invalidadas quando os dados mudam
+    estatisticas = cache_estatisticas.obter('globais', calcular_estatisticas_globais)
     
-    for barbearia in barbearias:
-        usuarios_barbearia = db.session.query(Usuario).join(UsuarioBarbearia).filter(
-            UsuarioBarbearia.barbearia_id == barbearia.id
-        ).count()
-        servicos_barbearia = Servico.query.filter_by(barbearia_id=barbearia.id, ativo=True).count()
-        reservas_barbearia = Reserva.query.filter_by(barbearia_id=barbearia.id).count()
-        
-        barbearias_stats.append({
-            'barbearia': barbearia,
-            'usuarios': usuarios_barbearia,
-            'servicos': servicos_barbearia,
-            'reservas': reservas_barbearia
-        })
-    
-    # Usuários por tipo
-    usuarios_stats = {
-        'super_admin': Usuario.query.filter_by(tipo_conta='super_admin', ativo=True).count(),
-        'admin_barbearia': Usuario.query.filter_by(tipo_conta='admin_barbearia', ativo=True).count(),
-        'barbeiro': Usuario.query.filter_by(tipo_conta='barbeiro', ativo=True).count(),
-        'cliente': Usuario.query.filter_by(tipo_conta='cliente', ativo=True).count()
-    }
-    
-    return render_template('super_admin/dashboard.html',
-                         total_barbearias=total_barbearias,
-                         total_usuarios=total_usuarios,
-                         total_servicos=total_servicos,
-                         total_reservas=total_reservas,
-                         barbearias_stats=barbearias_stats,
-                         usuarios_stats=usuarios_stats)
+    return render_template('super_admin/dashboard.html', **estatisticas)
 
 @app.route('/super_admin/barbearias')
 @require_super_admin
@@ -3041,7 +4314,7 @@ def super_admin_novo_usuario():
             username=username,
             email=email if email else None,
             telefone=telefone,
-            senha=generate_password_hash(senha),
+            senha=gerar_hash_senha(senha),
             tipo_conta=tipo_conta,
             ativo=True
         )
@@ -3071,78 +4344,147 @@ def super_admin_novo_usuario():
     barbearias = Barbearia.query.filter_by(ativa=True).all()
     return render_template('super_admin/usuario_form.html', barbearias=barbearias)
 
+USUARIOS_POR_PAGINA = 100  # vínculos (usuário × barbearia) por página
+
 @app.route('/super_admin/usuarios')
 @require_super_admin
 def super_admin_usuarios():
-    """Gestão de todos os usuários do sistema"""
-    usuarios = Usuario.query.filter_by(ativo=True).all()
-    
-    # Organizar usuários por barbearia
-    usuarios_organizados = {}
-    for usuario in usuarios:
-        if usuario.tipo_conta == 'super_admin':
-            if 'Sistema' not in usuarios_organizados:
-                usuarios_organizados['Sistema'] = []
-            usuarios_organizados['Sistema'].append({
-                'usuario': usuario,
-                'vinculos': []
-            })
-        else:
-            vinculos = UsuarioBarbearia.query.filter_by(usuario_id=usuario.id, ativo=True).all()
-            for vinculo in vinculos:
-                barbearia_nome = vinculo.barbearia.nome
-                if barbearia_nome not in usuarios_organizados:
-                    usuarios_organizados[barbearia_nome] = []
-                
-                # Verificar se usuário já está na lista desta barbearia
-                usuario_existente = None
-                for item in usuarios_organizados[barbearia_nome]:
-                    if item['usuario'].id == usuario.id:
-                        usuario_existente = item
-                        break
-                
-                if usuario_existente:
-                    usuario_existente['vinculos'].append(vinculo)
-                else:
-                    usuarios_organizados[barbearia_nome].append({
-                        'usuario': usuario,
-                        'vinculos': [vinculo]
-                    })
+    """Gestão de todos os usuários do sistema, paginada e filtrável por barbearia"""
+    filtro_barbearia = request.args.get('barbearia', '').strip()
+    busca = request.args.get('busca', '').strip()
+    try:
+        pagina = max(1, int(request.args.get('pagina', 1)))
+    except ValueError:
+        pagina = 1
+    
+    # Uma linha por vínculo ativo; super admins aparecem uma vez, sem vínculo, em 'Sistema'
+    consulta = db.session.query(Usuario, UsuarioBarbearia, Barbearia.nome).outerjoin(
+        UsuarioBarbearia, db.and_(
+            UsuarioBarbearia.usuario_id == Usuario.id,
+            UsuarioBarbearia.ativo == True,
+            Usuario.tipo_conta != 'super_admin'
+        )
+    ).outerjoin(
+        Barbearia, Barbearia.id == UsuarioBarbearia.barbearia_id
+    ).filter(
+        Usuario.ativo == True,
+        db.or_(Usuario.tipo_conta == 'super_admin', UsuarioBarbearia.id.isnot(None))
+    )
     
-    return render_template('super_admin/usuarios.html', usuarios_organizados=usuarios_organizados)
+    if filtro_barbearia == 'sistema':
+        consulta = consulta.filter(Usuario.tipo_conta == 'super_admin')
+    elif filtro_barbearia:
+        consulta = consulta.filter(Barbearia.slug == filtro_barbearia)
+    
+    if busca:
+        termo = f'%{busca}%'
+        consulta = consulta.filter(db.or_(
+            Usuario.nome.ilike(termo), Usuario.email.ilike(termo), Usuario.username.ilike(termo)
+        ))
+    
+    # 'Sistema' primeiro, depois por barbearia e nome; uma linha a mais indica a próxima página
+    linhas = consulta.order_by(
+        db.case((UsuarioBarbearia.id.is_(None), 0), else_=1),
+        Barbearia.nome, Usuario.nome, Usuario.id
+    ).offset((pagina - 1) * USUARIOS_POR_PAGINA).limit(USUARIOS_POR_PAGINA + 1).all()
+    
+    tem_proxima = len(linhas) > USUARIOS_POR_PAGINA
+    
+    # Agrupar por barbearia e usuário: {barbearia_nome: {usuario_id: item}}
+    agrupados = {}
+    for usuario, vinculo, barbearia_nome in linhas[:USUARIOS_POR_PAGINA]:
+        usuarios_barbearia = agrupados.setdefault(barbearia_nome or 'Sistema', {})
+        item = usuarios_barbearia.setdefault(usuario.id, {'usuario': usuario, 'vinculos': []})
+        if vinculo is not None:
+            item['vinculos'].append(vinculo)
+    
+    usuarios_organizados = {nome: list(itens.values()) for nome, itens in agrupados.items()}
+    barbearias = db.session.query(Barbearia.nome, Barbearia.slug).filter(
+        Barbearia.ativa == True
+    ).order_by(Barbearia.nome).all()
+    
+    return render_template('super_admin/usuarios.html',
+                         usuarios_organizados=usuarios_organizados,
+                         barbearias=barbearias,
+                         filtro_barbearia=filtro_barbearia,
+                         busca=busca,
+                         pagina=pagina,
+                         tem_proxima=tem_proxima)
 
 @app.route('/super_admin/relatorios')
 @require_super_admin
 def super_admin_relatorios():
     """Relatórios globais do sistema"""
-    # Relatório de crescimento por barbearia
-    barbearias = Barbearia.query.filter_by(ativa=True).all()
-    relatorio_crescimento = []
-    
-    for barbearia in barbearias:
-        usuarios_mes = db.session.query(Usuario).join(UsuarioBarbearia).filter(
-            UsuarioBarbearia.barbearia_id == barbearia.id,
-            Usuario.data_criacao >= '2025-11-01'
-        ).count()
-        
-        reservas_mes = Reserva.query.filter(
-            Reserva.barbearia_id == barbearia.id,
-            Reserva.data_criacao >= '2025-11-01'
-        ).count()
-        
-        relatorio_crescimento.append({
+    inicio, fim, granularidade, aviso = parametros_relatorio()
+    if aviso:
+        flash(aviso, 'warning')
+    
+    # Crescimento por barbearia no intervalo (em cache) e faturamento do resumo diário
+    crescimento = relatorio_crescimento(inicio, fim, granularidade)
+    faturamento = faturamento_por_barbearia(inicio.isoformat(), fim.isoformat())
+    vazia = [0] * len(crescimento['periodos'])
+    
+    relatorio_crescimento_barbearias = []
+    for barbearia in Barbearia.query.filter_by(ativa=True).order_by(Barbearia.nome).all():
+        serie_usuarios = crescimento['novos_usuarios'].get(barbearia.id, vazia)
+        serie_reservas = crescimento['novas_reservas'].get(barbearia.id, vazia)
+        atendimentos, valor = faturamento.get(barbearia.id, (0, 0))
+        relatorio_crescimento_barbearias.append({
             'barbearia': barbearia,
-            'novos_usuarios': usuarios_mes,
-            'reservas_mes': reservas_mes
+            'novos_usuarios': sum(serie_usuarios),
+            'novas_reservas': sum(serie_reservas),
+            'serie_reservas': serie_reservas,
+            'atendimentos': atendimentos,
+            'faturamento': valor
         })
     
     # Top serviços por preço
     top_servicos = Servico.query.filter_by(ativo=True).order_by(Servico.preco.desc()).limit(10).all()
     
     return render_template('super_admin/relatorios.html',
-                         relatorio_crescimento=relatorio_crescimento,
+                         relatorio_crescimento=relatorio_crescimento_barbearias,
+                         periodos=crescimento['periodos'],
+                         inicio=inicio,
+                         fim=fim,
+                         granularidade=granularidade,
+                         granularidades=GRANULARIDADES,
                          top_servicos=top_servicos)
 
+@app.route('/super_admin/api/relatorios/crescimento')
+@require_super_admin
+def api_relatorio_crescimento():
+    """Séries de crescimento por barbearia em JSON (para gráficos)"""
+    from datetime import date
+    
+    # Na API, parâmetros inválidos são erro (a página apenas avisa e usa o padrão)
+    if request.args.get('granularidade', 'dia') not in GRANULARIDADES:
+        return jsonify({'error': f'granularidade deve ser uma de: {", ".join(GRANULARIDADES)}'}), 400
+    try:
+        for parametro in ('inicio', 'fim'):
+            if request.args.get(parametro):
+                date.fromisoformat(request.args[parametro])
+    except ValueError:
+        return jsonify({'error': 'inicio e fim devem estar no formato AAAA-MM-DD'}), 400
+    
+    inicio, fim, granularidade, aviso = parametros_relatorio()
+    crescimento = relatorio_crescimento(inicio, fim, granularidade)
+    barbearias = dict(db.session.query(Barbearia.id, Barbearia.slug).all())
+    vazia = [0] * len(crescimento['periodos'])
+    
+    return jsonify({
+        'inicio': crescimento['inicio'],
+        'fim': crescimento['fim'],
+        'granularidade': granularidade,
+        'aviso': aviso,
+        'periodos': crescimento['periodos'],
+        'barbearias': [{
+            'id': barbearia_id,
+            'slug': slug,
+            'novos_usuarios': crescimento['novos_usuarios'].get(barbearia_id, vazia),
+            'novas_reservas': crescimento['novas_reservas'].get(barbearia_id, vazia)
+        } for barbearia_id, slug in barbearias.items()]
+    })
+
 # ==================== ROTAS DE PLANOS DO SUPER ADMIN ====================
 
 @app.route('/super_admin/planos')
@@ -3202,6 +4544,7 @@ def super_admin_criar_plano(barbearia_uuid):
             
             db.session.add(novo_plano)
             db.session.commit()
+            invalidar_cache_planos(barbearia.id)
             
             flash(f'Plano "{nome}" criado com sucesso!', 'success')
             return redirect(url_for('super_admin_planos'))
@@ -3250,6 +4593,7 @@ def super_admin_editar_plano(plano_uuid):
             plano.set_beneficios(beneficios)
             
             db.session.commit()
+            invalidar_cache_planos(plano.barbearia_id)
             
             flash(f'Plano "{nome}" atualizado com sucesso!', 'success')
             return redirect(url_for('super_admin_planos'))
@@ -3268,10 +4612,12 @@ def super_admin_excluir_plano(plano_uuid):
     """Excluir permanentemente um plano"""
     plano = PlanoMensal.query.filter_by(uuid=plano_uuid).first_or_404()
     nome = plano.nome
+    barbearia_id = plano.barbearia_id
     
     try:
         db.session.delete(plano)
         db.session.commit()
+        invalidar_cache_planos(barbearia_id)
         flash(f'Plano "{nome}" excluído permanentemente!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -3447,6 +4793,7 @@ def super_admin_editar_barbearia(barbearia_uuid):
         
         try:
             db.session.commit()
+            invalidar_cache_barbearia(barbearia.id)
             flash('Barbearia atualizada com sucesso!', 'success')
             return redirect(url_for('super_admin_barbearias'))
         except Exception as e:
@@ -3563,6 +4910,7 @@ def super_admin_deletar_barbearia(barbearia_uuid):
     
     try:
         db.session.commit()
+        invalidar_cache_barbearia(barbearia.id)
         flash(f'Barbearia "{barbearia.nome}" foi inativada!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -3625,7 +4973,7 @@ def admin_suporte(slug):
         return redirect(url_for('dashboard', slug=slug))
     
     barbearia = get_current_barbearia()
-    usuario = Usuario.query.get(session['usuario_id'])
+    usuario = get_current_usuario(Usuario, db)
     
     if request.method == 'POST':
         try:
@@ -3739,10 +5087,14 @@ def admin_chamados(slug):
 @app.route('/<slug>/admin/chamados/sincronizar', methods=['POST'])
 @csrf.exempt
 def sincronizar_chamados_manual(slug):
-    """Endpoint desativado para melhorar performance do sistema"""
+    """Informa como os chamados são sincronizados (a sincronização roda na tarefa periódica)"""
+    if CHAMADOS_SYNC_AUTOMATICA:
+        mensagem = 'Sincronização automática ativa: os chamados são atualizados em segundo plano.'
+    else:
+        mensagem = 'Sincronização automática desativada (CHAMADOS_SYNC_AUTOMATICA=0).'
     return jsonify({
         'success': True, 
-        'message': 'Sincronização automática desativada para otimização do sistema.'
+        'message': mensagem
     })
 
 @app.route('/_endpoints_debug')
@@ -3823,63 +5175,23 @@ def webhook_status_update():
         db.session.rollback()
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
-def mapear_status_api(status_api):
-    """Mapeia status da API externa para status local"""
-    mapeamento = {
-        'novo': 'enviado',
-        'recebido': 'enviado',
-        'em_andamento': 'em_andamento',
-        'atendimento': 'em_andamento',
-        'em_atendimento': 'em_andamento',
-        'resolvido': 'resolvido',
-        'finalizado': 'fechado',
-        'fechado': 'fechado',
-        'cancelado': 'cancelado',
-        'deletado': 'cancelado'
-    }
-
-    return mapeamento.get(status_api.lower(), 'enviado')
-
 # ---------- SINCRONIZAÇÃO AUTOMÁTICA DE CHAMADOS ----------
 
+cliente_suporte = ClienteSuporte()
+
 def sincronizar_chamados_automatica():
     """Função executada automaticamente pelo scheduler para sincronizar chamados"""
     try:
         print(f"🔄 [{datetime.now().strftime('%H:%M:%S')}] Executando sincronização automática de chamados...")
 
         with app.app_context():
-            # Buscar chamados que têm api_chamado_id
-            chamados = Chamado.query.filter(Chamado.api_chamado_id.isnot(None)).all()
+            # Apenas chamados que ainda podem mudar e cuja verificação venceu
+            resumo = executar_ciclo(db.session, Chamado, cliente_suporte)
 
-            if not chamados:
+            if not resumo['consultados']:
                 print("⚠️  Nenhum chamado para sincronizar")
-                return
-
-            atualizados = 0
-            deletados = 0
-
-            for chamado in chamados:
-                try:
-                    # Verificar status na API
-                    status_api, _ = verificar_status_chamado_api(chamado.api_chamado_id)
-
-                    if status_api == 'deletado' and chamado.status != 'cancelado':
-                        chamado.status = 'cancelado'
-                        chamado.data_atualizacao = datetime.utcnow()
-                        deletados += 1
-                        print(f"   🗑️  {chamado.numero_chamado} marcado como CANCELADO")
-                    elif status_api and status_api != chamado.status:
-                        chamado.status = status_api
-                        chamado.data_atualizacao = datetime.utcnow()
-                        atualizados += 1
-                        print(f"   🔄 {chamado.numero_chamado}: {chamado.status} → {status_api}")
-
-                except Exception as e:
-                    print(f"   ❌ Erro em {chamado.numero_chamado}: {e}")
-
-            if atualizados > 0 or deletados > 0:
-                db.session.commit()
-                print(f"✅ Sincronização concluída: {atualizados} atualizados, {deletados} cancelados")
+            elif resumo['atualizados'] or resumo['cancelados']:
+                print(f"✅ Sincronização concluída: {resumo['atualizados']} atualizados, {resumo['cancelados']} cancelados")
             else:
                 print("✅ Nenhum chamado precisou ser atualizado")
 
@@ -3888,83 +5200,212 @@ def sincronizar_chamados_automatica():
 
 def verificar_status_chamado_api(api_chamado_id):
     """Verifica status de um chamado na API externa (função auxiliar)"""
-    if not api_chamado_id:
-        return None, None
-
     try:
-        # Tentar diferentes endpoints
-        endpoints = [
-            f"http://localhost:5001/api/v1/suporte/{api_chamado_id}",
-            f"http://localhost:5001/api/v1/chamados/{api_chamado_id}",
-            f"http://localhost:5001/api/chamados/{api_chamado_id}"
-        ]
-
-        headers = {"X-API-Key": "barber-connect-api-key-2025"}
-
-        for url in endpoints:
-            try:
-                response = requests.get(url, headers=headers, timeout=5)
-                if response.status_code == 200:
-                    try:
-                        data = response.json()
-                        
-                        # Verificar formato da resposta
-                        if data.get('success') and 'ticket' in data:
-                            # Formato: {"success": true, "ticket": {...}}
-                            ticket = data['ticket']
-                            status_api = ticket.get('status', 'novo')
-                        else:
-                            # Formato direto
-                            status_api = data.get('status', 'novo')
-                        
-                        # Mapear status da API para status local
-                        status_mapeado = mapear_status_api(status_api)
-                        return status_mapeado, data
-                        
-                    except json.JSONDecodeError:
-                        print(f"⚠️  Resposta JSON inválida da API: {url}")
-                        continue
-                elif response.status_code == 404:
-                    return 'deletado', None
-            except requests.RequestException as e:
-                print(f"⚠️  Erro ao conectar com {url}: {e}")
-                continue
-
+        return cliente_suporte.consultar_status(api_chamado_id)
+    except requests.RequestException as e:
+        print(f"⚠️  Erro ao conectar com a API de suporte: {e}")
     except Exception as e:
         print(f"❌ Erro ao verificar API: {e}")
 
     return None, None
 
-def iniciar_scheduler_sincronizacao():
-    """Inicia o scheduler para sincronização automática"""
-    try:
-        # Verificar se já existe um scheduler
-        if hasattr(app, 'scheduler') and app.scheduler.running:
-            print("🔄 Scheduler já está rodando")
-            return
+# ---------- TAREFAS PERIÓDICAS (executadas por um único processo) ----------
+
+LEASE_JOBS = 'jobs'
 
-        # Criar scheduler
-        app.scheduler = BackgroundScheduler()
-        app.scheduler.start()
-
-        # Adicionar job de sincronização a cada 5 minutos
-        app.scheduler.add_job(
-            func=sincronizar_chamados_automatica,
-            trigger=IntervalTrigger(minutes=5),
-            id='sincronizacao_chamados',
-            name='Sincronização automática de chamados',
-            replace_existing=True
+def adquirir_lease_jobs(dono, expira_em):
+    """Renova o lease de líder para ``dono``; True se este processo é o líder"""
+    from sqlalchemy.exc import IntegrityError
+    agora = datetime.utcnow()
+    with db.engine.begin() as conn:
+        resultado = conn.execute(
+            db.update(JobLease)
+            .where(
+                JobLease.nome == LEASE_JOBS,
+                db.or_(JobLease.dono == dono, JobLease.expira_em < agora)
+            )
+            .values(dono=dono, expira_em=expira_em)
         )
+        if resultado.rowcount:
+            return True
 
-        print("✅ Scheduler de sincronizacao iniciado - executara a cada 5 minutos")
-        print("💡 Para alterar o intervalo, modifique o parâmetro 'minutes' no IntervalTrigger")
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(db.insert(JobLease).values(nome=LEASE_JOBS, dono=dono, expira_em=expira_em))
+        return True
+    except IntegrityError:
+        return False  # outro processo detém o lease
+
+def registrar_execucao_job(dono, metricas, proxima_execucao):
+    """Acumula as métricas da última execução de uma tarefa"""
+    execucao = db.session.get(JobExecucao, metricas['nome'])
+    if not execucao:
+        execucao = JobExecucao(nome=metricas['nome'], execucoes=0, falhas=0, duracao_total=0, duracao_maxima=0,
+                               execucoes_sem_lease=0)
+        db.session.add(execucao)
+
+    execucao.dono = dono
+    execucao.execucoes += 1
+    if metricas['ultimo_erro']:
+        execucao.falhas += 1
+    if metricas['lease_perdido']:
+        execucao.execucoes_sem_lease = (execucao.execucoes_sem_lease or 0) + 1
+    execucao.ultimo_erro = metricas['ultimo_erro']
+    execucao.ultima_execucao = metricas['ultima_execucao']
+    execucao.ultima_duracao = metricas['ultima_duracao']
+    execucao.duracao_total += metricas['ultima_duracao']
+    execucao.duracao_maxima = max(execucao.duracao_maxima, metricas['ultima_duracao'])
+    execucao.proxima_execucao = proxima_execucao
+    db.session.commit()
 
-    except Exception as e:
-        print(f"❌ Erro ao iniciar scheduler: {e}")
+executor_jobs = ExecutorJobs(adquirir_lease_jobs, registrar_execucao_job, contexto=app.app_context)
+
+def _tarefa_ativada(variavel):
+    return os.environ.get(variavel, '0').lower() in ('1', 'true', 'yes')
+
+# Tarefas que chamam a API externa ou mudam o saldo dos clientes ficam desligadas
+# até serem ativadas explicitamente (antes não havia agendamento automático)
+CHAMADOS_SYNC_AUTOMATICA = _tarefa_ativada('CHAMADOS_SYNC_AUTOMATICA')
+RENOVACAO_ASSINATURAS_AUTOMATICA = _tarefa_ativada('RENOVACAO_ASSINATURAS_AUTOMATICA')
+
+def job_sincronizar_chamados():
+    """Consulta na API de suporte os chamados com verificação vencida"""
+    sincronizar_chamados_automatica()
+
+if CHAMADOS_SYNC_AUTOMATICA:
+    executor_jobs.registrar('sincronizar_chamados', intervalo=60, jitter=10)(job_sincronizar_chamados)
+
+def renovar_assinaturas_vencidas():
+    """Renova os atendimentos das assinaturas ativas cuja data de renovação passou"""
+    from datetime import timedelta
+    agora = datetime.now()
+    assinaturas = AssinaturaPlano.query.options(db.joinedload(AssinaturaPlano.plano)).filter(
+        AssinaturaPlano.status == 'ativa',
+        AssinaturaPlano.data_renovacao <= agora
+    ).all()
+
+    for assinatura in assinaturas:
+        assinatura.atendimentos_restantes = assinatura.plano.atendimentos_mes
+        # Assinaturas renovadas com atraso avançam até o próximo ciclo futuro
+        while assinatura.data_renovacao <= agora:
+            assinatura.data_renovacao += timedelta(days=30)
+
+    if assinaturas:
+        db.session.commit()
+        print(f"✅ [JOBS] {len(assinaturas)} assinaturas renovadas")
+
+if RENOVACAO_ASSINATURAS_AUTOMATICA:
+    executor_jobs.registrar('renovar_assinaturas', intervalo=60 * 60, jitter=5 * 60)(renovar_assinaturas_vencidas)
 
-# Inicializar componentes globais (Scheduler, etc)
-# Para Gunicorn, isso precisa ser chamado fora do bloco if __name__ == '__main__':
-# iniciar_scheduler_sincronizacao()
+@executor_jobs.registrar('marcar_despesas_atrasadas', intervalo=60 * 60, jitter=5 * 60)
+def marcar_despesas_atrasadas():
+    """Marca como atrasadas as despesas pendentes com vencimento passado"""
+    from datetime import date
+    resultado = db.session.execute(
+        db.update(Despesa)
+        .where(Despesa.status == 'pendente', Despesa.data_vencimento < date.today())
+        .values(status='atrasada')
+    )
+    db.session.commit()
+    if resultado.rowcount:
+        print(f"✅ [JOBS] {resultado.rowcount} despesas marcadas como atrasadas")
+
+@executor_jobs.registrar('materializar_despesas_recorrentes', intervalo=6 * 60 * 60, jitter=10 * 60)
+def job_materializar_despesas_recorrentes():
+    """Gera as próximas ocorrências das despesas recorrentes e aplica as edições dos modelos"""
+    atualizadas = sincronizar_ocorrencias_recorrentes()
+    if atualizadas:
+        print(f"✅ [JOBS] {atualizadas} ocorrências de despesas recorrentes atualizadas")
+    criadas = materializar_despesas_recorrentes()
+    if criadas:
+        print(f"✅ [JOBS] {criadas} ocorrências de despesas recorrentes geradas")
+
+EMAIL_FILA_INTERVALO = int(os.environ.get('EMAIL_FILA_INTERVALO', 10))  # segundos
+EMAIL_LOTES_POR_EXECUCAO = 10
+backend_email = criar_backend_email()
+
+@executor_jobs.registrar('enviar_emails', intervalo=EMAIL_FILA_INTERVALO, jitter=2)
+def enviar_emails():
+    """Envia os e-mails pendentes da fila, em lotes, pela mesma conexão"""
+    for _ in range(EMAIL_LOTES_POR_EXECUCAO):
+        resumo = processar_fila_emails(db.session, EmailFila, backend_email, lote=EMAIL_LOTE)
+        if resumo['enviados'] or resumo['falhas']:
+            print(f"📧 [EMAIL] {resumo['enviados']} enviados, {resumo['reagendados']} reagendados, {resumo['falhas']} com falha")
+        # Lote incompleto ou interrompido: não há mais nada a enviar agora
+        if sum(resumo.values()) < EMAIL_LOTE or resumo['reagendados']:
+            break
+        # Lease perdido durante a execução: o novo líder continua a fila
+        if executor_jobs.ativo and not executor_jobs.lider:
+            break
+
+@executor_jobs.registrar('limpar_sessoes_expiradas', intervalo=60 * 60, jitter=5 * 60)
+def job_limpar_sessoes_expiradas():
+    """Remove de uma vez as sessões vencidas do armazenamento"""
+    if interface_sessoes:
+        removidas = interface_sessoes.limpar_expiradas()
+        if removidas:
+            print(f"🧹 [SESSAO] {removidas} sessões expiradas removidas")
+
+def jobs_desativados():
+    return os.environ.get('JOBS_ATIVOS', '1').lower() in ('0', 'false', 'no')
+
+def iniciar_jobs():
+    """Inicia o executor de tarefas neste processo (desative com JOBS_ATIVOS=0)"""
+    if jobs_desativados():
+        print("ℹ️  Tarefas periódicas desativadas (JOBS_ATIVOS=0)")
+        return
+    executor_jobs.iniciar()
+
+@app.before_request
+def garantir_executor_jobs():
+    """Inicia o executor na primeira requisição de cada processo.
+    
+    Cobre os servidores que não passam pelo post_worker_init do gunicorn_config.py
+    (waitress-serve, gunicorn sem -c); iniciar() só cria o loop uma vez por PID.
+    """
+    if not executor_jobs.ativo and not jobs_desativados() and not app.testing:
+        iniciar_jobs()
+
+@app.route('/_jobs')
+@require_super_admin
+def status_jobs():
+    """Estado do executor de tarefas: líder atual e métricas de cada tarefa"""
+    def formatar(valor):
+        return valor.isoformat() if isinstance(valor, datetime) else valor
+
+    lease = db.session.get(JobLease, LEASE_JOBS)
+    execucoes = {e.nome: e for e in JobExecucao.query.all()}
+
+    jobs = []
+    for nome, job in executor_jobs.jobs.items():
+        execucao = execucoes.get(nome)
+        jobs.append({
+            'nome': nome,
+            'descricao': job.descricao,
+            'intervalo': job.intervalo,
+            'jitter': job.jitter,
+            'execucoes': execucao.execucoes if execucao else 0,
+            'falhas': execucao.falhas if execucao else 0,
+            'ultima_execucao': formatar(execucao.ultima_execucao) if execucao else None,
+            'ultima_duracao': execucao.ultima_duracao if execucao else None,
+            'duracao_media': execucao.duracao_total / execucao.execucoes if execucao and execucao.execucoes else None,
+            'duracao_maxima': execucao.duracao_maxima if execucao else None,
+            'ultimo_erro': execucao.ultimo_erro if execucao else None,
+            'execucoes_sem_lease': execucao.execucoes_sem_lease if execucao else 0,
+            'proxima_execucao': formatar(execucao.proxima_execucao) if execucao else None,
+        })
+
+    return jsonify({
+        'lider': lease.dono if lease and lease.expira_em > datetime.utcnow() else None,
+        'lease_expira_em': formatar(lease.expira_em) if lease else None,
+        'processo': executor_jobs.dono,
+        'processo_e_lider': executor_jobs.lider,
+        'jobs': jobs,
+    })
+
+# Com Gunicorn, as tarefas são iniciadas em cada worker pelo post_worker_init (gunicorn_config.py);
+# nos demais servidores, na primeira requisição (garantir_executor_jobs). Apenas o
+# processo que detém o lease as executa
 
 # ---------- START ----------
 if __name__ == '__main__':
@@ -3983,10 +5424,14 @@ if __name__ == '__main__':
     # Debug apenas em ambiente local (não em produção)
     debug = os.environ.get('FLASK_ENV') == 'development' or os.environ.get('DEBUG', '').lower() == 'true'
 
+    # Processo único: sem EVENTOS_BROKER, os eventos não precisam sair do processo
+    if not os.environ.get('EVENTOS_BROKER') and not isinstance(hub_eventos.broker, BrokerPostgres):
+        hub_eventos.broker = BrokerLocal()
+
+    iniciar_jobs()
     try:
         app.run(host=host, port=port, debug=debug, use_reloader=False)
     finally:
-        # Parar scheduler quando o app for encerrado
-        if hasattr(app, 'scheduler'):
-            print("🛑 Parando scheduler...")
-            app.scheduler.shutdown()
+        # Parar tarefas periódicas quando o app for encerrado
+        print("🛑 Parando tarefas periódicas...")
+        executor_jobs.parar()
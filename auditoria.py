@@ -0,0 +1,204 @@
+"""
+Gravação assíncrona do log de auditoria (logs/audit_YYYY-MM.jsonl)
+
+audit_log (security.py) apenas enfileira o evento; um único escritor por worker
+retira os eventos da fila em lotes, grava cada lote com um só write() em modo
+append e faz fsync no máximo a cada AUDIT_FSYNC_INTERVALO segundos.
+
+- A fila é limitada (AUDIT_FILA_MAX): sob pressão os eventos excedentes são
+  descartados e a contagem é registrada no próprio log (ação 'audit_dropped').
+- O arquivo muda a cada mês e, ao passar de AUDIT_TAMANHO_MAX bytes, é
+  renomeado para audit_YYYY-MM.N.jsonl.
+- Com gevent (monkey patching), o escritor é uma greenlet e a escrita em disco
+  roda no threadpool do hub, para não travar as demais requisições do worker.
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+FILA_MAX = int(os.environ.get('AUDIT_FILA_MAX', 10000))
+LOTE_MAX = 500  # eventos por escrita
+FSYNC_INTERVALO = float(os.environ.get('AUDIT_FSYNC_INTERVALO', 1.0))
+TAMANHO_MAX = int(os.environ.get('AUDIT_TAMANHO_MAX', 50 * 1024 * 1024))
+
+def _executar_io(funcao, *args):
+    """Executa I/O bloqueante fora do loop do gevent, quando ele está ativo"""
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            import gevent
+            return gevent.get_hub().threadpool.apply(funcao, args)
+    except ImportError:
+        pass
+    return funcao(*args)
+
+class GravadorAuditoria:
+    """Fila limitada + escritor em segundo plano para o log de auditoria"""
+
+    def __init__(self, diretorio, fila_max=FILA_MAX, fsync_intervalo=FSYNC_INTERVALO,
+                 tamanho_max=TAMANHO_MAX):
+        self.diretorio = diretorio
+        self.fsync_intervalo = fsync_intervalo
+        self.tamanho_max = tamanho_max
+        self.fila = queue.Queue(maxsize=fila_max)
+        self.descartados = 0  # total desde o início do processo
+        self.gravados = 0
+        self._descartados_reportados = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._arquivo = None
+        self._caminho = None
+        self._ultimo_fsync = 0.0
+        self._sem_fsync = False  # há dados gravados ainda sem fsync
+        self._lock_escrita = threading.Lock()
+
+    # ---------- LADO DA REQUISIÇÃO ----------
+
+    def enfileirar(self, evento):
+        """Enfileira o evento sem bloquear; retorna False se ele foi descartado"""
+        self._garantir_escritor()
+        try:
+            self.fila.put_nowait(evento)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.descartados += 1
+            return False
+
+    def estatisticas(self):
+        return {
+            'pendentes': self.fila.qsize(),
+            'gravados': self.gravados,
+            'descartados': self.descartados,
+        }
+
+    def _garantir_escritor(self):
+        # O app é carregado antes do fork (preload_app): o escritor precisa ser
+        # iniciado dentro de cada worker, nunca no processo master
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._arquivo = None
+                self._caminho = None
+                threading.Thread(target=self._executar, name='auditoria', daemon=True).start()
+                self._pid = os.getpid()
+
+    # ---------- ESCRITOR ----------
+
+    def _executar(self):
+        while True:
+            try:
+                evento = self.fila.get(timeout=self.fsync_intervalo)
+            except queue.Empty:
+                evento = None
+
+            lote = [] if evento is None else [evento]
+            while len(lote) < LOTE_MAX:
+                try:
+                    lote.append(self.fila.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                with self._lock_escrita:
+                    self._gravar_lote(lote)
+            except Exception as e:
+                print(f"[ERROR] Falha ao gravar log de auditoria: {str(e)}")
+
+    def _gravar_lote(self, lote):
+        descartados = self.descartados - self._descartados_reportados
+        if descartados:
+            self._descartados_reportados += descartados
+            print(f"⚠️ [AUDIT] {descartados} eventos de auditoria descartados (fila cheia)")
+            lote.append({
+                'timestamp': datetime.now().isoformat(),
+                'action': 'audit_dropped',
+                'details': {'count': descartados, 'pid': os.getpid()},
+            })
+
+        agora = time.monotonic()
+        precisa_fsync = (self._sem_fsync or bool(lote)) and agora - self._ultimo_fsync >= self.fsync_intervalo
+        if not lote and not precisa_fsync:
+            return
+
+        dados = ''.join(json.dumps(evento, default=str) + '\n' for evento in lote).encode('utf-8')
+        _executar_io(self._escrever, dados, precisa_fsync)
+        self.gravados += len(lote)
+        if precisa_fsync:
+            self._ultimo_fsync = agora
+            self._sem_fsync = False
+        elif lote:
+            self._sem_fsync = True
+
+    def _escrever(self, dados, fsync):
+        if dados:
+            self._abrir_arquivo()
+            os.write(self._arquivo, dados)
+        if fsync and self._arquivo is not None:
+            os.fsync(self._arquivo)
+
+    def _abrir_arquivo(self):
+        caminho = os.path.join(self.diretorio, f'audit_{datetime.now().strftime("%Y-%m")}.jsonl')
+
+        if self._arquivo is not None:
+            # Outro worker pode ter rotacionado o arquivo: reabrir se o inode mudou
+            try:
+                mesmo_arquivo = os.stat(caminho).st_ino == os.fstat(self._arquivo).st_ino
+            except FileNotFoundError:
+                mesmo_arquivo = False
+            if caminho == self._caminho and mesmo_arquivo:
+                if os.fstat(self._arquivo).st_size < self.tamanho_max:
+                    return
+                self._rotacionar(caminho)
+            self._fechar_arquivo()
+
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._arquivo = os.open(caminho, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._caminho = caminho
+
+    def _rotacionar(self, caminho):
+        base = caminho[:-len('.jsonl')]
+        numero = 1
+        while os.path.exists(f'{base}.{numero}.jsonl'):
+            numero += 1
+        try:
+            os.rename(caminho, f'{base}.{numero}.jsonl')
+        except FileNotFoundError:
+            pass  # já rotacionado por outro worker
+
+    def _fechar_arquivo(self):
+        if self._arquivo is not None:
+            try:
+                os.fsync(self._arquivo)
+                os.close(self._arquivo)
+            except OSError:
+                pass
+        self._arquivo = None
+        self._caminho = None
+
+    def encerrar(self):
+        """Grava o que restou na fila (chamado ao sair do processo)"""
+        if self._pid != os.getpid():
+            return
+        lote = []
+        while True:
+            try:
+                lote.append(self.fila.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            with self._lock_escrita:
+                self._gravar_lote(lote)
+                self._fechar_arquivo()
+        except Exception as e:
+            print(f"[ERROR] Falha ao gravar log de auditoria: {str(e)}")
+
+gravador_auditoria = GravadorAuditoria(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
+)
+atexit.register(gravador_auditoria.encerrar)
@@ -0,0 +1,49 @@
+"""
+Cache em memória do processo com tempo de expiração (TTL)
+
+Usado para resultados caros de ler e baratos de ficar alguns segundos
+desatualizados (estatísticas, relatórios, metadados). Cada worker tem o seu;
+as rotas que alteram os dados chamam ``invalidar`` no próprio processo e o TTL
+limita por quanto tempo os demais workers podem mostrar o valor antigo.
+"""
+import threading
+import time
+
+class CacheTTL:
+    """Dicionário com expiração por item e limite de tamanho"""
+
+    def __init__(self, ttl, max_itens=256):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens = {}  # {chave: (expira_em, valor)}
+        self._lock = threading.Lock()
+
+    def obter(self, chave, carregar):
+        """Valor em cache para ``chave`` ou o resultado de ``carregar()``, guardado por ttl segundos"""
+        agora = time.monotonic()
+        item = self._itens.get(chave)
+        if item is not None and item[0] > agora:
+            return item[1]
+
+        valor = carregar()
+        with self._lock:
+            if len(self._itens) >= self.max_itens:
+                # Descartar expirados; se ainda estiver cheio, começar do zero
+                self._itens = {c: i for c, i in self._itens.items() if i[0] > agora}
+                if len(self._itens) >= self.max_itens:
+                    self._itens.clear()
+            self._itens[chave] = (agora + self.ttl, valor)
+        return valor
+
+    def invalidar(self, chave=None):
+        """Remove uma chave (ou todas, se ``chave`` for None)"""
+        with self._lock:
+            if chave is None:
+                self._itens.clear()
+            else:
+                self._itens.pop(chave, None)
+
+    def invalidar_onde(self, predicado):
+        """Remove as chaves para as quais ``predicado(chave)`` é verdadeiro"""
+        with self._lock:
+            self._itens = {c: i for c, i in self._itens.items() if not predicado(c)}
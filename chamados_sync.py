@@ -0,0 +1,305 @@
+"""
+Consulta de status dos chamados na API externa de suporte
+
+O ClienteSuporte usa uma única requests.Session (conexões reaproveitadas).
+Quando a API oferece a consulta em lote (POST /api/v1/suporte/status com
+{"ids": [...]}), vários chamados são consultados por requisição; senão, cada
+chamado é consultado individualmente, em paralelo e com concorrência limitada
+(CHAMADOS_SYNC_CONCORRENCIA). O formato de URL que respondeu é lembrado, de
+modo que os demais formatos só são testados enquanto ele não é conhecido.
+
+Cada chamado tem sua própria agenda de verificação (proxima_sincronizacao):
+logo após a criação ou uma mudança de status ele é consultado com frequência,
+e o intervalo dobra a cada consulta sem mudança, até INTERVALO_MAXIMO.
+Chamados fechados ou cancelados não são mais consultados.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+SUPORTE_API_URL = os.environ.get('SUPORTE_API_URL', 'http://localhost:5001')
+SUPORTE_API_KEY = os.environ.get('SUPORTE_API_KEY', 'barber-connect-api-key-2025')
+CONCORRENCIA_PADRAO = int(os.environ.get('CHAMADOS_SYNC_CONCORRENCIA', 8))
+
+# Chamados nesses status não mudam mais e não são consultados
+STATUS_TERMINAIS = ('fechado', 'cancelado')
+
+# Agenda adaptativa de verificação (segundos)
+INTERVALO_MINIMO = int(os.environ.get('CHAMADOS_SYNC_INTERVALO_MINIMO', 60))
+INTERVALO_MAXIMO = int(os.environ.get('CHAMADOS_SYNC_INTERVALO_MAXIMO', 6 * 60 * 60))
+
+LOTE_MAXIMO = 100  # chamados por requisição de consulta em lote
+ENDPOINT_LOTE = '/api/v1/suporte/status'
+
+# Formatos de URL aceitos pelas versões da API de suporte
+FORMATOS_ENDPOINT = (
+    '/api/v1/suporte/{id}',
+    '/api/v1/chamados/{id}',
+    '/api/chamados/{id}',
+)
+
+def mapear_status_api(status_api):
+    """Mapeia status da API externa para status local"""
+    mapeamento = {
+        'novo': 'enviado',
+        'recebido': 'enviado',
+        'em_andamento': 'em_andamento',
+        'atendimento': 'em_andamento',
+        'em_atendimento': 'em_andamento',
+        'resolvido': 'resolvido',
+        'finalizado': 'fechado',
+        'fechado': 'fechado',
+        'cancelado': 'cancelado',
+        'deletado': 'cancelado'
+    }
+
+    return mapeamento.get(status_api.lower(), 'enviado')
+
+def extrair_status(data):
+    """Status da API em qualquer um dos formatos de resposta"""
+    if data.get('success') and 'ticket' in data:
+        # Formato: {"success": true, "ticket": {...}}
+        return data['ticket'].get('status', 'novo')
+    # Formato direto
+    return data.get('status', 'novo')
+
+class ClienteSuporte:
+    """Cliente HTTP da API de suporte com conexões reaproveitadas"""
+
+    def __init__(self, base_url=SUPORTE_API_URL, api_key=SUPORTE_API_KEY,
+                 concorrencia=CONCORRENCIA_PADRAO, timeout=5):
+        self.base_url = base_url.rstrip('/')
+        self.concorrencia = max(1, concorrencia)
+        self.timeout = timeout
+        self.sessao = requests.Session()
+        self.sessao.headers['X-API-Key'] = api_key
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=self.concorrencia)
+        self.sessao.mount('http://', adaptador)
+        self.sessao.mount('https://', adaptador)
+        self.formato = None  # índice em FORMATOS_ENDPOINT que já respondeu
+        self.suporta_lote = None  # None enquanto não se sabe se a API tem consulta em lote
+        self.requisicoes = 0
+        self._lock = threading.Lock()
+
+    def _get(self, url):
+        with self._lock:
+            self.requisicoes += 1
+        return self.sessao.get(url, timeout=self.timeout)
+
+    def _formatos_a_tentar(self):
+        if self.formato is None:
+            return list(range(len(FORMATOS_ENDPOINT)))
+        return [self.formato]
+
+    def consultar_status(self, api_chamado_id):
+        """Retorna (status_local, dados) de um chamado.
+
+        status_local é 'deletado' quando a API não conhece mais o chamado e None
+        quando não foi possível consultar. Levanta requests.RequestException
+        se a API estiver inacessível.
+        """
+        if not api_chamado_id:
+            return None, None
+
+        formatos = self._formatos_a_tentar()
+        respostas_404 = 0
+        for indice in formatos:
+            url = self.base_url + FORMATOS_ENDPOINT[indice].format(id=api_chamado_id)
+            response = self._get(url)
+
+            if response.status_code == 200:
+                try:
+                    data = response.json()
+                except json.JSONDecodeError:
+                    print(f"⚠️  Resposta JSON inválida da API: {url}")
+                    continue
+                if self.formato is None:
+                    with self._lock:
+                        self.formato = indice
+                return mapear_status_api(extrair_status(data)), data
+
+            if response.status_code == 404:
+                respostas_404 += 1
+
+        # Só considera o chamado removido se nenhum formato conhecido o encontrou
+        if respostas_404 == len(formatos):
+            return 'deletado', None
+        return None, None
+
+    def consultar_lote(self, api_chamado_ids):
+        """Consulta até LOTE_MAXIMO chamados em uma requisição.
+
+        Retorna {api_chamado_id: status_local} dos chamados presentes na resposta,
+        ou None se a API não oferece a consulta em lote (ou respondeu em outro
+        formato). IDs ausentes da resposta ficam fora do resultado.
+        """
+        with self._lock:
+            self.requisicoes += 1
+        response = self.sessao.post(
+            self.base_url + ENDPOINT_LOTE, json={'ids': list(api_chamado_ids)}, timeout=self.timeout
+        )
+        if response.status_code in (404, 405, 501):
+            self.suporta_lote = False
+            return None
+        response.raise_for_status()
+
+        try:
+            data = response.json()
+        except json.JSONDecodeError:
+            self.suporta_lote = False
+            return None
+        tickets = data.get('tickets') if isinstance(data, dict) else None
+        if not isinstance(tickets, list):
+            # Envelope de erro ou formato desconhecido: não dá para concluir nada do lote
+            print("⚠️  Resposta sem lista 'tickets' na consulta em lote; usando consultas individuais")
+            self.suporta_lote = False
+            return None
+        self.suporta_lote = True
+
+        # A API pode devolver os IDs como números; a coluna local guarda texto
+        pedidos = {str(api_chamado_id): api_chamado_id for api_chamado_id in api_chamado_ids}
+        resultado = {}
+        for ticket in tickets:
+            if not isinstance(ticket, dict):
+                continue
+            api_chamado_id = ticket.get('ticket_id') or ticket.get('id')
+            if api_chamado_id is not None and str(api_chamado_id) in pedidos:
+                resultado[pedidos[str(api_chamado_id)]] = mapear_status_api(ticket.get('status', 'novo'))
+        return resultado
+
+    def consultar_varios(self, api_chamado_ids):
+        """Consulta vários chamados; retorna {api_chamado_id: status_local}.
+
+        Usa a consulta em lote quando disponível e, senão, consultas individuais
+        em paralelo. Se a API ficar inacessível, os chamados ainda não consultados
+        são pulados neste ciclo (ficam fora do resultado).
+        """
+        ids = list(dict.fromkeys(i for i in api_chamado_ids if i))
+        if not ids:
+            return {}
+
+        if self.suporta_lote is not False:
+            try:
+                resultado = {}
+                for inicio in range(0, len(ids), LOTE_MAXIMO):
+                    lote = self.consultar_lote(ids[inicio:inicio + LOTE_MAXIMO])
+                    if lote is None:
+                        break
+                    resultado.update(lote)
+                else:
+                    # Ausentes do lote não são dados como removidos: a consulta
+                    # individual confirma (404 em todos os formatos = removido)
+                    ausentes = [i for i in ids if i not in resultado]
+                    if ausentes:
+                        resultado.update(self._consultar_individualmente(ausentes))
+                    return resultado
+            except requests.RequestException as e:
+                print(f"⚠️  Erro ao conectar com a API de suporte: {e}")
+                return {}
+
+        return self._consultar_individualmente(ids)
+
+    def _consultar_individualmente(self, ids):
+        api_fora = threading.Event()
+
+        def consultar(api_chamado_id):
+            if api_fora.is_set():
+                return api_chamado_id, None
+            try:
+                status, _ = self.consultar_status(api_chamado_id)
+                return api_chamado_id, status
+            except requests.RequestException as e:
+                if not api_fora.is_set():
+                    api_fora.set()
+                    print(f"⚠️  Erro ao conectar com a API de suporte: {e}")
+                return api_chamado_id, None
+
+        with ThreadPoolExecutor(max_workers=min(self.concorrencia, len(ids))) as executor:
+            resultados = executor.map(consultar, ids)
+            return {api_chamado_id: status for api_chamado_id, status in resultados if status}
+
+# ---------- AGENDA ADAPTATIVA ----------
+
+def agendar_verificacao(status, mudou, intervalo_atual, agora):
+    """(intervalo, proxima_sincronizacao) de um chamado após uma consulta.
+
+    Fechados/cancelados não são mais consultados; após uma mudança de status o
+    intervalo volta ao mínimo; sem mudança, dobra até INTERVALO_MAXIMO.
+    """
+    if status in STATUS_TERMINAIS:
+        return None, None
+    if mudou or not intervalo_atual:
+        intervalo = INTERVALO_MINIMO
+    else:
+        intervalo = min(intervalo_atual * 2, INTERVALO_MAXIMO)
+    return intervalo, agora + timedelta(seconds=intervalo)
+
+def executar_ciclo(sessao, Chamado, cliente, agora=None):
+    """Consulta os chamados com verificação vencida e grava o resultado em um UPDATE.
+
+    Usado pelo scheduler do app e pelo serviço scripts/sincronizador_chamados_service.py.
+    Retorna {'consultados', 'atualizados', 'cancelados'}.
+    """
+    from sqlalchemy import case, or_, update
+
+    agora = agora or datetime.utcnow()
+    chamados = sessao.query(
+        Chamado.id, Chamado.numero_chamado, Chamado.status, Chamado.api_chamado_id,
+        Chamado.intervalo_sincronizacao
+    ).filter(
+        Chamado.api_chamado_id.isnot(None),
+        Chamado.status.notin_(STATUS_TERMINAIS),
+        or_(Chamado.proxima_sincronizacao.is_(None), Chamado.proxima_sincronizacao <= agora)
+    ).all()
+
+    resumo = {'consultados': 0, 'atualizados': 0, 'cancelados': 0}
+    if not chamados:
+        return resumo
+
+    status_api = cliente.consultar_varios(c.api_chamado_id for c in chamados)
+
+    novos_status = {}  # {chamado_id: status}
+    intervalos = {}
+    proximas = {}
+    for chamado in chamados:
+        novo = status_api.get(chamado.api_chamado_id)
+        if novo is None:
+            continue  # não consultado: tenta de novo no próximo ciclo
+
+        if novo == 'deletado':
+            novo = 'cancelado'
+            resumo['cancelados'] += 1
+            print(f"   🗑️  {chamado.numero_chamado} marcado como CANCELADO")
+        elif novo != chamado.status:
+            resumo['atualizados'] += 1
+            print(f"   🔄 {chamado.numero_chamado}: {chamado.status} → {novo}")
+
+        mudou = novo != chamado.status
+        if mudou:
+            novos_status[chamado.id] = novo
+        intervalos[chamado.id], proximas[chamado.id] = agendar_verificacao(
+            novo, mudou, chamado.intervalo_sincronizacao, agora
+        )
+
+    resumo['consultados'] = len(intervalos)
+    if intervalos:
+        valores = {
+            'intervalo_sincronizacao': case(intervalos, value=Chamado.id),
+            'proxima_sincronizacao': case(proximas, value=Chamado.id),
+        }
+        if novos_status:
+            valores['status'] = case(novos_status, value=Chamado.id, else_=Chamado.status)
+            valores['data_atualizacao'] = case(
+                {chamado_id: agora for chamado_id in novos_status},
+                value=Chamado.id, else_=Chamado.data_atualizacao
+            )
+        # Um único UPDATE para todos os chamados consultados
+        sessao.execute(update(Chamado).where(Chamado.id.in_(intervalos)).values(**valores))
+        sessao.commit()
+
+    return resumo
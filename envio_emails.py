@@ -0,0 +1,216 @@
+"""
+Envio de e-mails fora das requisições
+
+As rotas apenas gravam a mensagem na tabela email_fila (ver EmailFila em
+app.py); a tarefa periódica 'enviar_emails' retira as pendentes em lotes e as
+entrega pelo backend configurado, reaproveitando a mesma conexão SMTP entre
+mensagens e entre execuções. Falhas temporárias são tentadas de novo com
+intervalo crescente; após EMAIL_MAX_TENTATIVAS (ou uma recusa permanente do
+servidor, código 5xx) a mensagem fica como 'falhou'.
+
+Backends (variável EMAIL_BACKEND):
+
+- smtp: servidor em SMTP_HOST/SMTP_PORT/SMTP_USER/SMTP_PASS (SMTP_STARTTLS)
+- arquivo: grava cada mensagem como .eml em um Maildir (EMAIL_DIRETORIO), para testes
+- console: apenas imprime a mensagem (padrão quando o SMTP não está configurado)
+"""
+import mailbox
+import os
+import smtplib
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+LOTE_PADRAO = int(os.environ.get('EMAIL_LOTE', 50))
+MAX_TENTATIVAS = int(os.environ.get('EMAIL_MAX_TENTATIVAS', 6))
+ESPERA_BASE = 60  # segundos antes da 2ª tentativa; dobra a cada falha
+ESPERA_MAXIMA = 6 * 60 * 60
+OCIOSO_MAXIMO = 60  # segundos sem uso antes de testar a conexão SMTP com NOOP
+
+def montar_mensagem(remetente, destino, assunto, corpo_html, corpo_texto=None):
+    msg = EmailMessage()
+    msg['Subject'] = assunto
+    msg['From'] = remetente
+    msg['To'] = destino
+    msg.set_content(corpo_texto or 'Verifique o HTML do e-mail')
+    msg.add_alternative(corpo_html, subtype='html')
+    return msg
+
+def erro_da_mensagem(erro):
+    """True se o servidor recusou a mensagem; False se o problema é o servidor/conexão"""
+    if isinstance(erro, smtplib.SMTPAuthenticationError):
+        return False
+    return isinstance(erro, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused))
+
+def falha_permanente(erro):
+    """Recusas 5xx da mensagem não melhoram com novas tentativas"""
+    if not erro_da_mensagem(erro):
+        return False
+    if isinstance(erro, smtplib.SMTPRecipientsRefused):
+        return all(codigo >= 500 for codigo, _ in erro.recipients.values())
+    return isinstance(erro, smtplib.SMTPResponseException) and erro.smtp_code >= 500
+
+def espera_para_tentativa(tentativas):
+    """Segundos até a próxima tentativa depois de ``tentativas`` falhas"""
+    return min(ESPERA_BASE * 2 ** (tentativas - 1), ESPERA_MAXIMA)
+
+# ---------- BACKENDS ----------
+
+class BackendSMTP:
+    """Mantém uma conexão SMTP aberta e a reutiliza entre mensagens"""
+
+    def __init__(self, host, port, usuario, senha, starttls=False, timeout=10):
+        self.host = host
+        self.port = int(port)
+        self.usuario = usuario
+        self.senha = senha
+        self.starttls = starttls
+        self.timeout = timeout
+        self._conexao = None
+        self._ultimo_uso = 0.0
+
+    def _conectar(self):
+        if self.starttls:
+            # Porta típica 587 (STARTTLS)
+            conexao = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            conexao.ehlo()
+            conexao.starttls()
+        else:
+            # Usa SSL direto (porta típica 465)
+            conexao = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        conexao.login(self.usuario, self.senha)
+        return conexao
+
+    def _obter_conexao(self):
+        if self._conexao is not None and time.monotonic() - self._ultimo_uso > OCIOSO_MAXIMO:
+            # O servidor costuma fechar conexões ociosas: confirmar antes de usar
+            try:
+                if self._conexao.noop()[0] != 250:
+                    self.fechar()
+            except (smtplib.SMTPException, OSError):
+                self.fechar()
+        if self._conexao is None:
+            self._conexao = self._conectar()
+        return self._conexao
+
+    def enviar(self, mensagem):
+        try:
+            self._obter_conexao().send_message(mensagem)
+        except smtplib.SMTPServerDisconnected:
+            # Conexão caiu entre o NOOP e o envio: reconectar uma vez
+            self.fechar()
+            self._obter_conexao().send_message(mensagem)
+        except (smtplib.SMTPException, OSError) as e:
+            if not erro_da_mensagem(e):
+                self.fechar()
+            raise  # com erro da mensagem a conexão continua válida
+        self._ultimo_uso = time.monotonic()
+
+    def fechar(self):
+        if self._conexao is not None:
+            try:
+                self._conexao.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+        self._conexao = None
+
+class BackendArquivo:
+    """Grava as mensagens em um Maildir local (cur/new/tmp), uma por arquivo"""
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+
+    def enviar(self, mensagem):
+        # Maildir(create=True) não cria as subpastas se o diretório já existir
+        for subpasta in ('tmp', 'new', 'cur'):
+            os.makedirs(os.path.join(self.diretorio, subpasta), exist_ok=True)
+        caixa = mailbox.Maildir(self.diretorio, create=False)
+        try:
+            caixa.add(mensagem)
+        finally:
+            caixa.close()
+
+    def fechar(self):
+        pass
+
+class BackendConsole:
+    """Modo de teste: apenas imprime a mensagem no console"""
+
+    def enviar(self, mensagem):
+        print(f"[EMAIL-TEST] Para: {mensagem['To']}")
+        print(f"[EMAIL-TEST] Assunto: {mensagem['Subject']}")
+        html = mensagem.get_body(preferencelist=('html',))
+        print(f"[EMAIL-TEST] HTML:\n{html.get_content() if html else ''}")
+
+    def fechar(self):
+        pass
+
+def criar_backend(tipo=None):
+    """Backend de EMAIL_BACKEND; sem ele, smtp se as variáveis SMTP estiverem completas, senão console"""
+    smtp_host = os.environ.get('SMTP_HOST')
+    smtp_port = os.environ.get('SMTP_PORT')
+    smtp_user = os.environ.get('SMTP_USER')
+    smtp_pass = os.environ.get('SMTP_PASS')
+    smtp_completo = bool(smtp_host and smtp_port and smtp_user and smtp_pass)
+
+    tipo = (tipo or os.environ.get('EMAIL_BACKEND') or ('smtp' if smtp_completo else 'console')).lower()
+    if tipo == 'arquivo':
+        return BackendArquivo(os.environ.get(
+            'EMAIL_DIRETORIO', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'emails')
+        ))
+    if tipo == 'smtp' and smtp_completo:
+        return BackendSMTP(
+            smtp_host, smtp_port, smtp_user, smtp_pass,
+            starttls=os.environ.get('SMTP_STARTTLS', 'false').lower() in ('1', 'true', 'yes')
+        )
+    if tipo == 'smtp':
+        print('[EMAIL-TEST] SMTP não configurado completamente; usando o console')
+    return BackendConsole()
+
+# ---------- FILA ----------
+
+def processar_fila(sessao, EmailFila, backend, lote=LOTE_PADRAO, agora=None):
+    """Envia um lote de mensagens pendentes cuja tentativa já venceu.
+
+    Se o servidor estiver indisponível, o lote é interrompido na primeira
+    falha. Retorna {'enviados', 'reagendados', 'falhas'}.
+    """
+    agora = agora or datetime.utcnow()
+    resumo = {'enviados': 0, 'reagendados': 0, 'falhas': 0}
+
+    consulta = sessao.query(EmailFila).filter(
+        EmailFila.status == 'pendente',
+        EmailFila.proxima_tentativa <= agora
+    ).order_by(EmailFila.proxima_tentativa, EmailFila.id).limit(lote)
+    if sessao.get_bind().dialect.name == 'postgresql':
+        # Outro processo enviando ao mesmo tempo pula as mensagens já reservadas
+        consulta = consulta.with_for_update(skip_locked=True)
+
+    for email in consulta.all():
+        mensagem = montar_mensagem(email.remetente, email.destino, email.assunto,
+                                   email.corpo_html, email.corpo_texto)
+        try:
+            backend.enviar(mensagem)
+        except Exception as e:
+            email.tentativas += 1
+            email.ultimo_erro = f'{type(e).__name__}: {e}'[:500]
+            if falha_permanente(e) or email.tentativas >= MAX_TENTATIVAS:
+                email.status = 'falhou'
+                resumo['falhas'] += 1
+                print(f"❌ [EMAIL] Desistindo do e-mail {email.id} para {email.destino}: {e}")
+            else:
+                email.proxima_tentativa = agora + timedelta(seconds=espera_para_tentativa(email.tentativas))
+                resumo['reagendados'] += 1
+                print(f"⚠️ [EMAIL] Falha ao enviar e-mail {email.id} (tentativa {email.tentativas}): {e}")
+            if not erro_da_mensagem(e):
+                break  # servidor indisponível: o restante do lote fica para a próxima execução
+            continue
+
+        email.status = 'enviado'
+        email.tentativas += 1
+        email.enviado_em = datetime.utcnow()
+        email.ultimo_erro = None
+        resumo['enviados'] += 1
+
+    sessao.commit()
+    return resumo
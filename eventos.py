@@ -0,0 +1,243 @@
+"""
+Canal de eventos em tempo real (Server-Sent Events) por barbearia
+
+O HubEventos mantém as conexões SSE abertas neste processo e entrega os
+eventos publicados. Para que um evento publicado por um worker chegue às
+conexões abertas em outro, a publicação passa por um broker:
+
+- BrokerLocal: apenas o processo atual (desenvolvimento / worker único)
+- BrokerSocket: workers do mesmo host, via sockets Unix de datagrama
+- BrokerPostgres: workers e hosts diferentes, via LISTEN/NOTIFY do PostgreSQL
+
+O broker é escolhido pela variável EVENTOS_BROKER (local, socket, postgres);
+sem ela usa-se postgres quando o banco é PostgreSQL e socket nos demais casos
+(o gunicorn roda vários workers mesmo com SQLite). local só serve para um
+processo único, como o app.run de desenvolvimento.
+"""
+import json
+import os
+import queue
+import select
+import socket
+import tempfile
+import threading
+import time
+
+TAMANHO_FILA_INSCRICAO = 100  # eventos pendentes por conexão antes de descartar
+
+class Inscricao:
+    """Conexão SSE inscrita nos eventos de uma barbearia"""
+
+    def __init__(self, hub, canal):
+        self.hub = hub
+        self.canal = canal
+        self.fila = queue.Queue(maxsize=TAMANHO_FILA_INSCRICAO)
+
+    def aguardar(self, timeout=None):
+        """Retorna o próximo evento ou None se o tempo acabar"""
+        try:
+            return self.fila.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def cancelar(self):
+        self.hub.remover(self)
+
+class HubEventos:
+    """Pub/sub em memória do processo, alimentado pelo broker entre workers"""
+
+    def __init__(self, broker=None):
+        self.broker = broker or BrokerLocal()
+        self._inscricoes = {}  # {barbearia_id: set(Inscricao)}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _garantir_broker(self):
+        # O app é carregado antes do fork (preload_app): o broker precisa ser
+        # iniciado dentro de cada worker, nunca no processo master
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self.broker.iniciar(self.entregar)
+                self._pid = os.getpid()
+
+    def inscrever(self, barbearia_id):
+        self._garantir_broker()
+        inscricao = Inscricao(self, barbearia_id)
+        with self._lock:
+            self._inscricoes.setdefault(barbearia_id, set()).add(inscricao)
+        return inscricao
+
+    def remover(self, inscricao):
+        with self._lock:
+            inscricoes = self._inscricoes.get(inscricao.canal)
+            if inscricoes:
+                inscricoes.discard(inscricao)
+                if not inscricoes:
+                    del self._inscricoes[inscricao.canal]
+
+    def publicar(self, barbearia_id, evento):
+        """Publica um evento para todas as conexões da barbearia, em qualquer worker"""
+        try:
+            self._garantir_broker()
+            self.broker.publicar(barbearia_id, evento)
+        except Exception as e:
+            # Falha no canal em tempo real nunca deve derrubar a requisição
+            print(f"⚠️ [EVENTOS] Erro ao publicar evento: {e}")
+
+    def entregar(self, barbearia_id, evento):
+        """Entrega um evento às conexões deste processo (chamado pelo broker)"""
+        with self._lock:
+            inscricoes = list(self._inscricoes.get(barbearia_id, ()))
+        for inscricao in inscricoes:
+            try:
+                inscricao.fila.put_nowait(evento)
+            except queue.Full:
+                # Cliente lento: o próximo evento dispara a mesma sincronização
+                pass
+
+    def total_inscricoes(self):
+        with self._lock:
+            return sum(len(i) for i in self._inscricoes.values())
+
+# ---------- BROKERS ----------
+
+class BrokerLocal:
+    """Entrega apenas dentro do processo atual"""
+
+    def iniciar(self, entregar):
+        self._entregar = entregar
+
+    def publicar(self, canal, evento):
+        self._entregar(canal, evento)
+
+class BrokerSocket:
+    """Distribui eventos entre os workers do mesmo host via sockets Unix de datagrama.
+
+    Cada worker escuta em <diretorio>/<pid>.sock; publicar envia o evento para
+    todos os sockets do diretório (inclusive o do próprio worker).
+    """
+
+    def __init__(self, diretorio=None):
+        self.diretorio = diretorio or os.environ.get(
+            'EVENTOS_SOCKET_DIR', os.path.join(tempfile.gettempdir(), 'barberconnect_eventos')
+        )
+
+    def iniciar(self, entregar):
+        self._entregar = entregar
+        os.makedirs(self.diretorio, exist_ok=True)
+
+        self._caminho = os.path.join(self.diretorio, f'{os.getpid()}.sock')
+        if os.path.exists(self._caminho):
+            os.unlink(self._caminho)
+
+        self._receptor = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._receptor.bind(self._caminho)
+        self._envio = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._envio.setblocking(False)
+
+        threading.Thread(target=self._receber, name='eventos-socket', daemon=True).start()
+
+    def _receber(self):
+        while True:
+            try:
+                dados = self._receptor.recv(65536)
+                mensagem = json.loads(dados)
+                self._entregar(mensagem['canal'], mensagem['evento'])
+            except (ValueError, KeyError):
+                continue
+            except OSError as e:
+                print(f"❌ [EVENTOS] Socket de eventos encerrado: {e}")
+                return
+
+    def publicar(self, canal, evento):
+        dados = json.dumps({'canal': canal, 'evento': evento}).encode('utf-8')
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith('.sock'):
+                continue
+            caminho = os.path.join(self.diretorio, nome)
+            try:
+                self._envio.sendto(dados, caminho)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Worker encerrado: remover o socket órfão
+                try:
+                    os.unlink(caminho)
+                except OSError:
+                    pass
+            except OSError:
+                # Buffer do worker destino cheio: descartar
+                pass
+
+class BrokerPostgres:
+    """Distribui eventos entre workers e hosts via LISTEN/NOTIFY do PostgreSQL"""
+
+    CANAL = 'barberconnect_eventos'
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self._conexao_envio = None
+        self._lock_envio = threading.Lock()
+
+    def iniciar(self, entregar):
+        self._entregar = entregar
+        threading.Thread(target=self._escutar, name='eventos-postgres', daemon=True).start()
+
+    def _conectar(self):
+        import psycopg2
+        conexao = psycopg2.connect(self.dsn)
+        conexao.autocommit = True
+        return conexao
+
+    def _escutar(self):
+        while True:
+            conexao = None
+            try:
+                conexao = self._conectar()
+                with conexao.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.CANAL}')
+
+                while True:
+                    if select.select([conexao], [], [], 30) == ([], [], []):
+                        continue
+                    conexao.poll()
+                    while conexao.notifies:
+                        notificacao = conexao.notifies.pop(0)
+                        try:
+                            mensagem = json.loads(notificacao.payload)
+                            self._entregar(mensagem['canal'], mensagem['evento'])
+                        except (ValueError, KeyError):
+                            continue
+            except Exception as e:
+                print(f"⚠️ [EVENTOS] Conexão LISTEN perdida, reconectando: {e}")
+                time.sleep(5)
+            finally:
+                if conexao is not None:
+                    try:
+                        conexao.close()
+                    except Exception:
+                        pass
+
+    def publicar(self, canal, evento):
+        payload = json.dumps({'canal': canal, 'evento': evento})
+        with self._lock_envio:
+            try:
+                if self._conexao_envio is None or self._conexao_envio.closed:
+                    self._conexao_envio = self._conectar()
+                with self._conexao_envio.cursor() as cursor:
+                    cursor.execute('SELECT pg_notify(%s, %s)', (self.CANAL, payload))
+            except Exception:
+                self._conexao_envio = None
+                raise
+
+def criar_broker(database_url=None, tipo=None):
+    """Cria o broker configurado em EVENTOS_BROKER (ou o padrão para o banco)"""
+    tipo = (tipo or os.environ.get('EVENTOS_BROKER', '')).lower()
+    if not tipo:
+        tipo = 'postgres' if database_url and database_url.startswith('postgresql') else 'socket'
+
+    if tipo == 'postgres':
+        return BrokerPostgres(database_url)
+    if tipo == 'socket':
+        return BrokerSocket()
+    return BrokerLocal()
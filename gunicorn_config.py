@@ -87,6 +87,12 @@ def pre_exec(server):
     """Executado antes de exec()"""
     print("🔄 Preparando para reiniciar servidor")
 
+def post_worker_init(worker):
+    """Executado no worker após carregar o app (e após o monkey patching do gevent)"""
+    # Todos os workers disputam o lease; só o líder executa as tarefas periódicas
+    from app import iniciar_jobs
+    iniciar_jobs()
+
 def child_exit(server, worker):
     """Executado quando um worker sai"""
     print(f"👋 Worker {worker.pid} finalizado")
@@ -122,6 +128,8 @@ print("""
    • WORKER_TIMEOUT: Timeout em segundos (padrão: 120)
    • MAX_REQUESTS: Requests antes de reiniciar worker (padrão: 1000)
    • LOG_LEVEL: Nível de log (debug, info, warning, error, critical)
+   • JOBS_ATIVOS: Tarefas periódicas com eleição de líder (padrão: 1)
+   • CHAMADOS_SYNC_AUTOMATICA / RENOVACAO_ASSINATURAS_AUTOMATICA: tarefas opcionais (padrão: 0)
 
 💡 Para melhor performance com I/O assíncrono:
    pip install gevent
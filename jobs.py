@@ -0,0 +1,198 @@
+"""
+Execução de tarefas periódicas uma única vez por deploy
+
+Cada worker do gunicorn inicia o ExecutorJobs (post_worker_init em gunicorn_config.py),
+mas só o processo que detém o lease de líder executa as tarefas. O lease é
+renovado periodicamente — também durante a execução de cada tarefa, por uma thread
+de heartbeat, para que uma tarefa mais longa que o lease não seja iniciada em
+paralelo por outro worker; se o líder morrer, outro worker (ou outro host) assume
+quando o lease expira. Execuções em que o lease foi perdido mesmo assim (ex.:
+banco inacessível) ficam registradas nas métricas (``lease_perdido``).
+
+O armazenamento do lease e das métricas fica com o app (tabelas job_lease e
+job_execucao, ver app.py), passado nas funções ``adquirir_lease`` e
+``registrar_execucao``; ``contexto`` (ex.: app.app_context) envolve cada
+chamada feita pelo loop.
+"""
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+
+LEASE_DURACAO = int(os.environ.get('JOBS_LEASE_DURACAO', 60))  # segundos
+ESPERA_MAXIMA = 5  # segundos entre verificações do loop
+
+class Job:
+    """Tarefa registrada: função, intervalo e métricas de execução neste processo"""
+
+    def __init__(self, nome, funcao, intervalo, jitter=0, descricao=''):
+        self.nome = nome
+        self.funcao = funcao
+        self.intervalo = intervalo
+        self.jitter = jitter
+        self.descricao = descricao
+        self.proxima_execucao = None  # time.monotonic()
+        self.execucoes = 0
+        self.falhas = 0
+        self.ultima_execucao = None  # datetime (UTC)
+        self.ultima_duracao = None
+        self.duracao_total = 0.0
+        self.duracao_maxima = 0.0
+        self.ultimo_erro = None
+        self.lease_perdido = False  # o lease expirou/foi tomado durante a última execução
+        self.execucoes_sem_lease = 0
+
+    def agendar(self, agora, primeira=False):
+        # O jitter espalha as execuções e evita que todas as tarefas rodem juntas
+        atraso = random.uniform(0, self.jitter) if self.jitter else 0
+        self.proxima_execucao = agora + (0 if primeira else self.intervalo) + atraso
+
+    def metricas(self):
+        return {
+            'nome': self.nome,
+            'descricao': self.descricao,
+            'intervalo': self.intervalo,
+            'execucoes': self.execucoes,
+            'falhas': self.falhas,
+            'ultima_execucao': self.ultima_execucao,
+            'ultima_duracao': self.ultima_duracao,
+            'duracao_media': self.duracao_total / self.execucoes if self.execucoes else None,
+            'duracao_maxima': self.duracao_maxima,
+            'ultimo_erro': self.ultimo_erro,
+            'lease_perdido': self.lease_perdido,
+            'execucoes_sem_lease': self.execucoes_sem_lease,
+        }
+
+class ExecutorJobs:
+    """Loop de tarefas periódicas com eleição de líder por lease"""
+
+    def __init__(self, adquirir_lease, registrar_execucao=None, contexto=None, lease_duracao=LEASE_DURACAO):
+        self.adquirir_lease = adquirir_lease  # (dono, expira_em) -> bool
+        self.registrar_execucao = registrar_execucao  # (dono, metricas, proxima_execucao) -> None
+        self.contexto = contexto or nullcontext
+        self.lease_duracao = lease_duracao
+        self.dono = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.lider = False
+        self.jobs = {}
+        self._pid = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._proxima_renovacao = 0.0
+
+    def registrar(self, nome, intervalo, jitter=0, descricao=''):
+        """Decorator que registra uma tarefa a cada ``intervalo`` segundos (+ até ``jitter``)"""
+        def decorator(funcao):
+            self.jobs[nome] = Job(nome, funcao, intervalo, jitter, descricao or (funcao.__doc__ or '').strip())
+            return funcao
+        return decorator
+
+    def iniciar(self):
+        """Inicia o loop neste processo (uma vez por worker, após o fork)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.dono = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+            self.lider = False
+            self._parar.clear()
+            threading.Thread(target=self._executar, name='jobs', daemon=True).start()
+
+    @property
+    def ativo(self):
+        """True se o loop foi iniciado neste processo e não foi parado"""
+        return self._pid == os.getpid() and not self._parar.is_set()
+
+    def parar(self):
+        self._parar.set()
+
+    # ---------- LOOP ----------
+
+    def _renovar_lease(self, agora):
+        expira_em = datetime.utcnow() + timedelta(seconds=self.lease_duracao)
+        try:
+            with self.contexto():
+                lider = bool(self.adquirir_lease(self.dono, expira_em))
+        except Exception as e:
+            print(f"⚠️ [JOBS] Erro ao renovar lease: {e}")
+            lider = False
+
+        if lider and not self.lider:
+            print(f"👑 [JOBS] {self.dono} assumiu a execução das tarefas")
+            for job in self.jobs.values():
+                job.agendar(agora, primeira=True)
+        elif self.lider and not lider:
+            print(f"⚠️ [JOBS] {self.dono} perdeu o lease de líder")
+        self.lider = lider
+        # Renovar bem antes de expirar
+        self._proxima_renovacao = agora + self.lease_duracao / 3
+
+    def _executar(self):
+        while not self._parar.is_set():
+            agora = time.monotonic()
+            if agora >= self._proxima_renovacao:
+                self._renovar_lease(agora)
+
+            if self.lider:
+                for job in sorted(self.jobs.values(), key=lambda j: j.proxima_execucao):
+                    if self._parar.is_set() or time.monotonic() >= self._proxima_renovacao:
+                        break
+                    if job.proxima_execucao <= time.monotonic():
+                        self._executar_job(job)
+
+            espera = self._proxima_renovacao - time.monotonic()
+            if self.lider and self.jobs:
+                espera = min(espera, min(j.proxima_execucao for j in self.jobs.values()) - time.monotonic())
+            self._parar.wait(max(0.1, min(espera, ESPERA_MAXIMA)))
+        self.lider = False
+
+    def _manter_lease(self, fim, perdido):
+        """Heartbeat: renova o lease enquanto uma tarefa executa"""
+        while not fim.wait(self.lease_duracao / 3):
+            self._renovar_lease(time.monotonic())
+            if not self.lider:
+                perdido.set()
+                return
+
+    def _executar_job(self, job):
+        inicio = time.monotonic()
+        job.ultima_execucao = datetime.utcnow()
+        fim, perdido = threading.Event(), threading.Event()
+        heartbeat = threading.Thread(target=self._manter_lease, args=(fim, perdido),
+                                     name=f'jobs-lease-{job.nome}', daemon=True)
+        heartbeat.start()
+        try:
+            with self.contexto():
+                job.funcao()
+            job.ultimo_erro = None
+        except Exception as e:
+            job.falhas += 1
+            job.ultimo_erro = f'{type(e).__name__}: {e}'
+            print(f"❌ [JOBS] Erro na tarefa {job.nome}: {e}")
+        finally:
+            fim.set()
+            heartbeat.join()
+        duracao = time.monotonic() - inicio
+
+        job.lease_perdido = perdido.is_set()
+        if job.lease_perdido:
+            # Outro processo pode ter executado a mesma tarefa ao mesmo tempo
+            job.execucoes_sem_lease += 1
+            print(f"⚠️ [JOBS] Tarefa {job.nome} terminou sem o lease de líder ({duracao:.1f}s)")
+
+        job.execucoes += 1
+        job.ultima_duracao = duracao
+        job.duracao_total += duracao
+        job.duracao_maxima = max(job.duracao_maxima, duracao)
+        job.agendar(time.monotonic())
+
+        if self.registrar_execucao:
+            proxima = datetime.utcnow() + timedelta(seconds=job.proxima_execucao - time.monotonic())
+            try:
+                with self.contexto():
+                    self.registrar_execucao(self.dono, job.metricas(), proxima)
+            except Exception as e:
+                print(f"⚠️ [JOBS] Erro ao registrar métricas de {job.nome}: {e}")
@@ -40,6 +40,56 @@ def init_database():
                         conn.commit()
                         print("✅ Coluna 'whatsapp' adicionada!")
 
+            # Colunas DATE/TIME e índices compostos de reserva (antes dos scripts que leem reservas)
+            from scripts.adicionar_indices_reservas import adicionar_indices_reservas
+            if not adicionar_indices_reservas():
+                return False
+
+            # Versionamento de reservas (sincronização incremental do dashboard)
+            from scripts.adicionar_versao_reservas import adicionar_versao_reservas
+            if not adicionar_versao_reservas():
+                return False
+
+            # Contadores de ocupação por horário (consulta de horários disponíveis)
+            from scripts.adicionar_ocupacao_horarios import adicionar_ocupacao_horarios
+            if not adicionar_ocupacao_horarios():
+                return False
+
+            # Resumo diário de faturamento (relatórios)
+            from scripts.adicionar_faturamento_diario import adicionar_faturamento_diario
+            if not adicionar_faturamento_diario():
+                return False
+
+            # Agenda adaptativa de sincronização de chamados
+            from scripts.adicionar_agenda_chamados import adicionar_agenda_chamados
+            if not adicionar_agenda_chamados():
+                return False
+
+            # Ocorrências de despesas recorrentes
+            from scripts.adicionar_recorrencia_despesas import adicionar_recorrencia_despesas
+            if not adicionar_recorrencia_despesas():
+                return False
+
+            # Índices dos relatórios de crescimento
+            from scripts.adicionar_indices_relatorios import adicionar_indices_relatorios
+            if not adicionar_indices_relatorios():
+                return False
+
+            # Versão dos usuários (revalidação do cache de usuários)
+            from scripts.adicionar_versao_usuarios import adicionar_versao_usuarios
+            if not adicionar_versao_usuarios():
+                return False
+
+            # Versão do conteúdo da página pública (cache e ETag de /<slug>)
+            from scripts.adicionar_versao_pagina_publica import adicionar_versao_pagina_publica
+            if not adicionar_versao_pagina_publica():
+                return False
+
+            # Execuções de tarefas que perderam o lease de líder (/_jobs)
+            from scripts.adicionar_lease_perdido_jobs import adicionar_lease_perdido_jobs
+            if not adicionar_lease_perdido_jobs():
+                return False
+
             # Verificar se já existe super admin
             from app import Usuario
             super_admin = Usuario.query.filter_by(tipo_conta='super_admin').first()
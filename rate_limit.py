@@ -0,0 +1,180 @@
+"""
+Armazenamento compartilhado do rate limiting (login, recuperação de senha)
+
+Cada chave (ex.: 'login:<ip>') guarda só três números de uma janela deslizante
+aproximada: o início da janela atual, as tentativas nela e as da janela
+anterior. A estimativa de tentativas nos últimos ``janela`` segundos é
+
+    anterior * (1 - fração já decorrida da janela atual) + atual
+
+o que dá verificação e registro em O(1), sem guardar a lista de tentativas.
+
+Backends (variável RATE_LIMIT_BACKEND):
+
+- memoria: dicionário LRU do processo (desenvolvimento / worker único)
+- sqlite: arquivo SQLite compartilhado pelos workers do mesmo host (padrão)
+
+Os dois limitam o número de chaves (RATE_LIMIT_MAX_CHAVES), descartando as
+usadas há mais tempo, e ignoram estados cuja janela já expirou.
+"""
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+
+MAX_CHAVES_PADRAO = 10000
+LIMPEZA_A_CADA = 256  # registros entre limpezas do backend SQLite
+
+# ---------- JANELA DESLIZANTE ----------
+
+def _avancar(estado, janela, agora):
+    """Estado (inicio, atual, anterior) alinhado à janela que contém ``agora``"""
+    inicio_atual = math.floor(agora / janela) * janela
+    if estado is None:
+        return inicio_atual, 0, 0
+
+    inicio, atual, anterior = estado
+    if inicio_atual == inicio:
+        return estado
+    if inicio_atual - inicio == janela:
+        return inicio_atual, 0, atual
+    return inicio_atual, 0, 0
+
+def estimar_tentativas(estado, janela, agora):
+    """Tentativas estimadas nos últimos ``janela`` segundos"""
+    inicio, atual, anterior = _avancar(estado, janela, agora)
+    peso_anterior = 1 - (agora - inicio) / janela
+    return anterior * peso_anterior + atual
+
+def segundos_para_liberar(estado, janela, agora, limite):
+    """Segundos até a estimativa ficar abaixo de ``limite`` (0 se já está)"""
+    inicio, atual, anterior = _avancar(estado, janela, agora)
+    if anterior * (1 - (agora - inicio) / janela) + atual < limite:
+        return 0
+
+    if atual < limite:
+        # Basta o peso da janela anterior cair o suficiente dentro da janela atual
+        liberacao = inicio + janela * (1 - (limite - atual) / anterior)
+    else:
+        # A janela atual precisa virar "anterior" e decair
+        liberacao = inicio + janela + janela * (1 - limite / atual)
+    # Em ``liberacao`` a estimativa ainda é igual ao limite: primeiro segundo depois dela
+    return max(1, math.floor(liberacao - agora) + 1)
+
+# ---------- BACKENDS ----------
+
+class RateLimitMemoria:
+    """Estados no processo atual, em um dicionário LRU de tamanho limitado"""
+
+    def __init__(self, max_chaves=MAX_CHAVES_PADRAO):
+        self.max_chaves = max_chaves
+        self._estados = OrderedDict()  # {chave: (inicio, atual, anterior)}
+        self._lock = threading.Lock()
+
+    def consultar(self, chave, janela, agora):
+        with self._lock:
+            estado = self._estados.get(chave)
+            if estado is not None:
+                self._estados.move_to_end(chave)
+            return estado
+
+    def registrar(self, chave, janela, agora):
+        with self._lock:
+            inicio, atual, anterior = _avancar(self._estados.get(chave), janela, agora)
+            self._estados[chave] = (inicio, atual + 1, anterior)
+            self._estados.move_to_end(chave)
+            while len(self._estados) > self.max_chaves:
+                self._estados.popitem(last=False)
+
+class RateLimitSQLite:
+    """Estados em um arquivo SQLite compartilhado pelos workers do mesmo host.
+
+    Cada operação abre a própria conexão (seguro após o fork do gunicorn) e o
+    registro roda em uma transação IMMEDIATE, serializando workers concorrentes.
+    """
+
+    def __init__(self, caminho=None, max_chaves=MAX_CHAVES_PADRAO):
+        self.caminho = caminho or os.environ.get(
+            'RATE_LIMIT_SQLITE', os.path.join(tempfile.gettempdir(), 'barberconnect_rate_limit.db')
+        )
+        self.max_chaves = max_chaves
+        self._pid = None
+        self._registros = 0
+        self._lock = threading.Lock()
+
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    conexao.execute('PRAGMA journal_mode=WAL')
+                    conexao.execute(
+                        'CREATE TABLE IF NOT EXISTS rate_limit ('
+                        ' chave TEXT PRIMARY KEY,'
+                        ' inicio REAL NOT NULL,'
+                        ' atual INTEGER NOT NULL,'
+                        ' anterior INTEGER NOT NULL,'
+                        ' expira_em REAL NOT NULL,'
+                        ' ultimo_acesso REAL NOT NULL)'
+                    )
+                    conexao.execute(
+                        'CREATE INDEX IF NOT EXISTS ix_rate_limit_ultimo_acesso ON rate_limit (ultimo_acesso)'
+                    )
+                    self._pid = os.getpid()
+        return conexao
+
+    def consultar(self, chave, janela, agora):
+        conexao = self._conectar()
+        try:
+            linha = conexao.execute(
+                'SELECT inicio, atual, anterior FROM rate_limit WHERE chave = ?', (chave,)
+            ).fetchone()
+            return tuple(linha) if linha else None
+        finally:
+            conexao.close()
+
+    def registrar(self, chave, janela, agora):
+        conexao = self._conectar()
+        try:
+            conexao.execute('BEGIN IMMEDIATE')
+            linha = conexao.execute(
+                'SELECT inicio, atual, anterior FROM rate_limit WHERE chave = ?', (chave,)
+            ).fetchone()
+            inicio, atual, anterior = _avancar(tuple(linha) if linha else None, janela, agora)
+            conexao.execute(
+                'INSERT OR REPLACE INTO rate_limit (chave, inicio, atual, anterior, expira_em, ultimo_acesso) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (chave, inicio, atual + 1, anterior, inicio + 2 * janela, agora)
+            )
+
+            self._registros += 1
+            if self._registros % LIMPEZA_A_CADA == 0:
+                self._limpar_antigos(conexao, agora)
+            conexao.execute('COMMIT')
+        except Exception:
+            if conexao.in_transaction:
+                conexao.execute('ROLLBACK')
+            raise
+        finally:
+            conexao.close()
+
+    def _limpar_antigos(self, conexao, agora):
+        # Estados com a janela expirada valem zero; além deles, manter apenas
+        # as max_chaves usadas mais recentemente
+        conexao.execute('DELETE FROM rate_limit WHERE expira_em < ?', (agora,))
+        conexao.execute(
+            'DELETE FROM rate_limit WHERE chave IN ('
+            ' SELECT chave FROM rate_limit ORDER BY ultimo_acesso DESC LIMIT -1 OFFSET ?)',
+            (self.max_chaves,)
+        )
+
+def criar_backend(tipo=None):
+    """Cria o backend configurado em RATE_LIMIT_BACKEND (padrão: sqlite)"""
+    tipo = (tipo or os.environ.get('RATE_LIMIT_BACKEND', 'sqlite')).lower()
+    max_chaves = int(os.environ.get('RATE_LIMIT_MAX_CHAVES', MAX_CHAVES_PADRAO))
+
+    if tipo == 'memoria':
+        return RateLimitMemoria(max_chaves=max_chaves)
+    return RateLimitSQLite(max_chaves=max_chaves)
@@ -0,0 +1,81 @@
+"""
+Séries temporais dos relatórios do super admin (crescimento por barbearia)
+
+Os períodos são agrupados no próprio banco (uma consulta GROUP BY barbearia,
+período por métrica) e completados aqui com zeros, para que toda barbearia
+tenha um valor em cada período do intervalo, prontos para gráficos.
+
+Granularidades: 'dia', 'semana' (começando na segunda-feira) e 'mes'.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func
+
+GRANULARIDADES = ('dia', 'semana', 'mes')
+MAX_PERIODOS = 750  # pontos por série (ex.: ~2 anos por dia, ~14 anos por semana)
+
+def inicio_do_periodo(data, granularidade):
+    """Primeiro dia do período (dia, semana ou mês) que contém ``data``"""
+    if granularidade == 'semana':
+        return data - timedelta(days=data.weekday())
+    if granularidade == 'mes':
+        return data.replace(day=1)
+    return data
+
+def _proximo_periodo(inicio, granularidade):
+    if granularidade == 'semana':
+        return inicio + timedelta(days=7)
+    if granularidade == 'mes':
+        return date(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1)
+    return inicio + timedelta(days=1)
+
+def periodos(inicio, fim, granularidade):
+    """Início de cada período que intersecta [inicio, fim], em ordem"""
+    atual = inicio_do_periodo(inicio, granularidade)
+    resultado = []
+    while atual <= fim:
+        resultado.append(atual)
+        atual = _proximo_periodo(atual, granularidade)
+    return resultado
+
+def contar_periodos(inicio, fim, granularidade):
+    """Quantidade de períodos sem montar a lista (para validar o intervalo)"""
+    inicio = inicio_do_periodo(inicio, granularidade)
+    if granularidade == 'mes':
+        return (fim.year - inicio.year) * 12 + fim.month - inicio.month + 1
+    dias = (fim - inicio).days + 1
+    return -(-dias // 7) if granularidade == 'semana' else dias
+
+def expressao_periodo(coluna, granularidade, dialeto):
+    """Expressão SQL com o início do período de ``coluna`` (DateTime)"""
+    if dialeto == 'postgresql':
+        # date_trunc('week') já começa na segunda-feira
+        return func.date(func.date_trunc({'dia': 'day', 'semana': 'week', 'mes': 'month'}[granularidade], coluna))
+    if granularidade == 'semana':
+        # Avança até o domingo (ou fica nele) e volta 6 dias: a segunda-feira da semana
+        return func.date(coluna, 'weekday 0', '-6 days')
+    if granularidade == 'mes':
+        return func.date(coluna, 'start of month')
+    return func.date(coluna)
+
+def _como_data(valor):
+    # SQLite devolve 'YYYY-MM-DD'; PostgreSQL, date
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+def montar_series(linhas, lista_periodos):
+    """[(barbearia_id, periodo, total)] -> {barbearia_id: [total por período]}"""
+    indices = {periodo: i for i, periodo in enumerate(lista_periodos)}
+    series = {}
+    for barbearia_id, periodo, total in linhas:
+        indice = indices.get(_como_data(periodo))
+        if indice is None:
+            continue
+        serie = series.get(barbearia_id)
+        if serie is None:
+            serie = series[barbearia_id] = [0] * len(lista_periodos)
+        serie[indice] += total
+    return series
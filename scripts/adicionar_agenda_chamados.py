@@ -0,0 +1,59 @@
+"""
+Script para adicionar a agenda adaptativa de sincronização de chamados
+Cria as colunas chamado.intervalo_sincronizacao e chamado.proxima_sincronizacao
+(chamados existentes ficam com a verificação vencida e são consultados no próximo ciclo)
+"""
+
+import sys
+import os
+from pathlib import Path
+
+# Adicionar o diretório pai ao path
+BASE_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.insert(0, BASE_DIR)
+
+from app import app, db
+
+def adicionar_agenda_chamados():
+    """Adiciona as colunas de agenda de sincronização à tabela chamado"""
+
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            if not inspector.has_table('chamado'):
+                db.create_all()
+                print("✅ Tabela 'chamado' criada com as colunas de agenda!")
+                return True
+
+            columns = [col['name'] for col in inspector.get_columns('chamado')]
+
+            with db.engine.connect() as conn:
+                if 'intervalo_sincronizacao' not in columns:
+                    conn.execute(db.text("ALTER TABLE chamado ADD COLUMN intervalo_sincronizacao INTEGER"))
+                    print("✅ Coluna 'intervalo_sincronizacao' adicionada!")
+
+                if 'proxima_sincronizacao' not in columns:
+                    tipo = 'TIMESTAMP' if db.engine.dialect.name == 'postgresql' else 'DATETIME'
+                    conn.execute(db.text(f"ALTER TABLE chamado ADD COLUMN proxima_sincronizacao {tipo}"))
+                    print("✅ Coluna 'proxima_sincronizacao' adicionada!")
+
+                conn.execute(db.text(
+                    "CREATE INDEX IF NOT EXISTS ix_chamado_proxima_sincronizacao ON chamado (proxima_sincronizacao)"
+                ))
+                conn.commit()
+
+            print("✅ Agenda de sincronização de chamados verificada!")
+            return True
+
+        except Exception as e:
+            print(f"❌ Erro ao adicionar agenda de sincronização de chamados: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == "__main__":
+    print("🔄 Adicionando agenda adaptativa de sincronização de chamados...")
+    print("-" * 60)
+    adicionar_agenda_chamados()
+    print("-" * 60)
+    print("✨ Processo concluído!")
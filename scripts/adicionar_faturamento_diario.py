@@ -0,0 +1,61 @@
+"""
+Script para criar o resumo diário de faturamento (faturamento_diario)
+Cria a tabela e recalcula o resumo a partir das reservas existentes.
+Também pode ser executado a qualquer momento para reconstruir o resumo.
+"""
+
+import sys
+import os
+from pathlib import Path
+
+# Adicionar o diretório pai ao path
+BASE_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.insert(0, BASE_DIR)
+
+from app import app, db, STATUS_FATURADOS
+
+def reconstruir_faturamento_diario():
+    """Recalcula todo o resumo diário a partir da tabela reserva"""
+    status = ', '.join(f"'{s}'" for s in STATUS_FATURADOS)
+    with db.engine.begin() as conn:
+        conn.execute(db.text("DELETE FROM faturamento_diario"))
+        conn.execute(db.text(
+            "INSERT INTO faturamento_diario (barbearia_id, data, servico_id, barbeiro_id, quantidade) "
+            "SELECT barbearia_id, data, servico_id, COALESCE(barbeiro_id, 0), COUNT(*) FROM reserva "
+            f"WHERE status IN ({status}) "
+            "GROUP BY barbearia_id, data, servico_id, COALESCE(barbeiro_id, 0)"
+        ))
+
+def adicionar_faturamento_diario(reconstruir=False):
+    """Cria a tabela faturamento_diario e a preenche se estiver vazia"""
+
+    with app.app_context():
+        try:
+            db.create_all()
+
+            # A tabela pode ter sido criada vazia por um create_all anterior:
+            # preencher sempre que ainda não houver linhas
+            with db.engine.connect() as conn:
+                preenchida = conn.execute(db.text("SELECT 1 FROM faturamento_diario LIMIT 1")).first()
+
+            if preenchida and not reconstruir:
+                print("✅ A tabela 'faturamento_diario' já está preenchida!")
+                return True
+
+            reconstruir_faturamento_diario()
+
+            print("✅ Resumo diário de faturamento calculado!")
+            return True
+
+        except Exception as e:
+            print(f"❌ Erro ao criar resumo de faturamento: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == "__main__":
+    print("🔄 Reconstruindo resumo diário de faturamento...")
+    print("-" * 60)
+    adicionar_faturamento_diario(reconstruir=True)
+    print("-" * 60)
+    print("✨ Processo concluído!")
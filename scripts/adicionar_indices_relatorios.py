@@ -0,0 +1,45 @@
+"""
+Script para criar os índices por data de criação usados pelos relatórios de
+crescimento do super admin (novos usuários e novas reservas por período)
+"""
+
+import sys
+import os
+from pathlib import Path
+
+# Adicionar o diretório pai ao path
+BASE_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.insert(0, BASE_DIR)
+
+from app import app, db
+
+INDICES = [
+    "CREATE INDEX IF NOT EXISTS ix_usuario_data_criacao ON usuario (data_criacao)",
+    "CREATE INDEX IF NOT EXISTS ix_reserva_data_criacao ON reserva (data_criacao, barbearia_id)",
+]
+
+def adicionar_indices_relatorios():
+    """Cria os índices de data de criação de usuario e reserva"""
+
+    with app.app_context():
+        try:
+            with db.engine.connect() as conn:
+                for indice in INDICES:
+                    conn.execute(db.text(indice))
+                conn.commit()
+
+            print("✅ Índices dos relatórios de crescimento verificados!")
+            return True
+
+        except Exception as e:
+            print(f"❌ Erro ao criar índices dos relatórios: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == "__main__":
+    print("🔄 Criando índices dos relatórios de crescimento...")
+    print("-" * 60)
+    adicionar_indices_relatorios()
+    print("-" * 60)
+    print("✨ Processo concluído!")
@@ -0,0 +1,86 @@
+"""
+Script para converter as colunas de data/hora da tabela reserva para DATE/TIME
+e criar os índices compostos usados pelas consultas de agenda e relatórios
+"""
+
+import sys
+import os
+from pathlib import Path
+
+# Adicionar o diretório pai ao path
+BASE_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.insert(0, BASE_DIR)
+
+from app import app, db
+
+INDICES = [
+    "CREATE INDEX IF NOT EXISTS ix_reserva_barbearia_data ON reserva (barbearia_id, data, hora_inicio)",
+    "CREATE INDEX IF NOT EXISTS ix_reserva_barbearia_status_data ON reserva (barbearia_id, status, data)",
+    "CREATE INDEX IF NOT EXISTS ix_reserva_barbearia_cliente_status ON reserva (barbearia_id, cliente_id, status)",
+    "CREATE INDEX IF NOT EXISTS ix_despesa_barbearia_vencimento ON despesa (barbearia_id, data_vencimento)",
+]
+
+def converter_tipos_postgres(conn, inspector):
+    """ALTER das colunas VARCHAR para DATE/TIME (PostgreSQL)"""
+    tipos = {col['name']: str(col['type']).upper() for col in inspector.get_columns('reserva')}
+    if not tipos['data'].startswith('VARCHAR'):
+        print("✅ As colunas de data/hora da tabela reserva já são DATE/TIME!")
+        return
+
+    print("⚠️ Convertendo reserva.data/hora_inicio/hora_fim para DATE/TIME...")
+    conn.execute(db.text(
+        "ALTER TABLE reserva "
+        "ALTER COLUMN data TYPE DATE USING data::date, "
+        "ALTER COLUMN hora_inicio TYPE TIME USING hora_inicio::time, "
+        "ALTER COLUMN hora_fim TYPE TIME USING hora_fim::time"
+    ))
+    print("✅ Colunas convertidas!")
+
+def converter_tipos_sqlite(conn):
+    """SQLite não tem ALTER COLUMN: normalizar os valores para o formato TIME do SQLAlchemy"""
+    pendente = conn.execute(db.text(
+        "SELECT 1 FROM reserva WHERE length(hora_inicio) = 5 OR length(hora_fim) = 5 LIMIT 1"
+    )).first()
+    if not pendente:
+        print("✅ Os horários da tabela reserva já estão no formato TIME!")
+        return
+
+    print("⚠️ Normalizando horários da tabela reserva (HH:MM -> HH:MM:SS)...")
+    for coluna in ('hora_inicio', 'hora_fim'):
+        conn.execute(db.text(
+            f"UPDATE reserva SET {coluna} = {coluna} || '\\:00.000000' WHERE length({coluna}) = 5"
+        ))
+    print("✅ Horários normalizados!")
+
+def adicionar_indices_reservas():
+    """Converte os tipos de data/hora da reserva e cria os índices compostos"""
+
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+
+            with db.engine.connect() as conn:
+                if db.engine.dialect.name == 'postgresql':
+                    converter_tipos_postgres(conn, inspector)
+                elif db.engine.dialect.name == 'sqlite':
+                    converter_tipos_sqlite(conn)
+
+                for indice in INDICES:
+                    conn.execute(db.text(indice))
+                conn.commit()
+
+            print("✅ Índices compostos de reserva/despesa verificados!")
+            return True
+
+        except Exception as e:
+            print(f"❌ Erro ao converter colunas/criar índices de reserva: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == "__main__":
+    print("🔄 Convertendo datas/horários de reserva e criando índices...")
+    print("-" * 60)
+    adicionar_indices_reservas()
+    print("-" * 60)
+    print("✨ Processo concluído!")
@@ -0,0 +1,50 @@
+"""
+Script para adicionar a coluna job_execucao.execucoes_sem_lease
+Conta as execuções de tarefas periódicas em que o processo perdeu o lease de
+líder antes de terminar (outro worker pode ter executado a mesma tarefa)
+"""
+
+import sys
+import os
+from pathlib import Path
+
+# Adicionar o diretório pai ao path
+BASE_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.insert(0, BASE_DIR)
+
+from app import app, db
+
+def adicionar_lease_perdido_jobs():
+    """Adiciona a coluna execucoes_sem_lease à tabela job_execucao"""
+
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            if not inspector.has_table('job_execucao'):
+                print("✅ Tabela job_execucao ainda não existe (será criada com a coluna)")
+                return True
+
+            columns = [col['name'] for col in inspector.get_columns('job_execucao')]
+            if 'execucoes_sem_lease' in columns:
+                print("✅ A coluna 'execucoes_sem_lease' já existe na tabela job_execucao!")
+                return True
+
+            with db.engine.connect() as conn:
+                conn.execute(db.text("ALTER TABLE job_execucao ADD COLUMN execucoes_sem_lease INTEGER NOT NULL DEFAULT 0"))
+                conn.commit()
+
+            print("✅ Coluna 'execucoes_sem_lease' adicionada na tabela job_execucao!")
+            return True
+
+        except Exception as e:
+            print(f"❌ Erro ao adicionar execucoes_sem_lease: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == "__main__":
+    print("🔄 Adicionando contagem de execuções sem lease (tarefas periódicas)...")
+    print("-" * 60)
+    adicionar_lease_perdido_jobs()
+    print("-" * 60)
+    print("✨ Processo concluído!")
@@ -0,0 +1,70 @@
+"""
+Script para criar o índice de ocupação de horários (ocupacao_horario)
+Cria a tabela e recalcula os contadores a partir das reservas existentes.
+Também pode ser executado a qualquer momento para reconstruir os contadores.
+"""
+
+import sys
+import os
+from pathlib import Path
+
+# Adicionar o diretório pai ao path
+BASE_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.insert(0, BASE_DIR)
+
+from app import app, db, Reserva, OcupacaoHorario, STATUS_OCUPAM_HORARIO
+from agenda import blocos_do_intervalo
+
+def reconstruir_ocupacao_horarios():
+    """Recalcula todos os contadores de ocupação a partir da tabela reserva"""
+    contadores = {}
+    with db.engine.begin() as conn:
+        reservas = conn.execute(
+            db.select(Reserva.barbearia_id, Reserva.data, Reserva.hora_inicio, Reserva.hora_fim)
+            .where(Reserva.status.in_(STATUS_OCUPAM_HORARIO))
+        )
+        for barbearia_id, data, hora_inicio, hora_fim in reservas:
+            for bloco in blocos_do_intervalo(hora_inicio, hora_fim):
+                chave = (barbearia_id, data, bloco)
+                contadores[chave] = contadores.get(chave, 0) + 1
+
+        conn.execute(OcupacaoHorario.__table__.delete())
+        if contadores:
+            conn.execute(OcupacaoHorario.__table__.insert(), [
+                {'barbearia_id': b, 'data': d, 'hora': h, 'ocupadas': n}
+                for (b, d, h), n in contadores.items()
+            ])
+
+def adicionar_ocupacao_horarios(reconstruir=False):
+    """Cria a tabela ocupacao_horario e a preenche se estiver vazia"""
+
+    with app.app_context():
+        try:
+            db.create_all()
+
+            # A tabela pode ter sido criada vazia por um create_all anterior:
+            # preencher sempre que ainda não houver contadores
+            with db.engine.connect() as conn:
+                preenchida = conn.execute(db.text("SELECT 1 FROM ocupacao_horario LIMIT 1")).first()
+
+            if preenchida and not reconstruir:
+                print("✅ A tabela 'ocupacao_horario' já está preenchida!")
+                return True
+
+            reconstruir_ocupacao_horarios()
+
+            print("✅ Contadores de ocupação de horários calculados!")
+            return True
+
+        except Exception as e:
+            print(f"❌ Erro ao criar ocupação de horários: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == "__main__":
+    print("🔄 Reconstruindo índice de ocupação de horários...")
+    print("-" * 60)
+    adicionar_ocupacao_horarios(reconstruir=True)
+    print("-" * 60)
+    print("✨ Processo concluído!")
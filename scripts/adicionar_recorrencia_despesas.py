@@ -0,0 +1,58 @@
+"""
+Script para adicionar a geração de despesas recorrentes
+Cria as colunas despesa.despesa_origem_id e despesa.periodo, o índice único
+(despesa_origem_id, periodo) e gera as próximas ocorrências das despesas recorrentes
+"""
+
+import sys
+import os
+from pathlib import Path
+
+# Adicionar o diretório pai ao path
+BASE_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.insert(0, BASE_DIR)
+
+from app import app, db, materializar_despesas_recorrentes
+
+def adicionar_recorrencia_despesas():
+    """Adiciona as colunas de recorrência à tabela despesa e gera as ocorrências"""
+
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('despesa')]
+
+            with db.engine.connect() as conn:
+                if 'despesa_origem_id' not in columns:
+                    conn.execute(db.text(
+                        "ALTER TABLE despesa ADD COLUMN despesa_origem_id INTEGER "
+                        "REFERENCES despesa(id) ON DELETE SET NULL"
+                    ))
+                    print("✅ Coluna 'despesa_origem_id' adicionada!")
+
+                if 'periodo' not in columns:
+                    conn.execute(db.text("ALTER TABLE despesa ADD COLUMN periodo VARCHAR(7)"))
+                    print("✅ Coluna 'periodo' adicionada!")
+
+                conn.execute(db.text(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS ux_despesa_origem_periodo "
+                    "ON despesa (despesa_origem_id, periodo)"
+                ))
+                conn.commit()
+
+            criadas = materializar_despesas_recorrentes()
+            print(f"✅ Recorrência de despesas verificada ({criadas} ocorrências geradas)")
+            return True
+
+        except Exception as e:
+            print(f"❌ Erro ao adicionar recorrência de despesas: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == "__main__":
+    print("🔄 Adicionando geração de despesas recorrentes...")
+    print("-" * 60)
+    adicionar_recorrencia_despesas()
+    print("-" * 60)
+    print("✨ Processo concluído!")
@@ -0,0 +1,48 @@
+"""
+Script para adicionar a coluna barbearia.conteudo_atualizado_em
+Atualizada a cada alteração da barbearia, dos serviços ou dos planos; é a
+versão do cache da página pública (/<slug>) e a base do ETag/Last-Modified
+"""
+
+import sys
+import os
+from pathlib import Path
+
+# Adicionar o diretório pai ao path
+BASE_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.insert(0, BASE_DIR)
+
+from app import app, db
+
+def adicionar_versao_pagina_publica():
+    """Adiciona a coluna conteudo_atualizado_em à tabela barbearia"""
+
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('barbearia')]
+
+            if 'conteudo_atualizado_em' in columns:
+                print("✅ A coluna 'conteudo_atualizado_em' já existe na tabela barbearia!")
+                return True
+
+            with db.engine.connect() as conn:
+                conn.execute(db.text("ALTER TABLE barbearia ADD COLUMN conteudo_atualizado_em TIMESTAMP"))
+                conn.execute(db.text("UPDATE barbearia SET conteudo_atualizado_em = CURRENT_TIMESTAMP"))
+                conn.commit()
+
+            print("✅ Coluna 'conteudo_atualizado_em' adicionada na tabela barbearia!")
+            return True
+
+        except Exception as e:
+            print(f"❌ Erro ao adicionar versão da página pública: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == "__main__":
+    print("🔄 Adicionando versão da página pública das barbearias...")
+    print("-" * 60)
+    adicionar_versao_pagina_publica()
+    print("-" * 60)
+    print("✨ Processo concluído!")
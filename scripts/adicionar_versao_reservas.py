@@ -0,0 +1,61 @@
+"""
+Script para adicionar o versionamento de reservas (sincronização incremental)
+Cria a coluna reserva.versao, as tabelas contador_versao e reserva_excluida
+e inicializa as versões das reservas existentes
+"""
+
+import sys
+import os
+from pathlib import Path
+
+# Adicionar o diretório pai ao path
+BASE_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.insert(0, BASE_DIR)
+
+from app import app, db
+
+def adicionar_versao_reservas():
+    """Adiciona a coluna versao à tabela reserva e inicializa os contadores"""
+
+    with app.app_context():
+        try:
+            # Criar tabelas novas (contador_versao, reserva_excluida)
+            db.create_all()
+
+            inspector = db.inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('reserva')]
+
+            if 'versao' in columns:
+                print("✅ A coluna 'versao' já existe na tabela reserva!")
+                return True
+
+            with db.engine.connect() as conn:
+                conn.execute(db.text("ALTER TABLE reserva ADD COLUMN versao BIGINT NOT NULL DEFAULT 0"))
+                conn.execute(db.text(
+                    "CREATE INDEX IF NOT EXISTS ix_reserva_barbearia_versao ON reserva (barbearia_id, versao)"
+                ))
+
+                # Versões iniciais: o próprio ID já é monotônico
+                conn.execute(db.text("UPDATE reserva SET versao = id"))
+                conn.execute(db.text("DELETE FROM contador_versao"))
+                conn.execute(db.text(
+                    "INSERT INTO contador_versao (barbearia_id, versao) "
+                    "SELECT barbearia_id, MAX(versao) FROM reserva GROUP BY barbearia_id"
+                ))
+                conn.commit()
+
+            print("✅ Coluna 'versao' adicionada e inicializada na tabela reserva!")
+            return True
+
+        except Exception as e:
+            print(f"❌ Erro ao adicionar versionamento de reservas: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == "__main__":
+    print("🔄 Adicionando versionamento de reservas para sincronização incremental...")
+    print("-" * 60)
+    adicionar_versao_reservas()
+    print("-" * 60)
+    print("✨ Processo concluído!")
@@ -0,0 +1,47 @@
+"""
+Script para adicionar a coluna usuario.versao
+Incrementada a cada alteração do usuário ou dos seus vínculos com barbearias;
+permite revalidar o cache de usuários entre workers com uma consulta só da versão
+"""
+
+import sys
+import os
+from pathlib import Path
+
+# Adicionar o diretório pai ao path
+BASE_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.insert(0, BASE_DIR)
+
+from app import app, db
+
+def adicionar_versao_usuarios():
+    """Adiciona a coluna versao à tabela usuario"""
+
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('usuario')]
+
+            if 'versao' in columns:
+                print("✅ A coluna 'versao' já existe na tabela usuario!")
+                return True
+
+            with db.engine.connect() as conn:
+                conn.execute(db.text("ALTER TABLE usuario ADD COLUMN versao INTEGER NOT NULL DEFAULT 1"))
+                conn.commit()
+
+            print("✅ Coluna 'versao' adicionada na tabela usuario!")
+            return True
+
+        except Exception as e:
+            print(f"❌ Erro ao adicionar versão de usuários: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+if __name__ == "__main__":
+    print("🔄 Adicionando versão de usuários (cache de usuários)...")
+    print("-" * 60)
+    adicionar_versao_usuarios()
+    print("-" * 60)
+    print("✨ Processo concluído!")
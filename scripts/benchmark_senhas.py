@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark da verificação de senha por política de hash (SENHA_METODO)
+
+Uso:
+    python scripts/benchmark_senhas.py [--metodos scrypt:16384:8:1 pbkdf2:sha256:600000 ...]
+                                       [--concorrencia 9] [--verificacoes 40] [--slo 250]
+
+Para cada método mede a latência de uma verificação (check_password_hash) com
+um processo só e com --concorrencia processos verificando ao mesmo tempo (um
+por worker do gunicorn no pico; padrão: WEB_CONCURRENCY ou CPU * 2 + 1) e
+indica, para cada algoritmo, o método de maior custo cujo p99 sob
+concorrência fica dentro do SLO.
+
+Rode no mesmo tipo de máquina da produção. Não usa o banco de dados do app.
+"""
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from pathlib import Path
+
+# Adicionar o diretório pai ao path
+BASE_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.insert(0, BASE_DIR)
+
+from senhas import SENHA_METODO, gerar_hash, verificar_senha
+
+# Do mais barato ao mais caro dentro de cada algoritmo
+METODOS_PADRAO = [
+    'scrypt:8192:8:1',
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1',
+    'scrypt:65536:8:1',
+    'pbkdf2:sha256:300000',
+    'pbkdf2:sha256:600000',
+    'pbkdf2:sha256:1000000',
+]
+
+SENHA_TESTE = 'senha-de-benchmark-123'
+
+def _medir(hash_senha, verificacoes):
+    """Latências (ms) de ``verificacoes`` verificações seguidas"""
+    latencias = []
+    for _ in range(verificacoes):
+        inicio = time.perf_counter()
+        verificar_senha(hash_senha, SENHA_TESTE)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return latencias
+
+def _medir_no_processo(argumentos):
+    return _medir(*argumentos)
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+def benchmark(args):
+    print(f"📊 {args.verificacoes} verificações por processo, concorrência {args.concorrencia}, SLO {args.slo:.0f} ms")
+    print(f"   Política atual (SENHA_METODO): {SENHA_METODO}")
+    print("-" * 78)
+    print(f"{'método':<24} {'p50 (1)':>9} {'p99 (1)':>9} {'p50 (N)':>9} {'p99 (N)':>9} {'verif/s (N)':>12}")
+
+    resultados = []
+    with multiprocessing.Pool(args.concorrencia) as pool:
+        for metodo in args.metodos:
+            hash_senha = gerar_hash(SENHA_TESTE, metodo)
+            _medir(hash_senha, 2)  # aquecimento
+
+            sozinho = _medir(hash_senha, args.verificacoes)
+
+            inicio = time.perf_counter()
+            por_processo = pool.map(_medir_no_processo, [(hash_senha, args.verificacoes)] * args.concorrencia)
+            duracao = time.perf_counter() - inicio
+            concorrente = [latencia for latencias in por_processo for latencia in latencias]
+            vazao = len(concorrente) / duracao
+
+            p99 = percentil(concorrente, 99)
+            resultados.append((metodo, p99))
+            marca = '✅' if p99 <= args.slo else '❌'
+            print(f"{metodo:<24} {percentil(sozinho, 50):9.1f} {percentil(sozinho, 99):9.1f} "
+                  f"{percentil(concorrente, 50):9.1f} {p99:9.1f} {vazao:12.1f} {marca}")
+
+    print("-" * 78)
+    # Por algoritmo, do mais barato ao mais caro: o último dentro do SLO é o mais forte
+    melhores = {}
+    for metodo, p99 in resultados:
+        if p99 <= args.slo:
+            melhores[metodo.split(':')[0]] = metodo
+    if not melhores:
+        print("⚠️  Nenhum método ficou dentro do SLO nesta máquina")
+    for algoritmo, metodo in melhores.items():
+        print(f"💡 Maior custo de {algoritmo} dentro do SLO: SENHA_METODO={metodo}")
+
+def main():
+    workers_padrao = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+    parser = argparse.ArgumentParser(description='Benchmark da verificação de senha')
+    parser.add_argument('--metodos', nargs='+', default=METODOS_PADRAO)
+    parser.add_argument('--concorrencia', type=int, default=workers_padrao,
+                        help='Verificações simultâneas (workers no pico)')
+    parser.add_argument('--verificacoes', type=int, default=20, help='Verificações por processo')
+    parser.add_argument('--slo', type=float, default=250, help='p99 máximo aceitável, em ms')
+    args = parser.parse_args()
+
+    benchmark(args)
+
+if __name__ == "__main__":
+    main()
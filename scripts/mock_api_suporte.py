@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+API de suporte simulada, para desenvolvimento e benchmark da sincronização de chamados
+
+Modos:
+    python scripts/mock_api_suporte.py servir [--porta 5001] [--latencia 0.05] [--sem-lote]
+        Sobe a API simulada (mesmos endpoints usados por admin_suporte e chamados_sync)
+
+    python scripts/mock_api_suporte.py benchmark [--chamados 200] [--latencia 0.05]
+        Sobe a API simulada em segundo plano e mede o tempo de um ciclo de consulta
+        e o número de requisições: individual serial, individual em paralelo e em lote
+
+Não usa o banco de dados do app.
+"""
+
+import sys
+import time
+import random
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+
+from flask import Flask, request, jsonify
+
+# Adicionar o diretório pai ao path
+BASE_DIR = str(Path(__file__).resolve().parent.parent)
+sys.path.insert(0, BASE_DIR)
+
+STATUS_API = ['novo', 'recebido', 'em_atendimento', 'resolvido', 'finalizado', 'cancelado']
+
+def criar_api_mock(latencia=0.0, suporta_lote=True, probabilidade_mudanca=0.1):
+    """Cria o app Flask da API simulada; o total de requisições fica em app.config['REQUISICOES']"""
+    api = Flask('mock_api_suporte')
+    api.config['REQUISICOES'] = 0
+    tickets = {}  # {ticket_id: {...}}
+    lock = threading.Lock()
+
+    @api.before_request
+    def simular_latencia():
+        with lock:
+            api.config['REQUISICOES'] += 1
+        if latencia:
+            time.sleep(latencia)
+
+    def evoluir(ticket):
+        # Alguns chamados avançam de status a cada consulta
+        if ticket['status'] in ('finalizado', 'cancelado'):
+            return ticket
+        if random.random() < probabilidade_mudanca:
+            ticket['status'] = STATUS_API[min(STATUS_API.index(ticket['status']) + 1, 4)]
+            ticket['atualizado_em'] = datetime.utcnow().isoformat()
+        return ticket
+
+    @api.route('/api/v1/suporte', methods=['GET', 'POST'])
+    def suporte():
+        if request.method == 'GET':
+            return jsonify({'success': True, 'total': len(tickets)})
+        dados = request.get_json(silent=True) or {}
+        with lock:
+            ticket_id = f"SUP-{len(tickets) + 1:06d}"
+            tickets[ticket_id] = {
+                'ticket_id': ticket_id,
+                'assunto': dados.get('assunto', ''),
+                'status': 'novo',
+                'atualizado_em': datetime.utcnow().isoformat(),
+            }
+        return jsonify({'success': True, 'ticket_id': ticket_id}), 201
+
+    @api.route('/api/v1/suporte/<ticket_id>')
+    def status_ticket(ticket_id):
+        with lock:
+            ticket = tickets.get(ticket_id)
+            if not ticket:
+                return jsonify({'success': False, 'error': 'Ticket não encontrado'}), 404
+            return jsonify({'success': True, 'ticket': dict(evoluir(ticket))})
+
+    if suporta_lote:
+        @api.route('/api/v1/suporte/status', methods=['POST'])
+        def status_lote():
+            ids = (request.get_json(silent=True) or {}).get('ids', [])
+            with lock:
+                encontrados = [dict(evoluir(tickets[i])) for i in ids if i in tickets]
+            return jsonify({'success': True, 'tickets': encontrados})
+
+    @api.route('/_mock/tickets', methods=['POST'])
+    def criar_tickets():
+        """Cria N tickets de uma vez (para benchmark)"""
+        quantidade = int((request.get_json(silent=True) or {}).get('quantidade', 100))
+        with lock:
+            inicio = len(tickets)
+            for n in range(inicio + 1, inicio + quantidade + 1):
+                ticket_id = f"SUP-{n:06d}"
+                tickets[ticket_id] = {'ticket_id': ticket_id, 'assunto': 'benchmark', 'status': 'novo'}
+        return jsonify({'success': True, 'ids': list(tickets)[inicio:]})
+
+    return api
+
+def servir(args):
+    api = criar_api_mock(args.latencia, not args.sem_lote)
+    print(f"🚀 API de suporte simulada em http://127.0.0.1:{args.porta} "
+          f"(latência {args.latencia}s, lote {'não' if args.sem_lote else 'sim'})")
+    api.run(host='127.0.0.1', port=args.porta, threaded=True)
+
+def benchmark(args):
+    import logging
+    from werkzeug.serving import make_server
+    from chamados_sync import ClienteSuporte
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    cenarios = [
+        ('individual, serial', False, 1),
+        (f'individual, {args.concorrencia} em paralelo', False, args.concorrencia),
+        ('em lote', True, args.concorrencia),
+    ]
+
+    print(f"📊 {args.chamados} chamados, latência simulada de {args.latencia}s por requisição")
+    print("-" * 60)
+    for porta, (nome, lote, concorrencia) in enumerate(cenarios, start=args.porta):
+        api = criar_api_mock(args.latencia, suporta_lote=lote)
+        servidor = make_server('127.0.0.1', porta, api, threaded=True)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+        base_url = f'http://127.0.0.1:{porta}'
+        cliente = ClienteSuporte(base_url, concorrencia=concorrencia)
+        ids = cliente.sessao.post(f'{base_url}/_mock/tickets', json={'quantidade': args.chamados}).json()['ids']
+
+        api.config['REQUISICOES'] = 0
+        inicio = time.perf_counter()
+        resultado = cliente.consultar_varios(ids)
+        duracao = time.perf_counter() - inicio
+
+        print(f"{nome:<32} {duracao:8.2f}s  {api.config['REQUISICOES']:5d} requisições  "
+              f"{len(resultado)} status")
+        servidor.shutdown()
+    print("-" * 60)
+
+def main():
+    parser = argparse.ArgumentParser(description='API de suporte simulada')
+    parser.add_argument('modo', choices=['servir', 'benchmark'], nargs='?', default='servir')
+    parser.add_argument('--porta', type=int, default=5001)
+    parser.add_argument('--latencia', type=float, default=0.05, help='Segundos por requisição')
+    parser.add_argument('--sem-lote', action='store_true', help='Desativar a consulta em lote')
+    parser.add_argument('--chamados', type=int, default=200)
+    parser.add_argument('--concorrencia', type=int, default=8)
+    args = parser.parse_args()
+
+    if args.modo == 'benchmark':
+        benchmark(args)
+    else:
+        servir(args)
+
+if __name__ == "__main__":
+    main()
@@ -10,8 +10,6 @@ import time
 import logging
 from pathlib import Path
 from datetime import datetime
-import requests
-import json
 
 # Configurar logging
 logging.basicConfig(
@@ -34,6 +32,7 @@ sys.path.insert(0, str(current_dir))
 
 try:
     from app import app, db, Chamado
+    from chamados_sync import ClienteSuporte, executar_ciclo, SUPORTE_API_URL, SUPORTE_API_KEY
     logging.info("✅ Módulos importados com sucesso")
 except ImportError as e:
     logging.error(f"ERRO ao importar módulos: {e}")
@@ -43,15 +42,17 @@ class SincronizadorChamados:
     """Classe para gerenciar sincronização de chamados"""
 
     def __init__(self):
-        self.api_base_url = "http://localhost:5001"
-        self.api_headers = {"X-API-Key": "barber-connect-api-key-2025"}
-        self.intervalo_verificacao = 300  # 5 minutos por padrão
+        self.api_base_url = SUPORTE_API_URL
+        self.api_headers = {"X-API-Key": SUPORTE_API_KEY}
+        # O ciclo é curto porque cada chamado tem sua própria agenda de
+        # verificação (ver chamados_sync.agendar_verificacao)
+        self.intervalo_verificacao = 60
+        self.cliente = ClienteSuporte(self.api_base_url, SUPORTE_API_KEY)
 
     def verificar_conectividade_api(self):
         """Verifica se a API externa está acessível"""
         try:
-            response = requests.get(f"{self.api_base_url}/api/v1/suporte",
-                                  headers=self.api_headers, timeout=10)
+            response = self.cliente.sessao.get(f"{self.api_base_url}/api/v1/suporte", timeout=10)
             return response.status_code in [200, 405]  # 405 é OK (método não permitido, mas API responde)
         except Exception as e:
             logging.warning(f"API não acessível: {e}")
@@ -59,40 +60,14 @@ class SincronizadorChamados:
 
     def verificar_status_chamado_api(self, api_chamado_id):
         """Verifica o status de um chamado na API externa"""
-        if not api_chamado_id:
+        try:
+            return self.cliente.consultar_status(api_chamado_id)
+        except Exception as e:
+            logging.warning(f"Erro ao verificar {api_chamado_id}: {e}")
             return None, None
 
-        # Tentar diferentes endpoints
-        endpoints = [
-            f"{self.api_base_url}/api/v1/suporte/{api_chamado_id}",
-            f"{self.api_base_url}/api/v1/chamados/{api_chamado_id}",
-            f"{self.api_base_url}/api/chamados/{api_chamado_id}"
-        ]
-
-        for url in endpoints:
-            try:
-                response = requests.get(url, headers=self.api_headers, timeout=5)
-                if response.status_code == 200:
-                    try:
-                        data = response.json()
-                        return data.get('status'), data
-                    except json.JSONDecodeError:
-                        logging.warning(f"Resposta JSON inválida da API: {url}")
-                        continue
-                elif response.status_code == 404:
-                    # Chamado não existe mais na API
-                    return 'deletado', None
-            except requests.exceptions.Timeout:
-                logging.warning(f"Timeout ao verificar {url}")
-                continue
-            except Exception as e:
-                logging.warning(f"Erro ao verificar {url}: {e}")
-                continue
-
-        return None, None
-
     def sincronizar_chamados(self):
-        """Sincroniza todos os chamados com a API externa"""
+        """Sincroniza os chamados com verificação vencida com a API externa"""
         logging.info("🔄 Iniciando sincronização de chamados...")
 
         with app.app_context():
@@ -101,68 +76,23 @@ class SincronizadorChamados:
                 logging.error("❌ API externa não está acessível. Abortando sincronização.")
                 return False
 
-            # Buscar chamados que têm api_chamado_id
-            chamados = Chamado.query.filter(Chamado.api_chamado_id.isnot(None)).all()
-
-            if not chamados:
-                logging.info("⚠️  Nenhum chamado com ID da API encontrado")
-                return True
-
-            atualizados = 0
-            deletados = 0
-            erros = 0
-
-            for chamado in chamados:
-                try:
-                    logging.info(f"📋 Verificando: {chamado.numero_chamado} (API ID: {chamado.api_chamado_id})")
-
-                    status_api, dados_api = self.verificar_status_chamado_api(chamado.api_chamado_id)
-
-                    if status_api == 'deletado':
-                        # Chamado foi removido da API
-                        if chamado.status != 'cancelado':
-                            chamado.status = 'cancelado'
-                            chamado.data_atualizacao = datetime.utcnow()
-                            deletados += 1
-                            logging.info(f"   🗑️  Marcado como CANCELADO (removido da API)")
-                        else:
-                            logging.info(f"   ✅ Já estava marcado como CANCELADO")
-
-                    elif status_api and status_api != chamado.status:
-                        # Status diferente - atualizar
-                        status_anterior = chamado.status
-                        chamado.status = status_api
-                        chamado.data_atualizacao = datetime.utcnow()
-                        atualizados += 1
-                        logging.info(f"   🔄 Status atualizado: {status_anterior} → {status_api}")
-
-                    elif status_api == chamado.status:
-                        logging.debug(f"   ✅ Status já está sincronizado: {status_api}")
-
-                    else:
-                        logging.warning(f"   ❓ Não foi possível verificar status na API")
-
-                except Exception as e:
-                    erros += 1
-                    logging.error(f"   ❌ Erro ao processar {chamado.numero_chamado}: {e}")
-
-            # Commit das alterações
             try:
-                if atualizados > 0 or deletados > 0:
-                    db.session.commit()
-                    logging.info("✅ Sincronização concluída com sucesso!")
-                    logging.info(f"   📊 Chamados atualizados: {atualizados}")
-                    logging.info(f"   🗑️  Chamados marcados como cancelados: {deletados}")
-                    if erros > 0:
-                        logging.warning(f"   ⚠️  Erros encontrados: {erros}")
-                else:
-                    logging.info("✅ Todos os chamados já estão sincronizados")
-                    db.session.rollback()  # Nada para commitar
+                requisicoes_antes = self.cliente.requisicoes
+                resumo = executar_ciclo(db.session, Chamado, self.cliente)
             except Exception as e:
-                logging.error(f"❌ Erro ao salvar alterações: {e}")
+                logging.error(f"❌ Erro ao sincronizar chamados: {e}")
                 db.session.rollback()
                 return False
 
+            if not resumo['consultados']:
+                logging.info("⚠️  Nenhum chamado com verificação pendente")
+                return True
+
+            logging.info("✅ Sincronização concluída com sucesso!")
+            logging.info(f"   📋 Chamados consultados: {resumo['consultados']} "
+                         f"({self.cliente.requisicoes - requisicoes_antes} requisições)")
+            logging.info(f"   📊 Chamados atualizados: {resumo['atualizados']}")
+            logging.info(f"   🗑️  Chamados marcados como cancelados: {resumo['cancelados']}")
             return True
 
     def executar_sincronizacao_unica(self):
@@ -223,8 +153,8 @@ def main():
     parser = argparse.ArgumentParser(description='Sincronização automática de chamados')
     parser.add_argument('--modo', choices=['unico', 'continuo'],
                        default='unico', help='Modo de execução')
-    parser.add_argument('--intervalo', type=int, default=300,
-                       help='Intervalo em segundos para modo contínuo (padrão: 300)')
+    parser.add_argument('--intervalo', type=int, default=60,
+                       help='Intervalo em segundos entre ciclos no modo contínuo (padrão: 60)')
 
     args = parser.parse_args()
 
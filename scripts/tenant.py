@@ -4,7 +4,23 @@ Sistema Multi-Tenant para isolamento de dados por barbearia
 
 from flask import g, request, session, abort, redirect, url_for
 from functools import wraps
+from werkzeug.local import LocalProxy
+import os
 import re
+import threading
+import time
+
+# Cache de barbearias por processo: {('slug', slug) | ('id', id): (expira_em, barbearia)}
+# Guarda cópias desanexadas da sessão; cada request recebe uma instância própria via merge.
+TENANT_CACHE_TTL = int(os.environ.get('TENANT_CACHE_TTL', 60))  # segundos
+_barbearias_cache = {}
+_barbearias_cache_lock = threading.Lock()
+
+# Cache de usuários por processo: {usuario_id: (revalidar_em, versao, usuario, vinculos)}
+# Passado o TTL, a entrada é revalidada consultando só usuario.versao (recarregada se mudou).
+USUARIO_CACHE_TTL = int(os.environ.get('USUARIO_CACHE_TTL', 30))  # segundos; 0 desativa
+_usuarios_cache = {}
+_usuarios_cache_lock = threading.Lock()
 
 class TenantContext:
     """Gerencia o contexto do tenant (barbearia) atual"""
@@ -12,6 +28,7 @@ class TenantContext:
     def __init__(self):
         self.barbearia_id = None
         self.barbearia = None
+        self.usuario = None
         self.usuario_barbearia = None
         self.is_super_admin = False
     
@@ -53,39 +70,179 @@ class TenantContext:
         """Verifica se o usuário é cliente da barbearia atual"""
         return self.get_usuario_role() == 'cliente'
 
-def identificar_barbearia(Barbearia=None):
-    """Identifica qual barbearia está sendo acessada baseado na URL"""
-    if not Barbearia:
-        # Fallback para compatibilidade - tenta import direto
+def _cache_get(chave):
+    """Retorna a barbearia em cache para a chave, se ainda válida"""
+    item = _barbearias_cache.get(chave)
+    if not item:
+        return None
+    expira_em, barbearia = item
+    if expira_em < time.monotonic():
+        with _barbearias_cache_lock:
+            _barbearias_cache.pop(chave, None)
+        return None
+    return barbearia
+
+def _copia_desanexada(obj):
+    """Cópia só com as colunas, fora da sessão, para reanexar com merge(load=False)"""
+    from sqlalchemy import inspect as sa_inspect
+    from sqlalchemy.orm import make_transient_to_detached
+    
+    Modelo = type(obj)
+    copia = Modelo(**{
+        attr.key: getattr(obj, attr.key)
+        for attr in sa_inspect(Modelo).column_attrs
+    })
+    make_transient_to_detached(copia)
+    return copia
+
+def _cache_set(barbearia, Barbearia):
+    """Armazena uma cópia desanexada da barbearia no cache do processo"""
+    copia = _copia_desanexada(barbearia)
+    
+    expira_em = time.monotonic() + TENANT_CACHE_TTL
+    with _barbearias_cache_lock:
+        _barbearias_cache[('slug', barbearia.slug)] = (expira_em, copia)
+        _barbearias_cache[('id', barbearia.id)] = (expira_em, copia)
+
+def invalidar_cache_barbearia(barbearia_id=None):
+    """Remove uma barbearia (ou todas, se barbearia_id for None) do cache do processo"""
+    with _barbearias_cache_lock:
+        if barbearia_id is None:
+            _barbearias_cache.clear()
+            return
+        for chave, (_, barbearia) in list(_barbearias_cache.items()):
+            if barbearia.id == barbearia_id:
+                _barbearias_cache.pop(chave, None)
+
+def buscar_barbearia_ativa(slug=None, barbearia_id=None, Barbearia=None, db=None):
+    """Busca uma barbearia ativa por slug ou ID, usando o cache do processo"""
+    if not Barbearia or not db:
         try:
-            from app import Barbearia
+            from app import Barbearia, db
         except ImportError:
             return None
     
+    if not slug and not barbearia_id:
+        return None
+    
+    chave = ('slug', slug) if slug else ('id', barbearia_id)
+    cached = _cache_get(chave)
+    if cached is not None:
+        # merge sem load não consulta o banco: anexa a cópia à sessão do request
+        return db.session.merge(cached, load=False)
+    
+    query = Barbearia.query.filter_by(ativa=True)
+    if slug:
+        barbearia = query.filter_by(slug=slug).first()
+    else:
+        barbearia = query.filter_by(id=barbearia_id).first()
+    
+    if barbearia:
+        _cache_set(barbearia, Barbearia)
+    return barbearia
+
+def identificar_barbearia(Barbearia=None, db=None):
+    """Identifica qual barbearia está sendo acessada baseado na URL"""
     # Estratégia 1: Via slug na URL (/<slug>/...)
     if hasattr(request, 'view_args') and request.view_args and 'slug' in request.view_args:
         slug = request.view_args['slug']
         if slug:
-            barbearia = Barbearia.query.filter_by(slug=slug, ativa=True).first()
+            barbearia = buscar_barbearia_ativa(slug=slug, Barbearia=Barbearia, db=db)
             if barbearia:
                 return barbearia
     
     # Estratégia 2: Via barbearia_id na sessão (para compatibilidade)
     if 'barbearia_id' in session:
-        barbearia = Barbearia.query.filter_by(id=session['barbearia_id'], ativa=True).first()
+        barbearia = buscar_barbearia_ativa(barbearia_id=session['barbearia_id'], Barbearia=Barbearia, db=db)
         if barbearia:
             return barbearia
         
     # Estratégia 3: Via parâmetro de query (para desenvolvimento)
     barbearia_param = request.args.get('b')
     if barbearia_param:
-        barbearia = Barbearia.query.filter_by(slug=barbearia_param, ativa=True).first()
+        barbearia = buscar_barbearia_ativa(slug=barbearia_param, Barbearia=Barbearia, db=db)
         if barbearia:
             return barbearia
     
     # Se não encontrou nenhuma barbearia ativa
     return None
 
+def invalidar_cache_usuario(usuario_id=None):
+    """Remove um usuário (ou todos, se usuario_id for None) do cache do processo"""
+    with _usuarios_cache_lock:
+        if usuario_id is None:
+            _usuarios_cache.clear()
+        else:
+            _usuarios_cache.pop(usuario_id, None)
+
+def _anexar_usuario(usuario, vinculos, db):
+    """Reanexa as cópias em cache à sessão do request, sem consultar o banco"""
+    from sqlalchemy.orm.attributes import set_committed_value
+    
+    usuario = db.session.merge(usuario, load=False)
+    set_committed_value(usuario, 'barbearias', [db.session.merge(v, load=False) for v in vinculos])
+    return usuario
+
+def _buscar_usuario(usuario_id, Usuario, db):
+    """Usuário com os vínculos carregados, do cache do processo ou do banco"""
+    from sqlalchemy.orm import joinedload
+    
+    if USUARIO_CACHE_TTL > 0:
+        item = _usuarios_cache.get(usuario_id)
+        if item:
+            revalidar_em, versao, usuario, vinculos = item
+            if revalidar_em < time.monotonic():
+                # Outro worker pode ter alterado o usuário: basta comparar a versão
+                atual = db.session.query(Usuario.versao).filter_by(id=usuario_id).scalar()
+                with _usuarios_cache_lock:
+                    if atual != versao:
+                        _usuarios_cache.pop(usuario_id, None)
+                        item = None
+                    else:
+                        _usuarios_cache[usuario_id] = (time.monotonic() + USUARIO_CACHE_TTL, versao, usuario, vinculos)
+            if item:
+                return _anexar_usuario(usuario, vinculos, db)
+    
+    # Usuário e vínculos em uma consulta só
+    usuario = db.session.get(Usuario, usuario_id, options=[joinedload(Usuario.barbearias)])
+    if usuario and USUARIO_CACHE_TTL > 0:
+        vinculos = [_copia_desanexada(v) for v in usuario.barbearias]
+        with _usuarios_cache_lock:
+            _usuarios_cache[usuario_id] = (
+                time.monotonic() + USUARIO_CACHE_TTL, usuario.versao, _copia_desanexada(usuario), vinculos
+            )
+    return usuario
+
+def get_current_usuario(Usuario=None, db=None):
+    """Retorna o usuário logado, com os vínculos, carregado uma única vez por request"""
+    if 'usuario_id' not in session:
+        return None
+    
+    if 'usuario' in g:
+        return g.usuario
+    
+    if not Usuario or not db:
+        try:
+            from app import Usuario, db
+        except ImportError:
+            return None
+    
+    g.usuario = _buscar_usuario(session['usuario_id'], Usuario, db)
+    return g.usuario
+
+# Usuário logado do request atual (None para visitantes); use "if current_user:"
+current_user = LocalProxy(get_current_usuario)
+
+def get_vinculo_usuario(barbearia_id):
+    """Vínculo ativo do usuário logado com a barbearia, sem nova consulta"""
+    usuario = get_current_usuario()
+    if not usuario:
+        return None
+    for vinculo in usuario.barbearias:
+        if vinculo.barbearia_id == barbearia_id and vinculo.ativo:
+            return vinculo
+    return None
+
 def setup_tenant_context(Usuario=None, UsuarioBarbearia=None, Barbearia=None, db=None):
     """Configura o contexto do tenant antes de cada request"""
     # Usar modelos passados como parâmetro ou fallback para import
@@ -99,19 +256,21 @@ def setup_tenant_context(Usuario=None, UsuarioBarbearia=None, Barbearia=None, db
     # Criar contexto do tenant
     g.tenant = TenantContext()
     
+    # Usuário carregado uma única vez e reutilizado pelo restante do request
+    usuario = get_current_usuario(Usuario, db)
+    g.tenant.usuario = usuario
+    
     # Verificar se é super admin (ignora isolamento de barbearia)
-    if 'usuario_id' in session:
-        usuario = Usuario.query.get(session['usuario_id'])
-        if usuario and usuario.tipo_conta == 'super_admin':
-            g.tenant.set_super_admin(True)
-            # Super admin pode acessar qualquer barbearia ou visão global
-            barbearia = identificar_barbearia(Barbearia)
-            if barbearia:
-                g.tenant.set_barbearia(barbearia.id, barbearia)
-            return
+    if usuario and usuario.tipo_conta == 'super_admin':
+        g.tenant.set_super_admin(True)
+        # Super admin pode acessar qualquer barbearia ou visão global
+        barbearia = identificar_barbearia(Barbearia, db)
+        if barbearia:
+            g.tenant.set_barbearia(barbearia.id, barbearia)
+        return
     
     # Identificar barbearia para usuários normais
-    barbearia = identificar_barbearia(Barbearia)
+    barbearia = identificar_barbearia(Barbearia, db)
     if not barbearia:
         # Se não encontrou barbearia válida, marcar contexto como vazio
         # A rota individual decidirá o que fazer (mostrar lista, erro, etc)
@@ -123,21 +282,16 @@ def setup_tenant_context(Usuario=None, UsuarioBarbearia=None, Barbearia=None, db
     g.tenant.set_barbearia(barbearia.id, barbearia)
     
     # Se há usuário logado, buscar sua relação com a barbearia
-    if 'usuario_id' in session:
-        usuario_id = session['usuario_id']
-        usuario_barbearia = UsuarioBarbearia.query.filter_by(
-            usuario_id=usuario_id,
-            barbearia_id=barbearia.id,
-            ativo=True
-        ).first()
+    if usuario:
+        usuario_id = usuario.id
+        usuario_barbearia = get_vinculo_usuario(barbearia.id)
         
         if usuario_barbearia:
             g.tenant.usuario_barbearia = usuario_barbearia
         else:
             # Usuário não tem acesso a esta barbearia
             # Verificar se é cliente que pode ser criado automaticamente
-            usuario = Usuario.query.get(usuario_id)
-            if usuario and usuario.tipo_conta == 'cliente':
+            if usuario.tipo_conta == 'cliente':
                 novo_vinculo = UsuarioBarbearia(
                     usuario_id=usuario_id,
                     barbearia_id=barbearia.id,
@@ -224,11 +378,9 @@ def get_current_barbearia_id():
     
     # Segundo, tentar do parâmetro da URL
     try:
-        from flask import request
         barbearia_param = request.args.get('b')
         if barbearia_param:
-            from app import Barbearia
-            barbearia = Barbearia.query.filter_by(slug=barbearia_param, ativa=True).first()
+            barbearia = buscar_barbearia_ativa(slug=barbearia_param)
             if barbearia:
                 return barbearia.id
     except:
@@ -237,7 +389,7 @@ def get_current_barbearia_id():
     # Fallback: tentar pegar da primeira barbearia ativa
     try:
         from app import Barbearia
-        barbearia = Barbearia.query.filter_by(slug='principal', ativa=True).first()
+        barbearia = buscar_barbearia_ativa(slug='principal')
         if barbearia:
             return barbearia.id
         # Se não encontrou 'principal', pega a primeira ativa
@@ -253,7 +405,7 @@ def get_current_barbearia():
     # Fallback: tentar pegar da primeira barbearia ativa
     try:
         from app import Barbearia
-        barbearia = Barbearia.query.filter_by(slug='principal', ativa=True).first()
+        barbearia = buscar_barbearia_ativa(slug='principal')
         if barbearia:
             return barbearia
         # Se não encontrou 'principal', pega a primeira ativa
@@ -267,8 +419,7 @@ def is_super_admin():
         return False
     
     try:
-        from app import Usuario
-        usuario = Usuario.query.get(session['usuario_id'])
+        usuario = get_current_usuario()
         return usuario and usuario.tipo_conta == 'super_admin'
     except:
         return False
@@ -4,15 +4,23 @@ Módulo de Segurança para a Aplicação BarberConnect
 from functools import wraps
 from flask import session, request, abort, flash, redirect, url_for
 from datetime import datetime, timedelta
+import math
+import os
 import re
+import time
 import bleach
 import uuid
+from rate_limit import criar_backend, estimar_tentativas, segundos_para_liberar
+from auditoria import gravador_auditoria
 
-# Configurações de Rate Limiting (simulado)
-LOGIN_ATTEMPTS = {}  # {ip: [(timestamp, success), ...]}
+# Configurações de Rate Limiting (estado compartilhado entre workers, ver rate_limit.py)
+RATE_LIMIT = criar_backend()
 MAX_LOGIN_ATTEMPTS = 5
 LOCKOUT_TIME = 15 * 60  # 15 minutos em segundos
 
+# Eco dos eventos de auditoria no console
+AUDIT_CONSOLE = os.environ.get('AUDIT_CONSOLE', '').lower() in ('1', 'true', 'yes')
+
 def sanitize_input(text, allow_html=False):
     """
     Sanitiza input do usuário para prevenir XSS
@@ -90,50 +98,32 @@ def check_rate_limit(identifier, max_attempts=MAX_LOGIN_ATTEMPTS, window=LOCKOUT
     Verifica rate limit para prevenir brute force
     Retorna (allowed, remaining_attempts, lockout_seconds)
     """
-    now = datetime.now()
-    
-    if identifier not in LOGIN_ATTEMPTS:
-        LOGIN_ATTEMPTS[identifier] = []
-    
-    # Remove tentativas antigas (fora da janela de tempo)
-    LOGIN_ATTEMPTS[identifier] = [
-        (timestamp, success) for timestamp, success in LOGIN_ATTEMPTS[identifier]
-        if (now - timestamp).total_seconds() < window
-    ]
-    
-    # Conta tentativas falhadas recentes
-    failed_attempts = sum(1 for _, success in LOGIN_ATTEMPTS[identifier] if not success)
-    
+    now = time.time()
+    try:
+        estado = RATE_LIMIT.consultar(identifier, window, now)
+    except Exception as e:
+        # Falha no armazenamento não deve impedir o login
+        print(f"⚠️ [RATE LIMIT] Erro ao consultar tentativas: {e}")
+        return True, max_attempts, 0
+
+    failed_attempts = estimar_tentativas(estado, window, now)
     if failed_attempts >= max_attempts:
-        # Usuário está bloqueado - calcular tempo restante
-        oldest_attempt = min(timestamp for timestamp, _ in LOGIN_ATTEMPTS[identifier])
-        lockout_end = oldest_attempt + timedelta(seconds=window)
-        remaining_seconds = int((lockout_end - now).total_seconds())
-        
-        if remaining_seconds > 0:
-            return False, 0, remaining_seconds
-        else:
-            # Período de bloqueio expirou - limpar tentativas
-            LOGIN_ATTEMPTS[identifier] = []
-            return True, max_attempts, 0
-    
-    remaining = max_attempts - failed_attempts
-    return True, remaining, 0
+        return False, 0, segundos_para_liberar(estado, window, now, max_attempts)
 
-def record_login_attempt(identifier, success=True):
+    remaining = max_attempts - math.ceil(failed_attempts)
+    return True, max(remaining, 1), 0
+
+def record_login_attempt(identifier, success=True, window=LOCKOUT_TIME):
     """
-    Registra tentativa de login
+    Registra tentativa de login (apenas as falhas contam para o limite)
     """
-    now = datetime.now()
-    
-    if identifier not in LOGIN_ATTEMPTS:
-        LOGIN_ATTEMPTS[identifier] = []
-    
-    LOGIN_ATTEMPTS[identifier].append((now, success))
-    
-    # Limitar histórico a últimas 20 tentativas
-    if len(LOGIN_ATTEMPTS[identifier]) > 20:
-        LOGIN_ATTEMPTS[identifier] = LOGIN_ATTEMPTS[identifier][-20:]
+    if success:
+        return
+
+    try:
+        RATE_LIMIT.registrar(identifier, window, time.time())
+    except Exception as e:
+        print(f"⚠️ [RATE LIMIT] Erro ao registrar tentativa: {e}")
 
 def require_login(f):
     """
@@ -200,7 +190,7 @@ def get_client_ip():
 
 def audit_log(action, user_id=None, details=None, **kwargs):
     """
-    Registra ações importantes para auditoria em arquivo JSON
+    Registra ações importantes para auditoria em arquivo JSON (sem bloquear a requisição)
     """
     timestamp = datetime.now().isoformat()
     ip = kwargs.get('ip') or get_client_ip()
@@ -221,21 +211,11 @@ def audit_log(action, user_id=None, details=None, **kwargs):
             if k not in log_entry:
                 log_entry[k] = v
     
-    # Salvar em arquivo de log
-    try:
-        import os
-        import json
-        log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-            
-        log_file = os.path.join(log_dir, f'audit_{datetime.now().strftime("%Y-%m")}.jsonl')
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-    except Exception as e:
-        print(f"[ERROR] Falha ao gravar log de auditoria: {str(e)}")
+    # Gravação em arquivo feita em segundo plano (auditoria.py): aqui só enfileira
+    gravador_auditoria.enfileirar(log_entry)
     
-    # Manter print para debug no console
-    print(f"[AUDIT] {log_entry}")
+    # Eco no console apenas quando habilitado (debug)
+    if AUDIT_CONSOLE:
+        print(f"[AUDIT] {log_entry}")
     
     return log_entry
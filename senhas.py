@@ -0,0 +1,59 @@
+"""
+Hash de senhas com algoritmo e custo configuráveis
+
+A política vem de SENHA_METODO, no formato do Werkzeug:
+
+- scrypt:N:r:p          (ex.: scrypt:32768:8:1, o padrão do Werkzeug 3)
+- pbkdf2:sha256:iteracoes (ex.: pbkdf2:sha256:600000)
+
+Hashes gravados com outra política continuam válidos; no login bem-sucedido
+o app os regrava com a política atual (precisa_rehash), de modo que mudar
+SENHA_METODO converge aos poucos, sem reset de senhas. Para escolher o custo,
+rode scripts/benchmark_senhas.py no host de produção.
+"""
+import os
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+METODO_PADRAO = 'scrypt:32768:8:1'
+SENHA_METODO = os.environ.get('SENHA_METODO', METODO_PADRAO)
+
+def _parametros(metodo):
+    """('scrypt', (N, r, p)) ou ('pbkdf2', (hash, iteracoes)) de um método do Werkzeug"""
+    algoritmo, *args = metodo.split(':')
+    if algoritmo == 'scrypt':
+        padrao = [2 ** 15, 8, 1]
+        valores = [int(a) for a in args] + padrao[len(args):]
+        return algoritmo, tuple(valores)
+    if algoritmo == 'pbkdf2':
+        nome_hash = args[0] if args else 'sha256'
+        iteracoes = int(args[1]) if len(args) > 1 else 600000
+        return algoritmo, (nome_hash, iteracoes)
+    return algoritmo, tuple(args)
+
+def gerar_hash(senha, metodo=None):
+    """Hash da senha com a política configurada"""
+    return generate_password_hash(senha, method=metodo or SENHA_METODO)
+
+def precisa_rehash(hash_armazenado, metodo=None):
+    """True se o hash foi gerado com algoritmo ou custo diferente da política"""
+    if not hash_armazenado or '$' not in hash_armazenado:
+        return True
+    try:
+        return _parametros(hash_armazenado.split('$', 1)[0]) != _parametros(metodo or SENHA_METODO)
+    except ValueError:
+        return True
+
+# Hash de referência para comparar quando o usuário não existe: o tempo de
+# resposta fica igual ao de uma senha errada para um usuário existente
+_hash_ficticio = None
+
+def verificar_senha(hash_armazenado, senha):
+    """check_password_hash que também gasta o tempo do KDF quando não há hash"""
+    global _hash_ficticio
+    if not hash_armazenado:
+        if _hash_ficticio is None:
+            _hash_ficticio = gerar_hash(os.urandom(16).hex())
+        check_password_hash(_hash_ficticio, senha or '')
+        return False
+    return check_password_hash(hash_armazenado, senha or '')
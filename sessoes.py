@@ -0,0 +1,309 @@
+"""
+Sessões guardadas no servidor, com cookie contendo apenas um ID opaco
+
+O cookie de sessão passa a levar só um identificador aleatório (32 caracteres);
+os dados ficam no armazenamento escolhido em SESSAO_BACKEND:
+
+- banco: tabela sessao do banco do app (SQLite ou PostgreSQL), compartilhada
+  por todos os workers e hosts (padrão)
+- sqlite: arquivo SQLite local, em /dev/shm quando disponível (memória
+  compartilhada pelos workers do mesmo host)
+- memoria: dicionário do processo (desenvolvimento / worker único)
+- cookie: sessão assinada em cookie, padrão do Flask (comportamento anterior)
+
+A gravação é preguiçosa: a sessão só é gravada quando os dados serializados
+mudam ou quando falta menos da metade da validade (renovação deslizante), e o
+Set-Cookie só é enviado para sessões novas ou renovadas. Atribuir o mesmo valor
+(ex.: session['barbearia_id'] em toda visita) não gera escrita.
+
+No armazenamento a chave é o SHA-256 do ID, não o próprio ID. Cada registro
+guarda também usuario_id e barbearia_id, para encerrar as sessões de um
+usuário (ex.: após redefinir a senha). O ID é trocado quando a sessão é limpa
+(login/logout) ou muda de usuário, evitando fixação de sessão.
+"""
+import hashlib
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+
+from flask.sessions import SecureCookieSession, SessionInterface
+from flask.json.tag import TaggedJSONSerializer
+
+LIMPEZA_A_CADA = 256  # gravações entre limpezas dos armazenamentos locais
+
+def _chave(sid):
+    return hashlib.sha256(sid.encode()).hexdigest()
+
+# ---------- ARMAZENAMENTOS ----------
+
+class ArmazenamentoBanco:
+    """Sessões na tabela do app (modelo passado pelo app, ver Sessao em app.py)"""
+
+    def __init__(self, db, Sessao):
+        self.db = db
+        self.tabela = Sessao.__table__
+
+    def ler(self, chave, agora):
+        with self.db.engine.connect() as conn:
+            linha = conn.execute(
+                self.db.select(self.tabela.c.dados, self.tabela.c.expira_em)
+                .where(self.tabela.c.id == chave, self.tabela.c.expira_em > agora)
+            ).first()
+        return tuple(linha) if linha else None
+
+    def gravar(self, chave, dados, expira_em, usuario_id, barbearia_id, nova):
+        valores = dict(dados=dados, expira_em=expira_em, usuario_id=usuario_id, barbearia_id=barbearia_id)
+        with self.db.engine.begin() as conn:
+            if not nova:
+                resultado = conn.execute(
+                    self.tabela.update().where(self.tabela.c.id == chave).values(**valores)
+                )
+                if resultado.rowcount:
+                    return
+            conn.execute(self.tabela.insert().values(id=chave, **valores))
+
+    def apagar(self, chave):
+        with self.db.engine.begin() as conn:
+            conn.execute(self.tabela.delete().where(self.tabela.c.id == chave))
+
+    def apagar_usuario(self, usuario_id):
+        with self.db.engine.begin() as conn:
+            return conn.execute(self.tabela.delete().where(self.tabela.c.usuario_id == usuario_id)).rowcount
+
+    def limpar_expiradas(self, agora):
+        with self.db.engine.begin() as conn:
+            return conn.execute(self.tabela.delete().where(self.tabela.c.expira_em <= agora)).rowcount
+
+class ArmazenamentoSQLite:
+    """Sessões em um arquivo SQLite local, compartilhado pelos workers do mesmo host.
+
+    Cada operação abre a própria conexão (seguro após o fork do gunicorn).
+    """
+
+    def __init__(self, caminho=None):
+        pasta = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        self.caminho = caminho or os.environ.get('SESSAO_SQLITE', os.path.join(pasta, 'barberconnect_sessoes.db'))
+        self._pid = None
+        self._gravacoes = 0
+        self._lock = threading.Lock()
+
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    conexao.execute('PRAGMA journal_mode=WAL')
+                    conexao.execute(
+                        'CREATE TABLE IF NOT EXISTS sessao ('
+                        ' id TEXT PRIMARY KEY,'
+                        ' dados TEXT NOT NULL,'
+                        ' expira_em TEXT NOT NULL,'
+                        ' usuario_id INTEGER,'
+                        ' barbearia_id INTEGER)'
+                    )
+                    conexao.execute('CREATE INDEX IF NOT EXISTS ix_sessao_expira_em ON sessao (expira_em)')
+                    conexao.execute('CREATE INDEX IF NOT EXISTS ix_sessao_usuario_id ON sessao (usuario_id)')
+                    self._pid = os.getpid()
+        return conexao
+
+    def ler(self, chave, agora):
+        conexao = self._conectar()
+        try:
+            linha = conexao.execute(
+                'SELECT dados, expira_em FROM sessao WHERE id = ? AND expira_em > ?',
+                (chave, agora.isoformat(' '))
+            ).fetchone()
+        finally:
+            conexao.close()
+        return (linha[0], datetime.fromisoformat(linha[1])) if linha else None
+
+    def gravar(self, chave, dados, expira_em, usuario_id, barbearia_id, nova):
+        conexao = self._conectar()
+        try:
+            conexao.execute(
+                'INSERT OR REPLACE INTO sessao (id, dados, expira_em, usuario_id, barbearia_id) VALUES (?, ?, ?, ?, ?)',
+                (chave, dados, expira_em.isoformat(' '), usuario_id, barbearia_id)
+            )
+            self._gravacoes += 1
+            if self._gravacoes % LIMPEZA_A_CADA == 0:
+                conexao.execute('DELETE FROM sessao WHERE expira_em <= ?', (datetime.utcnow().isoformat(' '),))
+        finally:
+            conexao.close()
+
+    def apagar(self, chave):
+        conexao = self._conectar()
+        try:
+            conexao.execute('DELETE FROM sessao WHERE id = ?', (chave,))
+        finally:
+            conexao.close()
+
+    def apagar_usuario(self, usuario_id):
+        conexao = self._conectar()
+        try:
+            return conexao.execute('DELETE FROM sessao WHERE usuario_id = ?', (usuario_id,)).rowcount
+        finally:
+            conexao.close()
+
+    def limpar_expiradas(self, agora):
+        conexao = self._conectar()
+        try:
+            return conexao.execute('DELETE FROM sessao WHERE expira_em <= ?', (agora.isoformat(' '),)).rowcount
+        finally:
+            conexao.close()
+
+class ArmazenamentoMemoria:
+    """Sessões no processo atual (cada worker tem as suas)"""
+
+    def __init__(self):
+        self._sessoes = {}  # {chave: (dados, expira_em, usuario_id)}
+        self._gravacoes = 0
+        self._lock = threading.Lock()
+
+    def ler(self, chave, agora):
+        registro = self._sessoes.get(chave)
+        if registro is None or registro[1] <= agora:
+            return None
+        return registro[0], registro[1]
+
+    def gravar(self, chave, dados, expira_em, usuario_id, barbearia_id, nova):
+        with self._lock:
+            self._sessoes[chave] = (dados, expira_em, usuario_id)
+            self._gravacoes += 1
+        if self._gravacoes % LIMPEZA_A_CADA == 0:
+            self.limpar_expiradas(datetime.utcnow())
+
+    def apagar(self, chave):
+        with self._lock:
+            self._sessoes.pop(chave, None)
+
+    def apagar_usuario(self, usuario_id):
+        with self._lock:
+            chaves = [c for c, registro in self._sessoes.items() if registro[2] == usuario_id]
+            for chave in chaves:
+                del self._sessoes[chave]
+        return len(chaves)
+
+    def limpar_expiradas(self, agora):
+        with self._lock:
+            chaves = [c for c, registro in self._sessoes.items() if registro[1] <= agora]
+            for chave in chaves:
+                del self._sessoes[chave]
+        return len(chaves)
+
+# ---------- INTERFACE DO FLASK ----------
+
+class SessaoServidor(SecureCookieSession):
+    """Sessão com o ID do cookie e o estado lido do armazenamento"""
+
+    def __init__(self, dados=None, sid=None, serializados=None, expira_em=None):
+        super().__init__(dados)
+        self.sid = sid
+        self.new = sid is None
+        self.serializados = serializados  # dados como foram lidos, para detectar mudanças
+        self.expira_em = expira_em
+        self.usuario_original = (dados or {}).get('usuario_id')
+        self.permanente_original = bool((dados or {}).get('_permanent'))
+        self.trocar_id = False
+
+    def clear(self):
+        super().clear()
+        # Login e logout limpam a sessão: a próxima gravação usa um novo ID
+        self.trocar_id = True
+
+class InterfaceSessaoServidor(SessionInterface):
+    serializer = TaggedJSONSerializer()
+    session_class = SessaoServidor
+
+    def __init__(self, armazenamento):
+        self.armazenamento = armazenamento
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid:
+            return self.session_class()
+        try:
+            registro = self.armazenamento.ler(_chave(sid), datetime.utcnow())
+        except Exception as e:
+            print(f"⚠️ [SESSAO] Erro ao ler sessão: {e}")
+            registro = None
+        if registro is None:
+            return self.session_class()
+
+        serializados, expira_em = registro
+        try:
+            dados = self.serializer.loads(serializados)
+        except ValueError:
+            return self.session_class()
+        return self.session_class(dados, sid, serializados, expira_em)
+
+    def save_session(self, app, session, response):
+        nome = self.get_cookie_name(app)
+        dominio = self.get_cookie_domain(app)
+        caminho = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.sid:
+                # Sessão esvaziada (logout): remover registro e cookie
+                self.armazenamento.apagar(_chave(session.sid))
+                response.delete_cookie(nome, domain=dominio, path=caminho,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        agora = datetime.utcnow()
+        duracao = app.permanent_session_lifetime
+        serializados = self.serializer.dumps(dict(session))
+
+        trocar_id = (session.sid is None or session.trocar_id
+                     or session.get('usuario_id') != session.usuario_original)
+        if trocar_id:
+            if session.sid:
+                self.armazenamento.apagar(_chave(session.sid))
+            session.sid = secrets.token_urlsafe(24)
+        else:
+            mudou = serializados != session.serializados
+            renovar = session.expira_em - agora < duracao / 2
+            if not mudou and not renovar:
+                return  # nada a gravar nem a reenviar
+
+        expira_em = agora + duracao
+        self.armazenamento.gravar(
+            _chave(session.sid), serializados, expira_em,
+            session.get('usuario_id'), session.get('barbearia_id'), nova=trocar_id
+        )
+
+        # O cookie só muda com um novo ID ou, em sessões permanentes, para estender a validade
+        if trocar_id or (session.permanent and (renovar or not session.permanente_original)):
+            response.set_cookie(
+                nome, session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=dominio, path=caminho,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+
+    def encerrar_sessoes_usuario(self, usuario_id):
+        """Remove todas as sessões do usuário (ex.: depois de redefinir a senha)"""
+        return self.armazenamento.apagar_usuario(usuario_id)
+
+    def limpar_expiradas(self):
+        return self.armazenamento.limpar_expiradas(datetime.utcnow())
+
+def criar_interface(db, Sessao, tipo=None):
+    """Interface de SESSAO_BACKEND (padrão: banco); None para manter a sessão em cookie"""
+    tipo = (tipo or os.environ.get('SESSAO_BACKEND', 'banco')).lower()
+    if tipo == 'cookie':
+        return None
+    if tipo == 'sqlite':
+        return InterfaceSessaoServidor(ArmazenamentoSQLite())
+    if tipo == 'memoria':
+        return InterfaceSessaoServidor(ArmazenamentoMemoria())
+    return InterfaceSessaoServidor(ArmazenamentoBanco(db, Sessao))
@@ -0,0 +1,114 @@
+"""
+Fixtures dos testes: app com banco SQLite temporário e dados mínimos
+
+As variáveis de ambiente precisam estar definidas antes do import de app.py
+(banco, broker de eventos e armazenamentos locais ficam no diretório temporário).
+"""
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+import pytest
+
+PASTA_TESTES = tempfile.mkdtemp(prefix='barberconnect_testes_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(PASTA_TESTES, 'testes.db')
+os.environ['EVENTOS_BROKER'] = 'local'
+os.environ['EMAIL_BACKEND'] = 'console'
+os.environ['RATE_LIMIT_SQLITE'] = os.path.join(PASTA_TESTES, 'rate_limit.db')
+os.environ['SESSAO_SQLITE'] = os.path.join(PASTA_TESTES, 'sessoes.db')
+os.environ.setdefault('SESSAO_BACKEND', 'banco')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as aplicacao  # noqa: E402
+import security  # noqa: E402
+from auditoria import gravador_auditoria  # noqa: E402
+from rate_limit import RateLimitMemoria  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+SENHA = 'senha12345'
+
+def proxima_segunda(semanas=1):
+    """Segunda-feira futura ('YYYY-MM-DD'), dia ativo na configuração padrão"""
+    hoje = date.today()
+    return (hoje + timedelta(days=7 * semanas - hoje.weekday())).isoformat()
+
+def limpar_caches():
+    # As funções do módulo tenant que o app usa (scripts.tenant seria outra cópia do módulo)
+    aplicacao.invalidar_cache_barbearia()
+    aplicacao.invalidar_cache_usuario()
+    for cache in (aplicacao.cache_planos, aplicacao.cache_paginas_publicas,
+                  aplicacao.cache_estatisticas, aplicacao.cache_relatorios):
+        cache.invalidar()
+
+@pytest.fixture(autouse=True)
+def ambiente(monkeypatch):
+    """Banco recriado, caches limpos e rate limit em memória a cada teste"""
+    app = aplicacao.app
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    monkeypatch.setattr(security, 'RATE_LIMIT', RateLimitMemoria())
+    monkeypatch.setattr(gravador_auditoria, 'diretorio', PASTA_TESTES)
+
+    with app.app_context():
+        aplicacao.db.drop_all()
+        aplicacao.db.create_all()
+    limpar_caches()
+    yield app
+    with app.app_context():
+        aplicacao.db.session.remove()
+    limpar_caches()
+
+@pytest.fixture
+def db():
+    with aplicacao.app.app_context():
+        yield aplicacao.db
+
+@pytest.fixture
+def dados(db):
+    """Barbearia 'principal' com um admin, um cliente e o serviço Corte (60 min, R$ 40)"""
+    A = aplicacao
+    barbearia = A.Barbearia(nome='Principal', slug='principal', ativa=True)
+    db.session.add(barbearia)
+    db.session.flush()
+
+    admin = A.Usuario(nome='Admin', username='admin', email='admin@teste.com',
+                      senha=generate_password_hash(SENHA), tipo_conta='admin_barbearia')
+    cliente = A.Usuario(nome='Cliente', email='cliente@teste.com',
+                        senha=generate_password_hash(SENHA), tipo_conta='cliente')
+    db.session.add_all([admin, cliente])
+    db.session.flush()
+    db.session.add_all([
+        A.UsuarioBarbearia(usuario_id=admin.id, barbearia_id=barbearia.id, role='admin'),
+        A.UsuarioBarbearia(usuario_id=cliente.id, barbearia_id=barbearia.id, role='cliente'),
+    ])
+
+    servico = A.Servico(barbearia_id=barbearia.id, nome='Corte', preco=40.0, duracao=60)
+    db.session.add(servico)
+    db.session.commit()
+
+    return {
+        'barbearia_id': barbearia.id,
+        'admin_id': admin.id,
+        'cliente_id': cliente.id,
+        'servico_id': servico.id,
+    }
+
+@pytest.fixture
+def client(ambiente):
+    return ambiente.test_client()
+
+def fazer_login(client, email, senha=SENHA, slug='principal'):
+    return client.post(f'/{slug}/login', data={'email': email, 'senha': senha})
+
+def criar_reserva(db, dados, data, hora_inicio='10:00', hora_fim='11:00', status='agendada', **extras):
+    """Reserva do cliente de ``dados`` gravada pelo ORM (passa pelos listeners de flush)"""
+    reserva = aplicacao.Reserva(
+        barbearia_id=dados['barbearia_id'], cliente_id=dados['cliente_id'],
+        servico_id=dados['servico_id'], data=data, hora_inicio=hora_inicio,
+        hora_fim=hora_fim, status=status, **extras
+    )
+    db.session.add(reserva)
+    db.session.commit()
+    return reserva
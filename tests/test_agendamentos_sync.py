@@ -0,0 +1,124 @@
+"""Sincronização incremental do dashboard (api_agendamentos_sync): carga por cursor e delta por versão"""
+import pytest
+
+import app as aplicacao
+from conftest import criar_reserva, fazer_login, proxima_segunda
+
+URL = '/principal/api/agendamentos_sync'
+
+@pytest.fixture
+def admin(client, dados):
+    fazer_login(client, 'admin@teste.com')
+    return client
+
+def criar_reservas(db, dados, quantidade, data=None):
+    data = data or proxima_segunda()
+    return [
+        criar_reserva(db, dados, data, f'{8 + i:02d}:00', f'{8 + i:02d}:30')
+        for i in range(quantidade)
+    ]
+
+def test_exige_admin(client, dados):
+    assert client.get(URL).status_code == 401
+    fazer_login(client, 'cliente@teste.com')
+    assert client.get(URL).status_code == 403
+
+def test_carga_inicial_paginada_pelo_cursor(admin, db, dados):
+    reservas = criar_reservas(db, dados, 5)
+    cancelada = criar_reserva(db, dados, proxima_segunda(), '18:00', '18:30', status='cancelada')
+
+    vistos, cursor, paginas = [], None, 0
+    while True:
+        resposta = admin.get(URL, query_string={'limite': 2, **({'cursor': cursor} if cursor else {})})
+        assert resposta.status_code == 200
+        corpo = resposta.get_json()
+        if paginas == 0:
+            versao = corpo['versao']
+        vistos += [a['uuid'] for a in corpo['agendamentos']]
+        paginas += 1
+        cursor = corpo['proximo_cursor']
+        if not cursor:
+            break
+
+    assert paginas == 3
+    # Mais recentes primeiro, sem repetir nem pular, e sem as canceladas
+    assert vistos == [r.uuid for r in reversed(reservas)]
+    assert cancelada.uuid not in vistos
+    assert versao == aplicacao.versao_atual_reservas(dados['barbearia_id'])
+
+@pytest.mark.parametrize('cursor', [
+    'x', '2025-13-01|10:00|1', '2025-01-01|25:00|1', '2025-01-01|10:00|abc', "2025-01-01' OR 1=1|10:00|1",
+])
+def test_cursor_invalido(admin, dados, cursor):
+    resposta = admin.get(URL, query_string={'cursor': cursor})
+    assert resposta.status_code == 400
+    assert resposta.get_json() == {'error': 'Cursor inválido'}
+
+def test_parametros_invalidos(admin, dados):
+    assert admin.get(URL, query_string={'since': 'abc'}).status_code == 400
+    assert admin.get(URL, query_string={'limite': 'abc'}).status_code == 400
+
+def test_delta_traz_alteradas_e_removidas(admin, db, dados):
+    alterada, cancelada, excluida, intacta = criar_reservas(db, dados, 4)
+    versao = admin.get(URL).get_json()['versao']
+
+    assert admin.get(URL, query_string={'since': versao}).get_json() == {
+        'alterados': [], 'removidos': [], 'versao': versao, 'mais': False
+    }
+
+    alterada.observacoes = 'trazer cartão'
+    cancelada.status = 'cancelada'
+    db.session.commit()
+    uuid_excluida = excluida.uuid
+    db.session.delete(excluida)
+    db.session.commit()
+    nova = criar_reserva(db, dados, proxima_segunda(2))
+
+    corpo = admin.get(URL, query_string={'since': versao}).get_json()
+    assert {a['uuid'] for a in corpo['alterados']} == {alterada.uuid, nova.uuid}
+    assert set(corpo['removidos']) == {cancelada.uuid, uuid_excluida}
+    assert intacta.uuid not in {a['uuid'] for a in corpo['alterados']}
+    assert corpo['mais'] is False
+    assert corpo['versao'] == aplicacao.versao_atual_reservas(dados['barbearia_id'])
+
+    # Nada mudou depois da nova versão
+    repetido = admin.get(URL, query_string={'since': corpo['versao']}).get_json()
+    assert repetido['alterados'] == [] and repetido['removidos'] == []
+
+def test_delta_paginado_com_mais(admin, db, dados):
+    versao = admin.get(URL).get_json()['versao']
+    reservas = criar_reservas(db, dados, 5)
+
+    recebidos, paginas = [], 0
+    while True:
+        corpo = admin.get(URL, query_string={'since': versao, 'limite': 2}).get_json()
+        recebidos += [a['uuid'] for a in corpo['alterados']]
+        assert corpo['versao'] > versao
+        versao = corpo['versao']
+        paginas += 1
+        if not corpo['mais']:
+            break
+
+    assert paginas == 3
+    assert recebidos == [r.uuid for r in reservas]
+
+def test_delta_nao_corta_uma_versao_ao_meio(admin, db, dados):
+    versao = admin.get(URL).get_json()['versao']
+    data = proxima_segunda()
+    # Três reservas gravadas no mesmo flush recebem a mesma versão
+    db.session.add_all([
+        aplicacao.Reserva(barbearia_id=dados['barbearia_id'], cliente_id=dados['cliente_id'],
+                          servico_id=dados['servico_id'], data=data,
+                          hora_inicio=f'{9 + i:02d}:00', hora_fim=f'{9 + i:02d}:30')
+        for i in range(3)
+    ])
+    db.session.commit()
+    criar_reserva(db, dados, data, '15:00', '15:30')
+
+    corpo = admin.get(URL, query_string={'since': versao, 'limite': 2}).get_json()
+    assert len(corpo['alterados']) == 3
+    assert corpo['mais'] is True
+
+    resto = admin.get(URL, query_string={'since': corpo['versao'], 'limite': 2}).get_json()
+    assert len(resto['alterados']) == 1
+    assert resto['mais'] is False
@@ -0,0 +1,66 @@
+"""Consulta em lote da API de suporte (chamados_sync.ClienteSuporte)"""
+import pytest
+
+from chamados_sync import ENDPOINT_LOTE, ClienteSuporte
+
+class Resposta:
+    def __init__(self, status_code, dados):
+        self.status_code = status_code
+        self._dados = dados
+
+    def json(self):
+        return self._dados
+
+    def raise_for_status(self):
+        pass
+
+class SessaoFalsa:
+    """Responde o POST em lote com ``lote`` e os GETs individuais com ``individuais``"""
+
+    def __init__(self, lote, individuais=None):
+        self.lote = lote
+        self.individuais = individuais or {}
+        self.gets = []
+
+    def post(self, url, json=None, timeout=None):
+        assert url.endswith(ENDPOINT_LOTE)
+        return Resposta(200, self.lote)
+
+    def get(self, url, timeout=None):
+        api_chamado_id = url.rsplit('/', 1)[1]
+        self.gets.append(api_chamado_id)
+        if api_chamado_id in self.individuais:
+            return Resposta(200, {'success': True, 'ticket': {'status': self.individuais[api_chamado_id]}})
+        return Resposta(404, {})
+
+def cliente_com(sessao):
+    cliente = ClienteSuporte(base_url='http://suporte.teste', concorrencia=2)
+    cliente.sessao = sessao
+    return cliente
+
+def test_lote_com_ids_numericos():
+    cliente = cliente_com(SessaoFalsa({'tickets': [{'id': 10, 'status': 'resolvido'}, {'id': 11, 'status': 'novo'}]}))
+    assert cliente.consultar_varios(['10', '11']) == {'10': 'resolvido', '11': 'enviado'}
+    assert cliente.suporta_lote is True
+
+@pytest.mark.parametrize('corpo', [{}, {'success': False, 'error': 'falha interna'}, {'resultados': []}, []])
+def test_lote_sem_lista_de_tickets_usa_consultas_individuais(corpo):
+    sessao = SessaoFalsa(corpo, individuais={'SUP-1': 'em_andamento', 'SUP-2': 'novo'})
+    cliente = cliente_com(sessao)
+
+    assert cliente.consultar_varios(['SUP-1', 'SUP-2']) == {'SUP-1': 'em_andamento', 'SUP-2': 'enviado'}
+    assert cliente.suporta_lote is False
+    assert sorted(sessao.gets) == ['SUP-1', 'SUP-2']
+
+def test_ausentes_do_lote_sao_confirmados_individualmente():
+    sessao = SessaoFalsa(
+        {'tickets': [{'ticket_id': 'SUP-1', 'status': 'fechado'}]},
+        individuais={'SUP-2': 'em_andamento'}
+    )
+    cliente = cliente_com(sessao)
+
+    # SUP-2 existe (só faltou no lote); SUP-3 some em todos os formatos de URL
+    assert cliente.consultar_varios(['SUP-1', 'SUP-2', 'SUP-3']) == {
+        'SUP-1': 'fechado', 'SUP-2': 'em_andamento', 'SUP-3': 'deletado'
+    }
+    assert 'SUP-1' not in sessao.gets
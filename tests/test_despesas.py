@@ -0,0 +1,63 @@
+"""Despesas: criação em lote e ocorrências das despesas recorrentes"""
+from datetime import date, timedelta
+
+import app as aplicacao
+from conftest import fazer_login
+
+def despesa(**campos):
+    return {'descricao': 'Aluguel', 'categoria': 'aluguel', 'valor': 1500,
+            'data_vencimento': date.today().isoformat(), **campos}
+
+def test_lote_aceita_valor_zero(client, dados):
+    fazer_login(client, 'admin@teste.com')
+    resposta = client.post('/principal/admin/despesas/lote', json=[despesa(valor=0), despesa(descricao='Água', valor='0')])
+    assert resposta.status_code == 200, resposta.get_json()
+    assert sorted(d.valor for d in aplicacao.Despesa.query) == [0, 0]
+
+def test_lote_recusa_campos_vazios(client, dados):
+    fazer_login(client, 'admin@teste.com')
+    resposta = client.post('/principal/admin/despesas/lote', json=[despesa(valor=None), despesa(descricao='')])
+    assert resposta.status_code == 400
+    assert [e['indice'] for e in resposta.get_json()['erros']] == [0, 1]
+    assert aplicacao.Despesa.query.count() == 0
+
+def test_editar_modelo_atualiza_ocorrencias_futuras_pendentes(client, db, dados):
+    fazer_login(client, 'admin@teste.com')
+    client.post('/principal/admin/despesas/lote', json=[despesa(recorrente=True)])
+    modelo = aplicacao.Despesa.query.filter_by(recorrente=True).one()
+    ocorrencias = aplicacao.Despesa.query.filter_by(despesa_origem_id=modelo.id).order_by(
+        aplicacao.Despesa.data_vencimento).all()
+    assert len(ocorrencias) >= 3
+
+    # Uma vencida, uma paga e as demais futuras pendentes
+    vencida, paga = ocorrencias[0], ocorrencias[1]
+    vencida.data_vencimento = date.today() - timedelta(days=1)
+    paga.status = 'paga'
+    db.session.commit()
+    modelo_uuid = modelo.uuid
+
+    resposta = client.post(f'/principal/admin/despesas/{modelo_uuid}/editar', json={'valor': 1800, 'descricao': 'Aluguel novo'})
+    assert resposta.status_code == 200, resposta.get_json()
+
+    db.session.expire_all()
+    valores = {d.id: (d.descricao, d.valor) for d in aplicacao.Despesa.query.filter_by(despesa_origem_id=modelo.id)}
+    assert valores.pop(vencida.id) == ('Aluguel', 1500)
+    assert valores.pop(paga.id) == ('Aluguel', 1500)
+    assert set(valores.values()) == {('Aluguel novo', 1800)}
+
+def test_job_aplica_edicoes_feitas_fora_da_rota(db, dados):
+    modelo = aplicacao.Despesa(barbearia_id=dados['barbearia_id'], descricao='Internet', categoria='internet',
+                               valor=100, data_vencimento=date.today(), recorrente=True,
+                               criado_por=dados['admin_id'])
+    db.session.add(modelo)
+    db.session.commit()
+    aplicacao.materializar_despesas_recorrentes(despesa_ids=[modelo.id])
+
+    modelo.valor = 120
+    db.session.commit()
+    aplicacao.job_materializar_despesas_recorrentes()
+
+    futuras = aplicacao.Despesa.query.filter(aplicacao.Despesa.despesa_origem_id == modelo.id,
+                                             aplicacao.Despesa.data_vencimento > date.today()).all()
+    assert futuras and {d.valor for d in futuras} == {120}
+    assert aplicacao.sincronizar_ocorrencias_recorrentes() == 0
@@ -0,0 +1,86 @@
+"""Resumo faturamento_diario sob mudanças de status e as agregações dos relatórios"""
+import pytest
+
+import app as aplicacao
+from conftest import criar_reserva, fazer_login
+
+DATA = '2026-03-02'
+
+def quantidades(db, barbearia_id):
+    """{(data, servico_id, barbeiro_id): quantidade} do resumo da barbearia"""
+    linhas = db.session.query(aplicacao.FaturamentoDiario).filter_by(barbearia_id=barbearia_id)
+    return {(f.data, f.servico_id, f.barbeiro_id): f.quantidade for f in linhas}
+
+@pytest.fixture
+def admin(client, dados):
+    fazer_login(client, 'admin@teste.com')
+    return client
+
+def test_concluir_cancelar_e_concluir_de_novo(admin, db, dados):
+    reserva = criar_reserva(db, dados, DATA)
+    chave = (DATA, dados['servico_id'], 0)
+    assert quantidades(db, dados['barbearia_id']).get(chave, 0) == 0
+
+    assert admin.post(f'/principal/admin/concluir_atendimento/{reserva.uuid}').status_code == 200
+    assert quantidades(db, dados['barbearia_id'])[chave] == 1
+
+    assert admin.post(f'/principal/admin/cancelar_agendamento/{reserva.uuid}').status_code == 200
+    assert quantidades(db, dados['barbearia_id'])[chave] == 0
+
+    resposta = admin.post(f'/principal/admin/alterar_status/{reserva.uuid}', json={'status': 'concluida'})
+    assert resposta.status_code == 200
+    assert quantidades(db, dados['barbearia_id'])[chave] == 1
+
+def test_transicoes_entre_status_faturados_nao_duplicam(db, dados):
+    reserva = criar_reserva(db, dados, DATA, status='confirmada')
+    chave = (DATA, dados['servico_id'], 0)
+    assert quantidades(db, dados['barbearia_id'])[chave] == 1
+
+    for status, esperado in (('concluida', 1), ('atendendo', 0), ('concluida', 1), ('agendada', 0), ('confirmada', 1)):
+        reserva.status = status
+        db.session.commit()
+        assert quantidades(db, dados['barbearia_id'])[chave] == esperado, status
+
+def test_trocar_barbeiro_ou_data_move_o_faturamento(db, dados):
+    reserva = criar_reserva(db, dados, DATA, status='concluida')
+
+    reserva.barbeiro_id = dados['admin_id']
+    reserva.data = '2026-03-03'
+    db.session.commit()
+
+    assert quantidades(db, dados['barbearia_id']) == {
+        (DATA, dados['servico_id'], 0): 0,
+        ('2026-03-03', dados['servico_id'], dados['admin_id']): 1,
+    }
+
+def test_excluir_reserva_faturada(db, dados):
+    reserva = criar_reserva(db, dados, DATA, status='concluida')
+    db.session.delete(reserva)
+    db.session.commit()
+    assert quantidades(db, dados['barbearia_id'])[(DATA, dados['servico_id'], 0)] == 0
+
+def test_agregacoes_dos_relatorios(db, dados):
+    barba = aplicacao.Servico(barbearia_id=dados['barbearia_id'], nome='Barba', preco=25.0, duracao=30)
+    db.session.add(barba)
+    db.session.commit()
+
+    criar_reserva(db, dados, '2026-03-02', status='concluida', barbeiro_id=dados['admin_id'])
+    criar_reserva(db, dados, '2026-03-02', '11:00', '12:00', status='confirmada')
+    db.session.add(aplicacao.Reserva(
+        barbearia_id=dados['barbearia_id'], cliente_id=dados['cliente_id'], servico_id=barba.id,
+        barbeiro_id=dados['admin_id'], data='2026-04-01', hora_inicio='10:00', hora_fim='10:30', status='concluida'
+    ))
+    db.session.commit()
+    criar_reserva(db, dados, '2026-03-10', status='agendada')    # não faturada
+    criar_reserva(db, dados, '2026-03-11', status='cancelada')   # não faturada
+
+    barbearia_id = dados['barbearia_id']
+    assert aplicacao.faturamento_por_dia(barbearia_id, '2026-03-01', '2026-03-31') == [('2026-03-02', 2, 80.0)]
+    assert sorted(aplicacao.faturamento_por_mes(barbearia_id, '2026-01-01', '2026-12-31')) == [
+        ('2026-03', 2, 80.0), ('2026-04', 1, 25.0)
+    ]
+    assert aplicacao.faturamento_por_servico(barbearia_id, '2026-01-01', '2026-12-31') == [
+        ('Corte', 2, 80.0), ('Barba', 1, 25.0)
+    ]
+    assert aplicacao.faturamento_por_barbeiro(barbearia_id, '2026-01-01', '2026-12-31') == [('Admin', 2, 65.0)]
+    assert aplicacao.faturamento_por_barbearia('2026-03-01', '2026-03-31') == {barbearia_id: (2, 80.0)}
@@ -0,0 +1,10 @@
+"""Cada teste começa com os caches do processo vazios (ver conftest.limpar_caches)"""
+import tenant
+
+def test_cache_de_barbearias_preenchido(client, dados):
+    client.get('/principal')
+    assert tenant._barbearias_cache
+
+def test_cache_de_barbearias_vazio_no_teste_seguinte():
+    assert not tenant._barbearias_cache
+    assert not tenant._usuarios_cache
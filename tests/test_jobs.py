@@ -0,0 +1,61 @@
+"""Executor de tarefas: lease renovado durante execuções longas"""
+import time
+
+from jobs import ExecutorJobs
+
+class Lease:
+    """Lease em memória; ``tomado`` simula outro processo assumindo a liderança"""
+
+    def __init__(self):
+        self.renovacoes = 0
+        self.tomado = False
+
+    def adquirir(self, dono, expira_em):
+        self.renovacoes += 1
+        return not self.tomado
+
+def executor_com(lease, registros):
+    executor = ExecutorJobs(lease.adquirir, lambda dono, metricas, proxima: registros.append(metricas),
+                            lease_duracao=0.3)
+    executor._renovar_lease(time.monotonic())
+    assert executor.lider
+    return executor
+
+def test_lease_renovado_durante_tarefa_longa():
+    lease, registros = Lease(), []
+    executor = executor_com(lease, registros)
+    executor.registrar('longa', intervalo=60)(lambda: time.sleep(0.5))
+
+    antes = lease.renovacoes
+    executor._executar_job(executor.jobs['longa'])
+
+    assert lease.renovacoes - antes >= 3
+    assert executor.lider
+    assert registros[-1]['lease_perdido'] is False
+
+def test_execucao_sem_lease_fica_registrada():
+    lease, registros = Lease(), []
+    executor = executor_com(lease, registros)
+
+    def tarefa():
+        lease.tomado = True
+        time.sleep(0.3)
+
+    executor.registrar('tomada', intervalo=60)(tarefa)
+    executor._executar_job(executor.jobs['tomada'])
+
+    assert not executor.lider
+    assert registros[-1]['lease_perdido'] is True
+    assert registros[-1]['execucoes_sem_lease'] == 1
+
+def test_metricas_gravadas_em_job_execucao(db):
+    import app as aplicacao
+    from datetime import datetime
+
+    metricas = {'nome': 'tarefa', 'ultimo_erro': None, 'ultima_execucao': datetime.utcnow(),
+                'ultima_duracao': 1.5, 'lease_perdido': True}
+    aplicacao.registrar_execucao_job('processo', metricas, datetime.utcnow())
+    aplicacao.registrar_execucao_job('processo', dict(metricas, lease_perdido=False), datetime.utcnow())
+
+    execucao = db.session.get(aplicacao.JobExecucao, 'tarefa')
+    assert (execucao.execucoes, execucao.execucoes_sem_lease) == (2, 1)
@@ -0,0 +1,136 @@
+"""Contadores de ocupação (ocupacao_horario) ao criar, cancelar e remarcar reservas"""
+import app as aplicacao
+from agenda import blocos_do_intervalo
+from conftest import criar_reserva, fazer_login, proxima_segunda
+
+def ocupacao(db, barbearia_id, data):
+    """{hora: ocupadas} dos blocos com vaga ocupada no dia"""
+    linhas = db.session.query(aplicacao.OcupacaoHorario.hora, aplicacao.OcupacaoHorario.ocupadas).filter_by(
+        barbearia_id=barbearia_id, data=data
+    )
+    return {hora: ocupadas for hora, ocupadas in linhas if ocupadas}
+
+def test_criar_reserva_ocupa_todos_os_blocos(db, dados):
+    data = proxima_segunda()
+    criar_reserva(db, dados, data, '10:00', '11:00')
+
+    assert ocupacao(db, dados['barbearia_id'], data) == {h: 1 for h in blocos_do_intervalo('10:00', '11:00')}
+    assert aplicacao.ocupacao_maxima_no_banco(dados['barbearia_id'], data, '10:30', '10:45') == 1
+    assert aplicacao.ocupacao_maxima_no_banco(dados['barbearia_id'], data, '11:00', '12:00') == 0
+
+def test_reservas_sobrepostas_somam(db, dados):
+    data = proxima_segunda()
+    criar_reserva(db, dados, data, '10:00', '11:00')
+    criar_reserva(db, dados, data, '10:30', '11:30')
+
+    contadores = ocupacao(db, dados['barbearia_id'], data)
+    assert contadores['10:00'] == 1
+    assert contadores['10:30'] == 2
+    assert contadores['10:55'] == 2
+    assert contadores['11:00'] == 1
+    assert '11:30' not in contadores
+
+def test_cancelar_libera_os_blocos(db, dados):
+    data = proxima_segunda()
+    reserva = criar_reserva(db, dados, data)
+
+    reserva.status = 'cancelada'
+    db.session.commit()
+    assert ocupacao(db, dados['barbearia_id'], data) == {}
+
+    # Reativar volta a ocupar
+    reserva.status = 'confirmada'
+    db.session.commit()
+    assert set(ocupacao(db, dados['barbearia_id'], data)) == set(blocos_do_intervalo('10:00', '11:00'))
+
+def test_status_fora_da_agenda_nao_ocupa(db, dados):
+    data = proxima_segunda()
+    reserva = criar_reserva(db, dados, data, status='confirmada')
+
+    reserva.status = 'concluida'
+    db.session.commit()
+    assert ocupacao(db, dados['barbearia_id'], data) == {}
+
+def test_remarcar_horario_move_a_ocupacao(db, dados):
+    data = proxima_segunda()
+    reserva = criar_reserva(db, dados, data, '10:00', '11:00')
+
+    reserva.hora_inicio, reserva.hora_fim = '14:00', '15:00'
+    db.session.commit()
+
+    assert ocupacao(db, dados['barbearia_id'], data) == {h: 1 for h in blocos_do_intervalo('14:00', '15:00')}
+
+def test_remarcar_data_move_a_ocupacao(db, dados):
+    data, nova_data = proxima_segunda(), proxima_segunda(2)
+    reserva = criar_reserva(db, dados, data)
+
+    reserva.data = nova_data
+    db.session.commit()
+
+    assert ocupacao(db, dados['barbearia_id'], data) == {}
+    assert ocupacao(db, dados['barbearia_id'], nova_data) == {h: 1 for h in blocos_do_intervalo('10:00', '11:00')}
+
+def test_excluir_reserva_libera_os_blocos(db, dados):
+    data = proxima_segunda()
+    reserva = criar_reserva(db, dados, data)
+
+    db.session.delete(reserva)
+    db.session.commit()
+    assert ocupacao(db, dados['barbearia_id'], data) == {}
+
+def test_rollback_nao_altera_contadores(db, dados):
+    data = proxima_segunda()
+    reserva = criar_reserva(db, dados, data)
+
+    reserva.status = 'cancelada'
+    db.session.flush()
+    db.session.rollback()
+    assert len(ocupacao(db, dados['barbearia_id'], data)) == len(blocos_do_intervalo('10:00', '11:00'))
+
+def test_horarios_livres_usa_os_contadores(db, dados):
+    from datetime import date
+    data = proxima_segunda()
+    criar_reserva(db, dados, data, '10:00', '11:00')
+
+    barbearia = db.session.get(aplicacao.Barbearia, dados['barbearia_id'])
+    livres = aplicacao.horarios_livres(barbearia, date.fromisoformat(data), duracao=60)[data]
+    assert '10:00' not in livres
+    assert '09:00' in livres and '11:00' in livres
+
+def test_rota_nova_reserva_e_cancelamento(client, db, dados):
+    data = proxima_segunda()
+    fazer_login(client, 'cliente@teste.com')
+
+    resposta = client.post('/principal/nova_reserva', data={'servico': dados['servico_id'], 'data': data, 'hora': '10:00'})
+    assert resposta.status_code == 302
+    reserva = aplicacao.Reserva.query.filter_by(data=data).one()
+    assert reserva.hora_fim == '11:00'
+    assert ocupacao(db, dados['barbearia_id'], data) == {h: 1 for h in blocos_do_intervalo('10:00', '11:00')}
+
+    # Capacidade padrão de 1 cliente por horário: a segunda reserva é recusada
+    client.post('/principal/nova_reserva', data={'servico': dados['servico_id'], 'data': data, 'hora': '10:00'})
+    assert aplicacao.Reserva.query.filter_by(data=data).count() == 1
+    assert max(ocupacao(db, dados['barbearia_id'], data).values()) == 1
+
+    client.post(f'/cancelar_reserva/{reserva.uuid}')
+    db.session.expire_all()
+    assert ocupacao(db, dados['barbearia_id'], data) == {}
+
+def test_datas_sem_zeros_a_esquerda(client, db, dados):
+    from datetime import date
+    semanas = 1
+    while any(parte >= 10 for parte in date.fromisoformat(proxima_segunda(semanas)).timetuple()[1:3]):
+        semanas += 1
+    data = proxima_segunda(semanas)
+    criar_reserva(db, dados, data, '10:00', '11:00')
+    dia = date.fromisoformat(data)
+    curta = f'{dia.year}-{dia.month}-{dia.day}'
+
+    fazer_login(client, 'cliente@teste.com')
+    resposta = client.get('/api/horarios_disponiveis', query_string={'data': curta})
+    assert resposta.status_code == 200
+    assert '10:00' not in resposta.get_json()['horarios']
+
+    # A reserva com a data sem zeros conta nos mesmos contadores (capacidade 1)
+    client.post('/principal/nova_reserva', data={'servico': dados['servico_id'], 'data': curta, 'hora': '10:00'})
+    assert aplicacao.Reserva.query.count() == 1
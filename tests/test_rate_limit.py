@@ -0,0 +1,105 @@
+"""Janela deslizante do rate limiting (rate_limit.py) e o bloqueio do login"""
+import pytest
+
+import security
+from conftest import fazer_login
+from rate_limit import (
+    RateLimitMemoria, RateLimitSQLite, estimar_tentativas, segundos_para_liberar
+)
+
+JANELA = 900
+INICIO = 100 * JANELA  # início exato de uma janela
+
+@pytest.fixture(params=['memoria', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memoria':
+        return RateLimitMemoria()
+    return RateLimitSQLite(caminho=str(tmp_path / 'rate_limit.db'))
+
+def registrar(backend, chave, vezes, agora):
+    for _ in range(vezes):
+        backend.registrar(chave, JANELA, agora)
+
+def test_sem_estado_nao_ha_tentativas():
+    assert estimar_tentativas(None, JANELA, INICIO + 10) == 0
+    assert segundos_para_liberar(None, JANELA, INICIO + 10, 5) == 0
+
+def test_tentativas_na_janela_atual(backend):
+    registrar(backend, 'login:1', 5, INICIO + 100)
+    estado = backend.consultar('login:1', JANELA, INICIO + 100)
+
+    assert estado == (INICIO, 5, 0)
+    assert estimar_tentativas(estado, JANELA, INICIO + 200) == 5
+    # Só libera quando a janela atual vira a anterior e o peso dela cai abaixo do limite
+    assert segundos_para_liberar(estado, JANELA, INICIO + 200, 5) == JANELA - 200 + 1
+
+def test_janela_anterior_decai_linearmente(backend):
+    registrar(backend, 'login:1', 4, INICIO + 10)
+    estado = backend.consultar('login:1', JANELA, INICIO + 10)
+
+    assert estimar_tentativas(estado, JANELA, INICIO + JANELA) == 4
+    assert estimar_tentativas(estado, JANELA, INICIO + JANELA + JANELA // 4) == 3
+    assert estimar_tentativas(estado, JANELA, INICIO + JANELA + JANELA // 2) == 2
+    # Duas janelas depois o estado não conta mais
+    assert estimar_tentativas(estado, JANELA, INICIO + 2 * JANELA) == 0
+
+def test_registro_na_janela_seguinte_move_a_contagem(backend):
+    registrar(backend, 'login:1', 3, INICIO + 10)
+    registrar(backend, 'login:1', 1, INICIO + JANELA + 10)
+    assert backend.consultar('login:1', JANELA, INICIO + JANELA + 10) == (INICIO + JANELA, 1, 3)
+
+    # Registro depois de uma janela inteira sem tentativas zera a anterior
+    registrar(backend, 'login:1', 1, INICIO + 3 * JANELA + 10)
+    assert backend.consultar('login:1', JANELA, INICIO + 3 * JANELA + 10) == (INICIO + 3 * JANELA, 1, 0)
+
+def test_liberacao_calculada_bate_com_a_estimativa(backend):
+    registrar(backend, 'login:1', 6, INICIO + 100)
+    registrar(backend, 'login:1', 2, INICIO + JANELA + 100)
+    agora = INICIO + JANELA + 150
+    estado = backend.consultar('login:1', JANELA, agora)
+
+    espera = segundos_para_liberar(estado, JANELA, agora, 5)
+    assert estimar_tentativas(estado, JANELA, agora) >= 5
+    assert estimar_tentativas(estado, JANELA, agora + espera) < 5
+    assert estimar_tentativas(estado, JANELA, agora + espera - 1) >= 5
+
+def test_chaves_independentes(backend):
+    registrar(backend, 'login:1', 5, INICIO)
+    assert backend.consultar('login:2', JANELA, INICIO) is None
+
+def test_memoria_descarta_as_chaves_menos_usadas():
+    backend = RateLimitMemoria(max_chaves=2)
+    registrar(backend, 'a', 1, INICIO)
+    registrar(backend, 'b', 1, INICIO)
+    backend.consultar('a', JANELA, INICIO)
+    registrar(backend, 'c', 1, INICIO)
+
+    assert backend.consultar('b', JANELA, INICIO) is None
+    assert backend.consultar('a', JANELA, INICIO) is not None
+    assert backend.consultar('c', JANELA, INICIO) is not None
+
+def test_check_rate_limit_conta_apenas_falhas():
+    for _ in range(10):
+        security.record_login_attempt('login:teste', success=True)
+    assert security.check_rate_limit('login:teste') == (True, 5, 0)
+
+    for _ in range(4):
+        security.record_login_attempt('login:teste', success=False)
+    assert security.check_rate_limit('login:teste') == (True, 1, 0)
+
+    security.record_login_attempt('login:teste', success=False)
+    permitido, restantes, espera = security.check_rate_limit('login:teste')
+    assert (permitido, restantes) == (False, 0)
+    assert 0 < espera <= 2 * security.LOCKOUT_TIME
+
+def test_login_bloqueado_apos_cinco_falhas(client, dados):
+    for _ in range(5):
+        resposta = fazer_login(client, 'admin@teste.com', 'senha-errada')
+        assert resposta.status_code == 200
+
+    # Nem a senha correta entra enquanto o IP está bloqueado
+    resposta = fazer_login(client, 'admin@teste.com')
+    assert resposta.status_code == 200
+    assert 'Muitas tentativas de login' in resposta.get_data(as_text=True)
+    with client.session_transaction() as sessao:
+        assert 'usuario_id' not in sessao
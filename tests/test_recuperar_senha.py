@@ -0,0 +1,25 @@
+"""E-mail de recuperação de senha: fila + envio mesmo sem o executor de tarefas"""
+import app as aplicacao
+
+def test_email_enviado_sem_executor_de_tarefas(client, db, dados):
+    assert not aplicacao.executor_jobs.ativo
+
+    resposta = client.post('/recuperar_senha', data={'email': 'cliente@teste.com'})
+    assert resposta.status_code == 302
+
+    db.session.expire_all()
+    email = aplicacao.EmailFila.query.one()
+    assert email.destino == 'cliente@teste.com'
+    assert email.status == 'enviado'
+
+def test_email_fica_na_fila_com_executor_ativo(client, db, dados, monkeypatch):
+    monkeypatch.setattr(type(aplicacao.executor_jobs), 'ativo', property(lambda self: True))
+
+    client.post('/recuperar_senha', data={'email': 'cliente@teste.com'})
+
+    db.session.expire_all()
+    assert aplicacao.EmailFila.query.one().status == 'pendente'
+
+def test_email_desconhecido_nao_gera_mensagem(client, db, dados):
+    client.post('/recuperar_senha', data={'email': 'ninguem@teste.com'})
+    assert aplicacao.EmailFila.query.count() == 0
@@ -0,0 +1,174 @@
+"""Sessões no servidor (sessoes.py): gravação preguiçosa, renovação e troca de ID"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as aplicacao
+from conftest import fazer_login
+from sessoes import ArmazenamentoMemoria, ArmazenamentoSQLite, _chave
+
+COOKIE = 'session'
+
+def cookies_enviados(resposta):
+    return [c for c in resposta.headers.getlist('Set-Cookie') if c.startswith(COOKIE + '=')]
+
+def sid_do_cliente(client):
+    cookie = client.get_cookie(COOKIE)
+    return cookie.value if cookie else None
+
+def linhas_sessao(db):
+    db.session.expire_all()
+    return {s.id: s for s in aplicacao.Sessao.query.all()}
+
+@pytest.fixture
+def dados(dados, db):
+    """Com um plano ativo, para /principal/planos renderizar (e exibir os flashes)"""
+    db.session.add(aplicacao.PlanoMensal(barbearia_id=dados['barbearia_id'], nome='Mensal', preco=100, atendimentos_mes=4))
+    db.session.commit()
+    return dados
+
+@pytest.fixture
+def gravacoes(monkeypatch):
+    """Lista das chaves gravadas no armazenamento durante o teste"""
+    armazenamento = aplicacao.interface_sessoes.armazenamento
+    chamadas = []
+    gravar = armazenamento.gravar
+
+    def contar(chave, *args, **kwargs):
+        chamadas.append(chave)
+        return gravar(chave, *args, **kwargs)
+
+    monkeypatch.setattr(armazenamento, 'gravar', contar)
+    return chamadas
+
+def test_cookie_leva_apenas_o_id(client, db, dados):
+    fazer_login(client, 'cliente@teste.com')
+    sid = sid_do_cliente(client)
+
+    assert sid and len(sid) == 32
+    linhas = linhas_sessao(db)
+    # A chave no banco é o hash do ID, nunca o próprio ID
+    assert list(linhas) == [_chave(sid)]
+    assert linhas[_chave(sid)].usuario_id == dados['cliente_id']
+    assert 'Cliente' in linhas[_chave(sid)].dados
+
+def test_visita_sem_sessao_nao_grava(client, db, dados, gravacoes):
+    resposta = client.get('/principal/api/agendamentos_sync')
+    assert resposta.status_code == 401
+    assert cookies_enviados(resposta) == []
+    assert gravacoes == []
+    assert linhas_sessao(db) == {}
+
+def test_requisicao_sem_mudancas_nao_grava(client, db, dados, gravacoes):
+    fazer_login(client, 'cliente@teste.com')
+    client.get('/principal/planos')  # consome o flash do login
+    del gravacoes[:]
+
+    # As páginas reatribuem session['barbearia_id'] com o mesmo valor em toda visita
+    for url in ('/principal/planos', '/principal/login', '/dashboard'):
+        resposta = client.get(url)
+        assert resposta.status_code in (200, 302)
+        assert cookies_enviados(resposta) == []
+    assert gravacoes == []
+
+def test_mudanca_grava_sem_reenviar_o_cookie(client, db, dados, gravacoes):
+    fazer_login(client, 'cliente@teste.com')
+    sid = sid_do_cliente(client)
+    del gravacoes[:]
+
+    resposta = client.get('/principal/planos')  # exibe o flash do login: os dados mudam
+    assert gravacoes == [_chave(sid)]
+    assert cookies_enviados(resposta) == []
+    assert sid_do_cliente(client) == sid
+
+def test_renovacao_com_menos_da_metade_da_validade(client, db, dados, gravacoes):
+    fazer_login(client, 'cliente@teste.com')
+    client.get('/principal/planos')
+    sid = sid_do_cliente(client)
+
+    sessao = db.session.get(aplicacao.Sessao, _chave(sid))
+    sessao.expira_em = datetime.utcnow() + timedelta(minutes=10)
+    db.session.commit()
+    del gravacoes[:]
+
+    resposta = client.get('/principal/login')
+    assert gravacoes == [_chave(sid)]
+    assert len(cookies_enviados(resposta)) == 1
+    assert sid_do_cliente(client) == sid
+    assert linhas_sessao(db)[_chave(sid)].expira_em > datetime.utcnow() + timedelta(minutes=50)
+
+def test_login_troca_o_id_da_sessao_anonima(client, db, dados):
+    client.get('/principal/login')  # sessão anônima com barbearia_id
+    sid_anonimo = sid_do_cliente(client)
+    assert sid_anonimo
+
+    fazer_login(client, 'cliente@teste.com')
+    sid = sid_do_cliente(client)
+
+    assert sid and sid != sid_anonimo
+    assert set(linhas_sessao(db)) == {_chave(sid)}
+
+def test_id_antigo_nao_vale_apos_o_login(client, dados, ambiente):
+    client.get('/principal/login')
+    sid_anonimo = sid_do_cliente(client)
+    fazer_login(client, 'cliente@teste.com')
+
+    # Quem conhecia o ID anterior (fixação de sessão) continua anônimo
+    atacante = ambiente.test_client()
+    atacante.set_cookie(COOKIE, sid_anonimo)
+    with atacante.session_transaction() as sessao:
+        assert 'usuario_id' not in sessao
+
+def test_logout_apaga_o_registro_e_troca_o_id(client, db, dados):
+    fazer_login(client, 'cliente@teste.com')
+    sid = sid_do_cliente(client)
+
+    client.get('/principal/logout')
+    novo_sid = sid_do_cliente(client)
+    assert novo_sid != sid
+    assert _chave(sid) not in linhas_sessao(db)
+
+    # Sem o flash do logout a sessão fica vazia: registro e cookie são removidos
+    with client.session_transaction() as sessao:
+        sessao.pop('_flashes')
+    assert sid_do_cliente(client) is None
+    assert linhas_sessao(db) == {}
+
+def test_encerrar_sessoes_do_usuario(client, db, dados, ambiente):
+    outro = ambiente.test_client()
+    fazer_login(client, 'cliente@teste.com')
+    fazer_login(outro, 'cliente@teste.com')
+    assert len(linhas_sessao(db)) == 2
+
+    assert aplicacao.interface_sessoes.encerrar_sessoes_usuario(dados['cliente_id']) == 2
+    with client.session_transaction() as sessao:
+        assert 'usuario_id' not in sessao
+
+@pytest.fixture(params=['memoria', 'sqlite', 'banco'])
+def armazenamento(request, tmp_path, db):
+    if request.param == 'memoria':
+        return ArmazenamentoMemoria()
+    if request.param == 'sqlite':
+        return ArmazenamentoSQLite(caminho=str(tmp_path / 'sessoes.db'))
+    return aplicacao.interface_sessoes.armazenamento
+
+def test_armazenamentos(armazenamento):
+    agora = datetime.utcnow().replace(microsecond=0)
+    armazenamento.gravar('a', '{"x": 1}', agora + timedelta(hours=1), 7, 1, nova=True)
+    armazenamento.gravar('b', '{"x": 2}', agora + timedelta(hours=1), 7, 1, nova=True)
+    armazenamento.gravar('c', '{"x": 3}', agora - timedelta(seconds=1), 8, 1, nova=True)
+
+    assert armazenamento.ler('a', agora) == ('{"x": 1}', agora + timedelta(hours=1))
+    assert armazenamento.ler('c', agora) is None  # expirada
+    assert armazenamento.ler('z', agora) is None
+
+    armazenamento.gravar('a', '{"x": 10}', agora + timedelta(hours=2), 7, 1, nova=False)
+    assert armazenamento.ler('a', agora) == ('{"x": 10}', agora + timedelta(hours=2))
+
+    assert armazenamento.limpar_expiradas(agora) == 1
+    assert armazenamento.apagar_usuario(7) == 2
+    assert armazenamento.ler('a', agora) is None
+
+    armazenamento.gravar('d', '{}', agora + timedelta(hours=1), None, None, nova=True)
+    armazenamento.apagar('d')
+    assert armazenamento.ler('d', agora) is None
@@ -0,0 +1,40 @@
+"""Usuario.versao: incremento atômico, mesmo a partir da cópia do cache"""
+import app as aplicacao
+
+def versao_no_banco(db, usuario_id):
+    tabela = aplicacao.Usuario.__table__
+    return db.session.execute(db.select(tabela.c.versao).where(tabela.c.id == usuario_id)).scalar()
+
+def test_alterar_usuario_incrementa_a_versao(db, dados):
+    usuario = db.session.get(aplicacao.Usuario, dados['cliente_id'])
+    versao = usuario.versao
+
+    usuario.nome = 'Cliente Novo'
+    db.session.commit()
+    assert usuario.versao == versao + 1
+
+def test_copia_desatualizada_nao_repete_versao(db, dados):
+    tabela = aplicacao.Usuario.__table__
+    usuario = db.session.get(aplicacao.Usuario, dados['cliente_id'])
+    copia = aplicacao.Usuario(**{c.key: getattr(usuario, c.key) for c in db.inspect(aplicacao.Usuario).column_attrs})
+    db.session.expunge_all()
+
+    # Outro processo alterou o usuário depois que a cópia foi guardada no cache
+    with db.engine.begin() as conn:
+        conn.execute(tabela.update().where(tabela.c.id == dados['cliente_id']).values(versao=tabela.c.versao + 1))
+    versao_atual = versao_no_banco(db, dados['cliente_id'])
+
+    from sqlalchemy.orm import make_transient_to_detached
+    make_transient_to_detached(copia)
+    anexado = db.session.merge(copia, load=False)
+    anexado.telefone = '11999999999'
+    db.session.commit()
+
+    assert versao_no_banco(db, dados['cliente_id']) == versao_atual + 1
+
+def test_vinculo_alterado_incrementa_a_versao(db, dados):
+    versao = versao_no_banco(db, dados['cliente_id'])
+    vinculo = aplicacao.UsuarioBarbearia.query.filter_by(usuario_id=dados['cliente_id']).one()
+    vinculo.ativo = False
+    db.session.commit()
+    assert versao_no_banco(db, dados['cliente_id']) == versao + 1